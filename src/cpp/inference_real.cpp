@@ -14,7 +14,299 @@
 #include <filesystem> // For iterating through directories (C++17)
 // --------------------------------
 
-int main() {
+// --- Throughput mode ---
+#include <algorithm>
+#include <atomic>
+#include <chrono>
+#include <condition_variable>
+#include <fstream>
+#include <iomanip>
+#include <mutex>
+#include <stdexcept>
+#include <thread>
+
+// Command line options. Without --throughput the program runs the original
+// per-image demo; with it, a whole directory is scored in batches (see run_throughput).
+struct Options {
+    bool throughput = false;
+    std::string model_path = "../../../models/nvidia_pilotnet.onnx";
+    std::string images_dir = "../../../data/test_images/";
+    std::string csv_path = "predictions.csv";
+    int64_t batch_size = 32;
+    int decode_threads = 2;
+    int intra_op_threads = 1;
+};
+
+static void print_usage(const char* program) {
+    std::cout << "Usage: " << program << " [--throughput] [--model PATH] [--images DIR] [--csv PATH]\n"
+              << "       [--batch-size N] [--decode-threads N] [--intra-op-threads N]" << std::endl;
+}
+
+static bool parse_options(int argc, char** argv, Options& options) {
+    for (int i = 1; i < argc; i++) {
+        const std::string arg = argv[i];
+        const bool has_value = i + 1 < argc;
+        // std::stoll/std::stoi throw on values that are not numbers (or out of range)
+        try {
+            if (arg == "--throughput") {
+                options.throughput = true;
+            } else if (arg == "--model" && has_value) {
+                options.model_path = argv[++i];
+            } else if (arg == "--images" && has_value) {
+                options.images_dir = argv[++i];
+            } else if (arg == "--csv" && has_value) {
+                options.csv_path = argv[++i];
+            } else if (arg == "--batch-size" && has_value) {
+                options.batch_size = std::max<int64_t>(1, std::stoll(argv[++i]));
+            } else if (arg == "--decode-threads" && has_value) {
+                options.decode_threads = std::max(1, std::stoi(argv[++i]));
+            } else if (arg == "--intra-op-threads" && has_value) {
+                options.intra_op_threads = std::max(1, std::stoi(argv[++i]));
+            } else {
+                print_usage(argv[0]);
+                return false;
+            }
+        } catch (const std::logic_error&) {
+            std::cerr << "ERROR: Invalid value for " << arg << ": " << argv[i] << std::endl;
+            print_usage(argv[0]);
+            return false;
+        }
+    }
+    return true;
+}
+
+// Model input dimensions
+constexpr int64_t kInputHeight = 66;
+constexpr int64_t kInputWidth = 200;
+constexpr size_t kFrameSize = kInputHeight * kInputWidth; // One grayscale channel
+// Batch buffers in the ring: one being inferred while the decode threads fill the others
+constexpr size_t kNumBatchBuffers = 3;
+
+// A preallocated batch: the input tensor data, the matching output, and the image names.
+// Decode threads write disjoint frames of pixels; the rest is guarded by the pipeline mutex.
+struct BatchBuffer {
+    std::vector<float> pixels;
+    std::vector<float> steering;
+    std::vector<std::string> names;
+    std::vector<char> valid;  // 0 when the image could not be read
+    int64_t batch_index = -1; // The batch this buffer is currently assigned to
+    size_t expected = 0;      // Images in that batch
+    size_t filled = 0;        // Images written so far
+};
+
+using Clock = std::chrono::steady_clock;
+
+static int64_t elapsed_ns(Clock::time_point start) {
+    return std::chrono::duration_cast<std::chrono::nanoseconds>(Clock::now() - start).count();
+}
+
+// Reads one image and writes the normalised 66x200 model input to out (kFrameSize floats).
+// Frames from data_generator.py are single-channel PNGs, so they are decoded straight to grayscale
+// (for those, the same pixels as IMREAD_COLOR followed by COLOR_BGR2GRAY, without the colour copy).
+// OpenCV errors are caught and reported as a failed image: an exception escaping a decode thread
+// would call std::terminate.
+static bool decode_and_preprocess(const std::string& path, float* out,
+                                  std::atomic<int64_t>& decode_ns, std::atomic<int64_t>& preprocess_ns) {
+    try {
+        Clock::time_point start = Clock::now();
+        cv::Mat gray_image = cv::imread(path, cv::IMREAD_GRAYSCALE);
+        decode_ns += elapsed_ns(start);
+        if (gray_image.empty()) {
+            return false;
+        }
+        start = Clock::now();
+        cv::Mat resized_image;
+        cv::resize(gray_image, resized_image, cv::Size(kInputWidth, kInputHeight), 0, 0, cv::INTER_AREA);
+        // Wrap the batch slot, so convertTo writes the [-1, 1] floats in place (no intermediate copy)
+        cv::Mat float_image(kInputHeight, kInputWidth, CV_32FC1, out);
+        resized_image.convertTo(float_image, CV_32FC1, 1.0 / 127.5, -1.0);
+        preprocess_ns += elapsed_ns(start);
+        return true;
+    } catch (const cv::Exception& e) {
+        std::cerr << "ERROR: OpenCV failed on " << path << ": " << e.what() << std::endl;
+        return false;
+    }
+}
+
+static std::vector<std::filesystem::path> list_png_images(const std::string& images_dir) {
+    std::vector<std::filesystem::path> image_paths;
+    for (const auto& entry : std::filesystem::directory_iterator(images_dir)) {
+        if (entry.is_regular_file() && entry.path().extension() == ".png") {
+            image_paths.push_back(entry.path());
+        }
+    }
+    std::sort(image_paths.begin(), image_paths.end());
+    return image_paths;
+}
+
+// Scores every .png in options.images_dir and streams "image,steering" rows to options.csv_path.
+// A pool of decode threads fills kNumBatchBuffers reusable batch buffers while this thread runs
+// the session on full batches (dynamic batch axis), so decoding overlaps inference.
+// Image i goes to position i % batch_size of batch i / batch_size, which uses buffer
+// (batch % kNumBatchBuffers) once the batch kNumBatchBuffers earlier has been inferred.
+// Prints per-stage timing at the end instead of logging every image.
+static int run_throughput(const Options& options) {
+    if (!std::filesystem::is_directory(options.images_dir)) {
+        std::cerr << "ERROR: Test images directory not found: " << options.images_dir << std::endl;
+        return 1;
+    }
+    const std::vector<std::filesystem::path> image_paths = list_png_images(options.images_dir);
+    const size_t num_images = image_paths.size();
+    const size_t batch_size = static_cast<size_t>(options.batch_size);
+    const size_t num_batches = (num_images + batch_size - 1) / batch_size;
+
+    Ort::Env env(ORT_LOGGING_LEVEL_WARNING, "LaneKeepingInference");
+    Ort::SessionOptions session_options;
+    session_options.SetIntraOpNumThreads(options.intra_op_threads);
+    session_options.SetGraphOptimizationLevel(GraphOptimizationLevel::ORT_ENABLE_EXTENDED);
+    Ort::Session session(env, options.model_path.c_str(), session_options);
+    Ort::MemoryInfo memory_info = Ort::MemoryInfo::CreateCpu(OrtArenaAllocator, OrtMemTypeDefault);
+    Ort::AllocatorWithDefaultOptions ort_alloc;
+    Ort::AllocatedStringPtr input_name = session.GetInputNameAllocated(0, ort_alloc);
+    Ort::AllocatedStringPtr output_name = session.GetOutputNameAllocated(0, ort_alloc);
+    const char* input_names[] = {input_name.get()};
+    const char* output_names[] = {output_name.get()};
+
+    std::ofstream csv(options.csv_path);
+    if (!csv) {
+        std::cerr << "ERROR: Could not open " << options.csv_path << " for writing" << std::endl;
+        return 1;
+    }
+    csv << "image,steering\n";
+
+    // All buffers are allocated once; the first batches are assigned to them up front
+    std::vector<BatchBuffer> buffers(kNumBatchBuffers);
+    auto batch_images = [&](size_t batch) { return std::min(batch_size, num_images - batch * batch_size); };
+    for (size_t slot = 0; slot < kNumBatchBuffers; slot++) {
+        buffers[slot].pixels.resize(batch_size * kFrameSize);
+        buffers[slot].steering.resize(batch_size);
+        buffers[slot].names.resize(batch_size);
+        buffers[slot].valid.resize(batch_size);
+        if (slot < num_batches) {
+            buffers[slot].batch_index = static_cast<int64_t>(slot);
+            buffers[slot].expected = batch_images(slot);
+        }
+    }
+
+    std::mutex mutex;
+    std::condition_variable buffer_free;   // A buffer was assigned to a new batch
+    std::condition_variable buffer_filled; // A buffer received all of its images
+    std::atomic<size_t> next_image{0};
+    std::atomic<int64_t> decode_ns{0}, preprocess_ns{0}, slot_wait_ns{0};
+    size_t failed_images = 0;
+
+    auto decode_worker = [&]() {
+        for (size_t i = next_image++; i < num_images; i = next_image++) {
+            const size_t batch = i / batch_size;
+            const size_t position = i % batch_size;
+            BatchBuffer& buffer = buffers[batch % kNumBatchBuffers];
+            {
+                Clock::time_point start = Clock::now();
+                std::unique_lock<std::mutex> lock(mutex);
+                buffer_free.wait(lock, [&] { return buffer.batch_index == static_cast<int64_t>(batch); });
+                slot_wait_ns += elapsed_ns(start);
+            }
+            float* frame = buffer.pixels.data() + position * kFrameSize;
+            const bool ok = decode_and_preprocess(image_paths[i].string(), frame, decode_ns, preprocess_ns);
+            if (!ok) {
+                std::fill(frame, frame + kFrameSize, 0.0f); // Keeps the batch valid; the result is dropped
+            }
+            std::lock_guard<std::mutex> lock(mutex);
+            buffer.names[position] = image_paths[i].filename().string();
+            buffer.valid[position] = ok;
+            if (++buffer.filled == buffer.expected) {
+                buffer_filled.notify_one();
+            }
+        }
+    };
+
+    const Clock::time_point run_start = Clock::now();
+    std::vector<std::thread> workers;
+    for (int t = 0; t < options.decode_threads; t++) {
+        workers.emplace_back(decode_worker);
+    }
+
+    int64_t batch_wait_ns = 0, inference_ns = 0, output_ns = 0;
+    for (size_t batch = 0; batch < num_batches; batch++) {
+        BatchBuffer& buffer = buffers[batch % kNumBatchBuffers];
+        Clock::time_point start = Clock::now();
+        {
+            std::unique_lock<std::mutex> lock(mutex);
+            buffer_filled.wait(lock, [&] { return buffer.filled == buffer.expected; });
+        }
+        batch_wait_ns += elapsed_ns(start);
+
+        // Tensors wrap the preallocated buffers; only the batch dimension changes (last batch)
+        start = Clock::now();
+        const int64_t count = static_cast<int64_t>(buffer.expected);
+        const std::array<int64_t, 4> input_shape = {count, 1, kInputHeight, kInputWidth};
+        const std::array<int64_t, 2> output_shape = {count, 1};
+        Ort::Value input_tensor = Ort::Value::CreateTensor<float>(
+            memory_info, buffer.pixels.data(), count * kFrameSize, input_shape.data(), input_shape.size());
+        Ort::Value output_tensor = Ort::Value::CreateTensor<float>(
+            memory_info, buffer.steering.data(), count, output_shape.data(), output_shape.size());
+        session.Run(Ort::RunOptions{nullptr}, input_names, &input_tensor, 1, output_names, &output_tensor, 1);
+        inference_ns += elapsed_ns(start);
+
+        start = Clock::now();
+        for (size_t position = 0; position < buffer.expected; position++) {
+            if (buffer.valid[position]) {
+                csv << buffer.names[position] << ',' << buffer.steering[position] << '\n';
+            } else {
+                std::cerr << "ERROR: Could not load image " << buffer.names[position] << std::endl;
+                failed_images++;
+            }
+        }
+        output_ns += elapsed_ns(start);
+
+        // Hand the buffer to the batch kNumBatchBuffers ahead
+        const size_t next_batch = batch + kNumBatchBuffers;
+        {
+            std::lock_guard<std::mutex> lock(mutex);
+            buffer.filled = 0;
+            buffer.batch_index = next_batch < num_batches ? static_cast<int64_t>(next_batch) : -1;
+            buffer.expected = next_batch < num_batches ? batch_images(next_batch) : 0;
+        }
+        buffer_free.notify_all();
+    }
+    for (std::thread& worker : workers) {
+        worker.join();
+    }
+    csv.flush();
+    const double wall_s = elapsed_ns(run_start) / 1e9;
+
+    // --- Per-stage timing ---
+    // Decode/preprocess/slot wait are summed over the decode threads; the others are the inference thread
+    auto per_image_ms = [&](int64_t ns) { return num_images ? ns / 1e6 / num_images : 0.0; };
+    std::cout << "Scored " << num_images - failed_images << " of " << num_images << " images in "
+              << num_batches << " batches of up to " << batch_size << " in " << wall_s << " s ("
+              << (wall_s > 0 ? num_images / wall_s : 0.0) << " images/s), results in " << options.csv_path << std::endl;
+    std::cout << std::left << std::setw(28) << "Stage" << std::right << std::setw(10) << "total s"
+              << std::setw(11) << "ms/image" << std::endl;
+    const std::array<std::pair<const char*, int64_t>, 6> stages = {{
+        {"decode (decode threads)", decode_ns.load()},
+        {"preprocess (decode threads)", preprocess_ns.load()},
+        {"wait for free buffer", slot_wait_ns.load()},
+        {"wait for full batch", batch_wait_ns},
+        {"inference", inference_ns},
+        {"csv output", output_ns},
+    }};
+    for (const auto& stage : stages) {
+        std::cout << std::left << std::setw(28) << stage.first << std::right << std::fixed << std::setprecision(3)
+                  << std::setw(10) << stage.second / 1e9 << std::setw(11) << per_image_ms(stage.second) << std::endl;
+    }
+    return failed_images == 0 ? 0 : 1;
+}
+
+int main(int argc, char** argv) {
+    Options options;
+    if (!parse_options(argc, argv, options)) {
+        return 1;
+    }
+    if (options.throughput) {
+        return run_throughput(options);
+    }
+
     std::cout << "Hello from C++ inference_real!" << std::endl;
     std::cout << "(With ONNX Runtime v1.17.1)" << std::endl;
 
@@ -32,7 +324,7 @@ int main() {
     );
 
     // --- 3. Define Model Path ---
-    const std::string model_path = "../../../models/nvidia_pilotnet.onnx";
+    const std::string model_path = options.model_path;
 
     // --- 4. Create an Inference Session ---
     Ort::Session session(env, model_path.c_str(), session_options);
@@ -112,7 +404,7 @@ int main() {
 
     // IMPORTANT: Define the path to directory containing test images.
     // This path is relative to where executable runs (from 'src/cpp/build/').
-    const std::string test_images_dir_path = "../../../data/test_images/";
+    const std::string test_images_dir_path = options.images_dir;
 
     // Check if the directory exists
     if (!std::filesystem::exists(test_images_dir_path)) {
@@ -0,0 +1,301 @@
+#----------------------------------------------libraries
+import pygame
+import numpy as np
+
+from simulator import (
+    SCREEN_WIDTH, SCREEN_HEIGHT,
+    BLACK, LANE_WIDTH, ROAD_WIDTH, LANE_LINE_WIDTH,
+    CAR_WIDTH, CAR_HEIGHT, CAR_COLOR, CAR_SPRITE_ANGLE_STEP_DEG,
+    CAMERA_WIDTH, CAMERA_HEIGHT,
+    CURVE_CENTER_X, CURVE_CENTER_Y, CURVE_RADIUS,
+    CURVE_START_ANGLE_DEG, CURVE_END_ANGLE_DEG,
+    get_car_sprites, draw_curved_road, draw_curved_lane_lines
+)
+from camera_sampling import CameraGrid
+from tiled_world import TiledWorld, draw_straight_road_tile
+
+#-------------------------------------------------------
+# Grayscale values exactly as the saved PNGs are computed:
+# get_camera_view's luminosity / 255.0, then (x * 255).astype(np.uint8)
+def _gray_levels(rgb):
+    return (np.dot(rgb, [0.2989, 0.5870, 0.1140]) / 255.0 * 255).astype(np.uint8)
+
+BLACK_LEVEL = _gray_levels(BLACK)
+CAR_LEVEL = _gray_levels(CAR_COLOR)
+
+# The straight road repeats vertically with the dash period of its white line (see draw_lane_lines)
+DASH_PERIOD = LANE_LINE_WIDTH * 3
+
+# Frames rendered per vectorised step; keeps the (chunk, H, W) temporaries cache-sized
+RENDER_CHUNK_FRAMES = 16
+# The car sprite lies within this distance of the car centre (half its diagonal, rounded up,
+# plus the pixel the sprite position is rounded to and the pixel the camera samples in)
+CAR_EXTENT = int(np.ceil(np.hypot(CAR_WIDTH, CAR_HEIGHT) / 2)) + 2
+
+#-------------------------------------------------------Car Sprite Masks
+# Key: (width, height, color, angle_step_deg) -> (num_angles, S, S) bool array
+_car_mask_cache = {}
+
+def get_car_masks(width=CAR_WIDTH, height=CAR_HEIGHT, color=CAR_COLOR,
+                  angle_step_deg=CAR_SPRITE_ANGLE_STEP_DEG):
+    """
+    The opaque pixels of simulator.get_car_sprites, indexed [angle index, row, column].
+    Every mask sits in the top-left corner of an S x S array (S = the largest sprite side).
+    """
+    key = (width, height, color, angle_step_deg)
+    masks = _car_mask_cache.get(key)
+    if masks is None:
+        sprites = get_car_sprites(width, height, color, angle_step_deg)
+        size = max(max(sprite.get_size()) for sprite in sprites)
+        masks = np.zeros((len(sprites), size, size), dtype=bool)
+        for i, sprite in enumerate(sprites):
+            alpha = pygame.surfarray.array_alpha(sprite).T # (height, width); the sprites are fully opaque or transparent
+            masks[i, :alpha.shape[0], :alpha.shape[1]] = alpha > 0
+        _car_mask_cache[key] = masks
+    return masks
+
+#-----------------------------------------------------BatchRenderer class
+# Renders N camera frames without a pygame screen.
+# The road is static, so it is drawn once by the simulator's own pygame functions (draw_curved_road
+# and draw_curved_lane_lines on a screen-sized Surface, or one dash period of TiledWorld's
+# straight road) and kept as a raster of saved grayscale levels. Pygame's thick arcs leave
+# black holes inside the curved road, and the raster keeps them.
+# Each frame then gathers the raster pixels its camera pixels fall in:
+# - heading_aligned=True: CameraGrid maps the pixels to the world and the pixel under each one is
+#   taken (floor), as get_rotated_camera_view samples the screen;
+# - heading_aligned=False: the view is the screen rect get_camera_view captures, with its top-left
+#   corner truncated to whole pixels like pygame.Rect.
+# The car sprite (get_car_sprites, as blitted by Car.draw) is looked up per frame in the same way,
+# but only in the window around the car centre.
+# So the frames equal get_camera_view / get_rotated_camera_view, pixel for pixel, while the view
+# lies inside the screen. Elsewhere: get_camera_view clamps its rect to the screen and
+# get_rotated_camera_view samples black outside it, while here the straight road continues
+# (like TiledWorld) and the curved road's surroundings are black.
+# The output is an (N, H, W) uint8 tensor, with the grayscale levels the frames are saved with.
+class BatchRenderer:
+    """
+    Vectorised renderer for batches of car poses on the "straight" or "curved" road.
+    heading_aligned=False reproduces the axis-aligned get_camera_view camera
+    (the pose heading then only rotates the ego car in the frame).
+    """
+    def __init__(self, road_type, width=CAMERA_WIDTH, height=CAMERA_HEIGHT,
+                 heading_aligned=True, draw_car=True, road_center_x=SCREEN_WIDTH / 2):
+        if road_type not in ("straight", "curved"):
+            raise ValueError(f"Unknown road type: {road_type}")
+        self.road_type = road_type
+        self.grid = CameraGrid(width, height)
+        self.heading_aligned = heading_aligned
+        self.draw_car = draw_car
+        self.road_center_x = road_center_x # Straight road only
+        self.car_masks = get_car_masks() if draw_car else None
+        self._build_raster()
+
+    def _build_raster(self):
+        # The road pixels plus a black border that out-of-range samples are clipped to.
+        # The straight road repeats vertically with the dash period, so one period is stored.
+        if self.road_type == "straight":
+            # Same rectangles as draw_road / draw_lane_lines, around road_center_x
+            x0 = int(np.floor(self.road_center_x - ROAD_WIDTH / 2))
+            tile = pygame.Surface((ROAD_WIDTH + 2, ROAD_WIDTH + 2))
+            tile.fill(BLACK)
+            draw_straight_road_tile(tile, x0, 0, TiledWorld(width=2 * self.road_center_x))
+            road = _gray_levels(pygame.surfarray.array3d(tile)[:, :DASH_PERIOD].transpose(1, 0, 2))
+            self.raster = np.pad(road, ((0, 0), (1, 1)), constant_values=BLACK_LEVEL)
+            self.raster_x0, self.raster_y0 = x0 - 1, 0
+            self.raster_period_y = DASH_PERIOD
+        else:
+            # The screen data_generator.py draws the curve on
+            screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+            screen.fill(BLACK)
+            draw_curved_road(screen, CURVE_CENTER_X, CURVE_CENTER_Y, CURVE_RADIUS,
+                             CURVE_START_ANGLE_DEG, CURVE_END_ANGLE_DEG, ROAD_WIDTH)
+            draw_curved_lane_lines(screen, CURVE_CENTER_X, CURVE_CENTER_Y, CURVE_RADIUS,
+                                   CURVE_START_ANGLE_DEG, CURVE_END_ANGLE_DEG, LANE_WIDTH, LANE_LINE_WIDTH)
+            road = _gray_levels(pygame.surfarray.array3d(screen).transpose(1, 0, 2))
+            self.raster = np.pad(road, 1, constant_values=BLACK_LEVEL)
+            self.raster_x0, self.raster_y0 = -1, -1
+            self.raster_period_y = None
+
+    def _raster_indices(self, raster_x, raster_y):
+        """
+        Flat raster indices of the pixels at raster_x, raster_y (positions relative to the raster
+        origin, broadcastable arrays; float ones are modified in place). Positions are clipped
+        before truncating, so truncation is floor and out-of-range samples land on the black border.
+        """
+        height, width = self.raster.shape
+        np.clip(raster_x, 0, width - 1, out=raster_x)
+        if self.raster_period_y is None:
+            np.clip(raster_y, 0, height - 1, out=raster_y)
+        elif raster_y.dtype.kind == "i":
+            raster_y %= self.raster_period_y
+        else:
+            # Modulo the period (np.mod is several times slower on large float arrays)
+            period = np.float32(self.raster_period_y)
+            raster_y -= period * np.floor(raster_y * (1 / period))
+            np.clip(raster_y, 0, period - 0.5, out=raster_y)
+        indices = raster_y.astype(np.intp)
+        indices *= width
+        return indices + raster_x.astype(np.intp)
+
+    def render(self, xs, ys, angles_deg, camera_offsets_y, out=None):
+        """
+        Renders one frame per pose (1-D arrays of length N, Car conventions).
+        out is an optional preallocated uint8 array of shape (N, H, W) that is filled in place.
+        Returns the (N, H, W) uint8 frames.
+        """
+        xs = np.asarray(xs, dtype=np.float32).reshape(-1)
+        ys = np.asarray(ys, dtype=np.float32).reshape(-1)
+        angles_deg = np.asarray(angles_deg, dtype=np.float32).reshape(-1)
+        camera_offsets_y = np.broadcast_to(np.asarray(camera_offsets_y, dtype=np.float32), xs.shape)
+        num_frames = len(xs)
+        shape = (num_frames, self.grid.height, self.grid.width)
+        if out is None:
+            out = np.empty(shape, dtype=np.uint8)
+        elif out.shape != shape or out.dtype != np.uint8:
+            raise ValueError(f"Output buffer must be uint8 with shape {shape}, got {out.dtype} {out.shape}")
+
+        # Work through the batch in chunks so the per-pixel temporaries stay in cache
+        for start in range(0, num_frames, RENDER_CHUNK_FRAMES):
+            chunk = slice(start, start + RENDER_CHUNK_FRAMES)
+            self._render_chunk(out[chunk], xs[chunk], ys[chunk], angles_deg[chunk], camera_offsets_y[chunk])
+        return out
+
+    def _render_chunk(self, out, xs, ys, angles_deg, camera_offsets_y):
+        if self.heading_aligned:
+            world_x, world_y = self.grid.world_coords(xs, ys, angles_deg, camera_offsets_y)
+            world_x -= np.float32(self.raster_x0) # Relative to the raster (after mapping, so floor
+            world_y -= np.float32(self.raster_y0) # rounds exactly as get_rotated_camera_view does)
+            indices = self._raster_indices(world_x, world_y)
+            camera_left = camera_top = None
+        else:
+            # get_camera_view's rect: the top-left corner truncated to whole pixels
+            camera_left = np.trunc(xs.astype(np.float64) - self.grid.width / 2).astype(np.intp)
+            camera_top = np.trunc(ys.astype(np.float64) + camera_offsets_y).astype(np.intp)
+            raster_x = camera_left[:, None, None] - self.raster_x0 + np.arange(self.grid.width)
+            raster_y = camera_top[:, None, None] - self.raster_y0 + np.arange(self.grid.height)[:, None]
+            indices = self._raster_indices(raster_x, raster_y)
+        np.take(self.raster.reshape(-1), indices, out=out)
+        if self.draw_car:
+            self._draw_car(out, xs, ys, angles_deg, camera_offsets_y, camera_left, camera_top)
+
+    def _draw_car(self, out, xs, ys, angles_deg, camera_offsets_y, camera_left, camera_top):
+        """
+        Overwrites the camera pixels that fall on the car sprite Car.draw blits for each pose.
+        camera_left/camera_top are the fixed camera's rects (None for the heading-aligned camera).
+        Only the rows and columns within CAR_EXTENT of the car centre are tested.
+        """
+        # Forward distance of each row from the car centre, shape (n, H, 1)
+        forward = self.grid.forward[None] - camera_offsets_y[:, None, None]
+        rows = np.flatnonzero((np.abs(forward) <= CAR_EXTENT).any(axis=(0, 2)))
+        columns = np.flatnonzero(np.abs(self.grid.lateral[0]) <= CAR_EXTENT)
+        if len(rows) == 0 or len(columns) == 0:
+            return
+        # Frames with different camera offsets can leave a gap between their rows, so the window spans it
+        rows = np.arange(rows[0], rows[-1] + 1)
+        window = (slice(None), slice(rows[0], rows[-1] + 1), slice(columns[0], columns[-1] + 1))
+
+        # World pixel under each window pixel, shape (n, h, w)
+        if camera_left is None:
+            angles_rad = np.deg2rad(angles_deg)[:, None, None]
+            cos_a = np.cos(angles_rad)
+            sin_a = np.sin(angles_rad)
+            forward = forward[window[:2]]
+            lateral = self.grid.lateral[None][:, :, window[2]]
+            world_x = np.floor(xs[:, None, None] + cos_a * forward + sin_a * lateral).astype(np.intp)
+            world_y = np.floor(ys[:, None, None] - sin_a * forward + cos_a * lateral).astype(np.intp)
+        else:
+            world_x = np.broadcast_to(camera_left[:, None, None] + columns[None, None, :], out[window].shape)
+            world_y = camera_top[:, None, None] + rows[None, :, None]
+
+        # Sprite of each car and its top-left corner, placed as Car.draw does (get_rect(center=...))
+        num_sprites, size = self.car_masks.shape[:2]
+        sprite_indices = np.round(angles_deg.astype(np.float64) / CAR_SPRITE_ANGLE_STEP_DEG).astype(np.intp) % num_sprites
+        sprites = get_car_sprites()
+        corners = np.array([sprites[index].get_rect(center=(float(x), float(y))).topleft
+                            for index, x, y in zip(sprite_indices, xs, ys)], dtype=np.intp).reshape(-1, 2)
+        sprite_x = world_x - corners[:, 0, None, None]
+        sprite_y = world_y - corners[:, 1, None, None]
+        inside = (sprite_x >= 0) & (sprite_x < size) & (sprite_y >= 0) & (sprite_y < size)
+        # Flat mask indices (np.take is much faster than indexing the 3-D stack)
+        mask_indices = np.clip(sprite_y, 0, size - 1)
+        mask_indices *= size
+        mask_indices = mask_indices + np.clip(sprite_x, 0, size - 1)
+        mask_indices += (sprite_indices * (size * size))[:, None, None]
+        inside &= np.take(self.car_masks.reshape(-1), mask_indices)
+        np.copyto(out[window], CAR_LEVEL, where=inside)
+
+#----------------------------------------------Consistency Check
+def compare_with_pygame(road_type, heading_aligned, num_poses=50, seed=0):
+    """
+    Renders random poses whose view lies inside the screen both with BatchRenderer and the way
+    data_generator.py does (pygame road + Car.draw + get_camera_view / get_rotated_camera_view).
+    Returns the number of frames compared and the fraction of pixels that differ.
+    """
+    from simulator import (
+        Car, draw_road, draw_lane_lines, get_camera_view, CAMERA_Y_OFFSET_FROM_CAR_CENTER
+    )
+    from camera_sampling import get_rotated_camera_view
+
+    rng = np.random.default_rng(seed)
+    renderer = BatchRenderer(road_type, heading_aligned=heading_aligned)
+    screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    poses = []
+    while len(poses) < num_poses:
+        car = Car(rng.uniform(0, SCREEN_WIDTH), rng.uniform(0, SCREEN_HEIGHT), rng.uniform(0, 360))
+        if heading_aligned:
+            car.camera_offset_y = rng.uniform(-90, -50)
+            world_x, world_y = renderer.grid.world_coords([car.x], [car.y], [car.angle], [car.camera_offset_y])
+            inside = (world_x.min() >= 0 and world_x.max() < SCREEN_WIDTH
+                      and world_y.min() >= 0 and world_y.max() < SCREEN_HEIGHT)
+        else:
+            car.camera_offset_y = CAMERA_Y_OFFSET_FROM_CAR_CENTER
+            left, top = car.x - CAMERA_WIDTH / 2, car.y + car.camera_offset_y
+            inside = left >= 0 and left + CAMERA_WIDTH <= SCREEN_WIDTH and top >= 0 and top + CAMERA_HEIGHT <= SCREEN_HEIGHT
+        if inside:
+            poses.append(car)
+
+    frames = renderer.render([car.x for car in poses], [car.y for car in poses],
+                             [car.angle for car in poses], [car.camera_offset_y for car in poses])
+    different = 0
+    for car, frame in zip(poses, frames):
+        screen.fill(BLACK)
+        if road_type == "straight":
+            draw_road(screen)
+            draw_lane_lines(screen)
+        else:
+            draw_curved_road(screen, CURVE_CENTER_X, CURVE_CENTER_Y, CURVE_RADIUS,
+                             CURVE_START_ANGLE_DEG, CURVE_END_ANGLE_DEG, ROAD_WIDTH)
+            draw_curved_lane_lines(screen, CURVE_CENTER_X, CURVE_CENTER_Y, CURVE_RADIUS,
+                                   CURVE_START_ANGLE_DEG, CURVE_END_ANGLE_DEG, LANE_WIDTH, LANE_LINE_WIDTH)
+        car.draw(screen)
+        if heading_aligned:
+            view, _ = get_rotated_camera_view(screen, car, renderer.grid)
+        else:
+            view, _ = get_camera_view(screen, car)
+        different += np.count_nonzero((view * 255).astype(np.uint8) != frame)
+    return len(poses), different / frames.size
+
+#----------------------------------------------Throughput Check
+if __name__ == "__main__":
+    import time
+
+    for road_type in ("straight", "curved"):
+        for heading_aligned in (False, True):
+            num_poses, mismatch = compare_with_pygame(road_type, heading_aligned)
+            camera = "heading" if heading_aligned else "fixed"
+            print(f"{road_type}, {camera} camera: {mismatch:.4%} of pixels differ from pygame over {num_poses} poses")
+
+    num_cars = 256
+    frames = np.empty((num_cars, CAMERA_HEIGHT, CAMERA_WIDTH), dtype=np.uint8) # Reused every call
+    for road_type in ("straight", "curved"):
+        renderer = BatchRenderer(road_type)
+        xs = np.random.uniform(SCREEN_WIDTH / 2 - 100, SCREEN_WIDTH / 2 + 100, num_cars)
+        ys = np.random.uniform(100, 300, num_cars)
+        angles = np.random.uniform(60, 120, num_cars)
+        offsets = np.full(num_cars, -70.0)
+
+        start_time = time.perf_counter()
+        for _ in range(10):
+            renderer.render(xs, ys, angles, offsets, out=frames)
+        elapsed = time.perf_counter() - start_time
+        print(f"{road_type}: {10 * num_cars / elapsed:.0f} frames/s ({num_cars} cars per call)")
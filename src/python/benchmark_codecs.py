@@ -0,0 +1,73 @@
+#----------------------------------------------libraries
+import time
+import json
+import argparse
+import numpy as np
+
+from image_codec import get_codec, load_frame, find_frame_files, lz4
+
+#-------------------------------------------------------
+# Encode/decode throughput and size of every image codec on real frames,
+# to choose IMAGE_CODEC in data_generator.py (disk space vs time per sample).
+DEFAULT_FRAMES_DIR = "data"
+DEFAULT_CODECS = ["png", "png:1", "png:0", "tiff", "npy"] + (["lz4"] if lz4 is not None else [])
+MIN_SECONDS_PER_CODEC = 1.0 # Each measurement repeats the frame set for at least this long
+
+#-------------------------------------------------------Benchmark Functions
+
+def find_frames(frames_dir, max_frames):
+    """Loads up to max_frames frames (any codec) found under frames_dir."""
+    frames = [load_frame(path) for path in find_frame_files(frames_dir)[:max_frames]]
+    if not frames:
+        raise FileNotFoundError(f"No frames found under {frames_dir}")
+    return frames
+
+def _time_per_item(function, items):
+    """Mean seconds per call of function over items, repeating the whole list for MIN_SECONDS_PER_CODEC."""
+    calls = 0
+    start_time = time.perf_counter()
+    while True:
+        for item in items:
+            function(item)
+        calls += len(items)
+        elapsed = time.perf_counter() - start_time
+        if elapsed >= MIN_SECONDS_PER_CODEC:
+            return elapsed / calls
+
+def benchmark_codec(spec, frames):
+    codec = get_codec(spec)
+    encoded = [codec.encode(frame) for frame in frames]
+    lossless = all(np.array_equal(codec.decode(data), frame) for data, frame in zip(encoded, frames))
+    raw_bytes = np.mean([frame.nbytes for frame in frames])
+    mean_bytes = np.mean([len(data) for data in encoded])
+    encode_s = _time_per_item(codec.encode, frames)
+    decode_s = _time_per_item(codec.decode, encoded)
+    return {
+        "codec": spec, "extension": codec.extension, "lossless": lossless,
+        "mean_bytes": float(mean_bytes), "ratio": float(raw_bytes / mean_bytes),
+        "encode_ms": encode_s * 1e3, "decode_ms": decode_s * 1e3,
+        "encode_mb_s": raw_bytes / encode_s / 1e6, "decode_mb_s": raw_bytes / decode_s / 1e6,
+    }
+
+#-------------------------------------------------------Main Execution Block:
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare image codecs on camera frames.")
+    parser.add_argument("--frames-dir", default=DEFAULT_FRAMES_DIR, help="Directory searched for frames")
+    parser.add_argument("--max-frames", type=int, default=500)
+    parser.add_argument("--codecs", nargs="+", default=DEFAULT_CODECS)
+    parser.add_argument("--json", default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    frames = find_frames(args.frames_dir, args.max_frames)
+    print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]} from {args.frames_dir}")
+    print(f"{'codec':<8} {'bytes':>8} {'ratio':>6} {'enc ms':>8} {'dec ms':>8} {'enc MB/s':>9} {'dec MB/s':>9}  lossless")
+    results = []
+    for spec in args.codecs:
+        result = benchmark_codec(spec, frames)
+        results.append(result)
+        print(f"{spec:<8} {result['mean_bytes']:8.0f} {result['ratio']:6.2f} {result['encode_ms']:8.3f} "
+              f"{result['decode_ms']:8.3f} {result['encode_mb_s']:9.1f} {result['decode_mb_s']:9.1f}  {result['lossless']}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"num_frames": len(frames), "results": results}, f, indent=2)
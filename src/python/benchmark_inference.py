@@ -0,0 +1,172 @@
+#----------------------------------------------libraries
+import os
+import time
+import json
+import argparse
+import itertools
+import numpy as np
+import onnxruntime as ort
+
+from image_codec import find_frame_files, load_frame
+from preprocessing import Preprocessor
+
+#-------------------------------------------------------
+# Latency/throughput sweep of an exported ONNX model over ONNX Runtime session settings,
+# on the real frames in data/test_images, to pick deployment settings (e.g. for inference_real.cpp,
+# which uses 1 intra-op thread, sequential execution and ORT_ENABLE_EXTENDED).
+# Every combination of intra-op threads x inter-op threads x execution mode x graph optimization
+# level gets one session, timed at every batch size; inter-op threads only matter in parallel mode.
+# Models with uint8 input (model_export.py --fused) get raw frames, float models get Preprocessor output.
+MODEL_PATH = "models/nvidia_pilotnet.onnx"
+FRAMES_DIR = "data/test_images"
+INTRA_OP_THREADS = [1, 2, 4]
+INTER_OP_THREADS = [1, 2]
+EXECUTION_MODES = {"sequential": ort.ExecutionMode.ORT_SEQUENTIAL,
+                   "parallel": ort.ExecutionMode.ORT_PARALLEL}
+OPTIMIZATION_LEVELS = {"disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+                       "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+                       "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+                       "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL}
+BATCH_SIZES = [1, 8, 32, 128]
+WARMUP_RUNS = 5
+MIN_RUNS = 20
+MIN_SECONDS_PER_SETTING = 1.0 # Each (session, batch size) is timed for at least MIN_RUNS and this long
+TOP_OPERATORS = 10 # Operators listed per profiled session
+
+#-------------------------------------------------------Inputs
+
+def load_model_inputs(model_path, frames_dir):
+    """All frames under frames_dir, as the model expects them (raw uint8 or preprocessed float32)."""
+    paths = find_frame_files(frames_dir)
+    if not paths:
+        raise FileNotFoundError(f"No frames found under {frames_dir}")
+    frames = np.stack([load_frame(path) for path in paths])
+    session = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+    if session.get_inputs()[0].type == "tensor(uint8)":
+        return frames
+    return Preprocessor()(frames)
+
+def sweep_settings(intra_op_threads, inter_op_threads, execution_modes, optimization_levels):
+    """The (intra, inter, mode, level) combinations to run, without inter-op duplicates in sequential mode."""
+    settings = []
+    for intra, inter, mode, level in itertools.product(intra_op_threads, inter_op_threads,
+                                                        execution_modes, optimization_levels):
+        if mode == "sequential" and inter != inter_op_threads[0]:
+            continue # Sequential execution never uses the inter-op pool
+        settings.append((intra, inter if mode == "parallel" else None, mode, level))
+    return settings
+
+#-------------------------------------------------------Benchmark
+
+def create_session(model_path, intra, inter, mode, level, profile_prefix=None):
+    session_options = ort.SessionOptions()
+    session_options.intra_op_num_threads = intra
+    if inter is not None:
+        session_options.inter_op_num_threads = inter
+    session_options.execution_mode = EXECUTION_MODES[mode]
+    session_options.graph_optimization_level = OPTIMIZATION_LEVELS[level]
+    if profile_prefix is not None:
+        session_options.enable_profiling = True
+        session_options.profile_file_prefix = profile_prefix
+    return ort.InferenceSession(model_path, session_options, providers=["CPUExecutionProvider"])
+
+def time_batch(session, model_inputs, batch_size):
+    """Latency statistics of Run() at one batch size (frames repeated if there are fewer)."""
+    input_name = session.get_inputs()[0].name
+    batch = np.resize(model_inputs, (batch_size, *model_inputs.shape[1:]))
+    for _ in range(WARMUP_RUNS):
+        session.run(None, {input_name: batch})
+    timings = []
+    start_time = time.perf_counter()
+    while len(timings) < MIN_RUNS or time.perf_counter() - start_time < MIN_SECONDS_PER_SETTING:
+        run_start = time.perf_counter()
+        session.run(None, {input_name: batch})
+        timings.append(time.perf_counter() - run_start)
+    timings = np.array(timings) * 1e3
+    return {"runs": len(timings),
+            "p50_ms": float(np.percentile(timings, 50)), "p99_ms": float(np.percentile(timings, 99)),
+            "fps": float(batch_size / (timings.mean() / 1e3))}
+
+def summarize_profile(profile_path, top=TOP_OPERATORS):
+    """Total time per operator type from an ORT profile (Node events), longest first."""
+    with open(profile_path) as f:
+        events = json.load(f)
+    totals = {}
+    for event in events:
+        if event.get("cat") == "Node" and event.get("name", "").endswith("_kernel_time"):
+            op_name = event.get("args", {}).get("op_name", "?")
+            totals[op_name] = totals.get(op_name, 0) + event["dur"]
+    total_us = sum(totals.values()) or 1
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{"op": op, "total_us": duration, "share": duration / total_us} for op, duration in ranked]
+
+def _describe(result):
+    inter = result["inter_op_threads"]
+    return (f"intra={result['intra_op_threads']}" + (f" inter={inter}" if inter else "")
+            + f" {result['execution_mode']} {result['optimization_level']}")
+
+def run_sweep(model_path, model_inputs, settings, batch_sizes, profile_dir=None):
+    results = []
+    for intra, inter, mode, level in settings:
+        profile_prefix = None
+        if profile_dir is not None:
+            os.makedirs(profile_dir, exist_ok=True)
+            profile_prefix = os.path.join(profile_dir, f"ort_intra{intra}_inter{inter or 0}_{mode}_{level}")
+        session = create_session(model_path, intra, inter, mode, level, profile_prefix)
+        result = {"intra_op_threads": intra, "inter_op_threads": inter, "execution_mode": mode,
+                  "optimization_level": level,
+                  "batches": {batch_size: time_batch(session, model_inputs, batch_size) for batch_size in batch_sizes}}
+        if profile_prefix is not None:
+            result["profile_path"] = session.end_profiling()
+            result["top_operators"] = summarize_profile(result["profile_path"])
+        results.append(result)
+        best = max(result["batches"].values(), key=lambda stats: stats["fps"])
+        print(f"  {_describe(result)}: best {best['fps']:.0f} frames/s")
+    return results
+
+def print_table(results, batch_sizes):
+    print(f"{'intra':>5} {'inter':>5} {'mode':<10} {'opt':<8} {'batch':>5} {'p50 ms':>8} {'p99 ms':>8} {'frames/s':>9}")
+    for result in results:
+        for batch_size in batch_sizes:
+            stats = result["batches"][batch_size]
+            print(f"{result['intra_op_threads']:>5} {result['inter_op_threads'] or '-':>5} "
+                  f"{result['execution_mode']:<10} {result['optimization_level']:<8} {batch_size:>5} "
+                  f"{stats['p50_ms']:8.3f} {stats['p99_ms']:8.3f} {stats['fps']:9.0f}")
+    for batch_size in batch_sizes:
+        best_latency = min(results, key=lambda result: result["batches"][batch_size]["p50_ms"])
+        best_throughput = max(results, key=lambda result: result["batches"][batch_size]["fps"])
+        print(f"batch {batch_size}: lowest p50 with {_describe(best_latency)}, "
+              f"highest frames/s with {_describe(best_throughput)}")
+    for result in results:
+        if "top_operators" in result:
+            operators = ", ".join(f"{entry['op']} {entry['share']:.0%}" for entry in result["top_operators"][:5])
+            print(f"profile {_describe(result)}: {operators}")
+
+#-------------------------------------------------------Main Execution Block:
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep ONNX Runtime settings for the exported model.")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--frames-dir", default=FRAMES_DIR)
+    parser.add_argument("--intra-op-threads", type=int, nargs="+", default=INTRA_OP_THREADS)
+    parser.add_argument("--inter-op-threads", type=int, nargs="+", default=INTER_OP_THREADS)
+    parser.add_argument("--execution-modes", nargs="+", choices=list(EXECUTION_MODES), default=list(EXECUTION_MODES))
+    parser.add_argument("--optimization-levels", nargs="+", choices=list(OPTIMIZATION_LEVELS),
+                        default=list(OPTIMIZATION_LEVELS))
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=BATCH_SIZES)
+    parser.add_argument("--profile-dir", default=None,
+                        help="Enable ORT per-operator profiling and write the profiles here")
+    parser.add_argument("--json", default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    model_inputs = load_model_inputs(args.model, args.frames_dir)
+    settings = sweep_settings(args.intra_op_threads, args.inter_op_threads, args.execution_modes,
+                              args.optimization_levels)
+    print(f"{len(model_inputs)} frames from {args.frames_dir}, {len(settings)} session settings "
+          f"x {len(args.batch_sizes)} batch sizes ({os.cpu_count()} CPUs)")
+    results = run_sweep(args.model, model_inputs, settings, args.batch_sizes, args.profile_dir)
+    print_table(results, args.batch_sizes)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"model": args.model, "num_frames": len(model_inputs), "cpu_count": os.cpu_count(),
+                       "results": results}, f, indent=2)
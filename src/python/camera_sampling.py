@@ -0,0 +1,129 @@
+#----------------------------------------------libraries
+import pygame
+import numpy as np
+
+from simulator import CAMERA_WIDTH, CAMERA_HEIGHT
+
+#-------------------------------------------------------
+# Luminosity weights used by get_camera_view: 0.2989*R + 0.5870*G + 0.1140*B
+GRAYSCALE_WEIGHTS = np.array([0.2989, 0.5870, 0.1140], dtype=np.float32)
+
+#-----------------------------------------------------CameraGrid class
+# A heading-aligned camera: the image "up" direction is the car's heading, so lanes
+# always appear in the same orientation and there are no black corners on curves.
+# Instead of rotating the whole screen, each camera pixel is mapped to a world
+# position and the world is sampled there (a gather).
+class CameraGrid:
+    """
+    Precomputed sampling grid of a heading-aligned camera.
+    The base grid (pixel centres in the car's frame) is built once; each frame it is only
+    rotated by the car heading and translated to the car position.
+    The top row is -camera_offset_y pixels in front of the car centre and the image is
+    centred on the car laterally. It differs from get_camera_view in two ways:
+    - the offset is each car's camera_offset_y (jittered by data_generator.py), while
+      get_camera_view always uses CAMERA_Y_OFFSET_FROM_CAR_CENTER;
+    - get_camera_view clamps its rect to the screen, while samples outside the world are black here.
+    So the two only give the same image for a car heading up (90 degrees) with the default
+    camera_offset_y and a view that lies fully inside the screen.
+    """
+    def __init__(self, width=CAMERA_WIDTH, height=CAMERA_HEIGHT):
+        self.width = width
+        self.height = height
+        # Lateral distance of each column centre from the car's axis (positive = right), shape (1, W)
+        self.lateral = (np.arange(width, dtype=np.float32) + 0.5 - width / 2)[None, :]
+        # Distance of each row centre ahead of the camera's top edge (negative = behind), shape (H, 1)
+        self.forward = -(np.arange(height, dtype=np.float32) + 0.5)[:, None]
+
+    def world_coords(self, xs, ys, angles_deg, camera_offsets_y):
+        """
+        Maps the grid to world coordinates for N car poses (1-D arrays of length N).
+        Angles use the Car convention (degrees, 0=right, 90=up, Pygame y pointing down).
+        Returns (world_x, world_y), each of shape (N, H, W).
+        """
+        xs = np.asarray(xs, dtype=np.float32).reshape(-1, 1, 1)
+        ys = np.asarray(ys, dtype=np.float32).reshape(-1, 1, 1)
+        angles_rad = np.deg2rad(np.asarray(angles_deg, dtype=np.float32)).reshape(-1, 1, 1)
+        camera_offsets_y = np.asarray(camera_offsets_y, dtype=np.float32).reshape(-1, 1, 1)
+        cos_a = np.cos(angles_rad)
+        sin_a = np.sin(angles_rad)
+
+        # Forward distance of each row from the car centre, shape (N, H, 1)
+        forward = self.forward[None] - camera_offsets_y
+        # Heading unit vector is (cos, -sin) and the "right" unit vector is (sin, cos) in screen coords.
+        # Rows and columns are rotated separately and combined by broadcasting.
+        world_x = xs + cos_a * forward + sin_a * self.lateral[None]
+        world_y = ys - sin_a * forward + cos_a * self.lateral[None]
+        return world_x, world_y
+
+#-------------------------------------------------------Sampling Functions
+
+def sample_world(world_rgb, world_x, world_y, method="nearest"):
+    """
+    Gathers world pixels at the given world coordinates and converts them to grayscale.
+    world_rgb is indexed [x, y, channel] (the layout of pygame.surfarray.pixels3d).
+    Samples outside the world are black, like the off-road area.
+    method is "nearest" or "bilinear". Returns float32 values in the 0-255 range.
+    """
+    world_w, world_h = world_rgb.shape[0], world_rgb.shape[1]
+
+    if method == "nearest":
+        ix = np.floor(world_x).astype(np.int32)
+        iy = np.floor(world_y).astype(np.int32)
+        valid = (ix >= 0) & (ix < world_w) & (iy >= 0) & (iy < world_h)
+        rgb = world_rgb[np.clip(ix, 0, world_w - 1), np.clip(iy, 0, world_h - 1)]
+        gray = rgb.astype(np.float32) @ GRAYSCALE_WEIGHTS
+        gray[~valid] = 0
+        return gray
+
+    if method == "bilinear":
+        # Pixel centres are at integer + 0.5
+        u = world_x - 0.5
+        v = world_y - 0.5
+        x0 = np.floor(u).astype(np.int32)
+        y0 = np.floor(v).astype(np.int32)
+        fx = (u - x0).astype(np.float32)
+        fy = (v - y0).astype(np.float32)
+        gray = np.zeros(world_x.shape, dtype=np.float32)
+        for dx, dy, weight in ((0, 0, (1 - fx) * (1 - fy)), (1, 0, fx * (1 - fy)),
+                               (0, 1, (1 - fx) * fy), (1, 1, fx * fy)):
+            ix = x0 + dx
+            iy = y0 + dy
+            valid = (ix >= 0) & (ix < world_w) & (iy >= 0) & (iy < world_h)
+            rgb = world_rgb[np.clip(ix, 0, world_w - 1), np.clip(iy, 0, world_h - 1)]
+            gray += np.where(valid, rgb.astype(np.float32) @ GRAYSCALE_WEIGHTS, 0) * weight
+        return gray
+
+    raise ValueError(f"Unknown sampling method: {method}")
+
+#------------------------------------------------ Camera View Capture
+
+def get_rotated_camera_views(screen, cars, grid, origin=(0, 0), method="nearest"):
+    """
+    Heading-aligned counterpart of get_camera_view for a batch of cars.
+    Each car's camera_offset_y sets how far ahead its camera looks.
+    origin is the world position of the screen's top-left corner (see Car.draw).
+    Returns normalised grayscale views of shape (N, H, W) in the 0-1 range,
+    and the screen x/y of every camera pixel (for debug drawing).
+    """
+    world_x, world_y = grid.world_coords([car.x - origin[0] for car in cars],
+                                         [car.y - origin[1] for car in cars],
+                                         [car.angle for car in cars],
+                                         [car.camera_offset_y for car in cars])
+    world_rgb = pygame.surfarray.pixels3d(screen) # A view of the screen, no copy
+    gray = sample_world(world_rgb, world_x, world_y, method)
+    del world_rgb # Release the surface lock
+
+    # Normalize to 0-1 range
+    return gray / 255.0, (world_x, world_y)
+
+def get_rotated_camera_view(screen, car, grid, origin=(0, 0), method="nearest"):
+    """
+    Single-car version of get_rotated_camera_views.
+    Returns the (H, W) view and the camera's four corners in screen coordinates
+    (a polygon for pygame.draw.polygon, like the rect returned by get_camera_view).
+    """
+    views, (world_x, world_y) = get_rotated_camera_views(screen, [car], grid, origin, method)
+    last_row, last_col = grid.height - 1, grid.width - 1
+    corners = [(float(world_x[0, r, c]), float(world_y[0, r, c]))
+               for r, c in ((0, 0), (0, last_col), (last_row, last_col), (last_row, 0))]
+    return views[0], corners
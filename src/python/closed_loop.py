@@ -0,0 +1,266 @@
+#----------------------------------------------libraries
+import os
+import time
+import argparse
+import numpy as np
+import multiprocessing as mp
+
+from simulator import (
+    SCREEN_WIDTH, SCREEN_HEIGHT, BLACK,
+    LANE_WIDTH, ROAD_WIDTH, LANE_LINE_WIDTH, CAR_HEIGHT,
+    Car, draw_road, draw_lane_lines, get_camera_view,
+    CURVE_CENTER_X, CURVE_CENTER_Y, CURVE_RADIUS,
+    CURVE_START_ANGLE_DEG, CURVE_END_ANGLE_DEG,
+    draw_curved_road, draw_curved_lane_lines
+)
+from frame_ring import FrameRing, STOP_SEQUENCE
+from preprocessing import Preprocessor
+
+#-------------------------------------------------------
+# Closed-loop driving with the simulator and the ONNX model in separate processes.
+# The simulator renders each camera frame straight into a shared-memory FrameRing slot;
+# the inference process preprocesses it, runs the model and sends the steering back.
+# Every hop is timestamped, and the run ends with a per-hop latency report in microseconds.
+# Adaptive inference rate (skip_threshold): when the camera frame differs from the last frame the model
+# saw by less than skip_threshold grey levels (mean absolute difference), the model is not called and
+# the last steering command is reused ("hold") or extrapolated from the last two ("extrapolate").
+# At most max_skip frames in a row are skipped, so the model still runs at least every max_skip + 1 frames.
+MODEL_PATH = "models/nvidia_pilotnet.onnx"
+ROAD_TYPE = "curved"
+NUM_STEPS = 2000
+PIPELINE_DEPTH = 1 # Frames in flight: 1 = lockstep (each step waits for its own steering)
+INFERENCE_THREADS = 1 # ONNX Runtime intra-op threads in the inference process
+COMMAND_TIMEOUT_S = 10
+SKIP_THRESHOLD = None # Grey levels (0-255); None = run the model on every frame
+MAX_SKIP_FRAMES = 4 # At 60 Hz the steering is at most 5 frames (83 ms) old
+SKIP_STEERING = "hold" # Steering on skipped frames: "hold" or "extrapolate"
+
+#-------------------------------------------------------Inference Process
+
+def _inference_worker(ring, model_path, threads, timings_queue):
+    """Consumes frames until the stop marker; sends one steering command per frame."""
+    import onnxruntime as ort
+    session_options = ort.SessionOptions()
+    session_options.intra_op_num_threads = threads
+    session = ort.InferenceSession(model_path, session_options, providers=["CPUExecutionProvider"])
+    input_name = session.get_inputs()[0].name
+    preprocess = Preprocessor()
+
+    timings = [] # (sequence, published_ns, picked_ns, sent_ns) per frame
+    while True:
+        index, sequence, published_ns = ring.next_frame()
+        picked_ns = time.perf_counter_ns()
+        if sequence == STOP_SEQUENCE:
+            ring.release_slot(index)
+            break
+        model_input = preprocess(ring.frames[index]) # Copies the frame, so the slot can be reused now
+        ring.release_slot(index)
+        steering = float(session.run(None, {input_name: model_input})[0][0, 0])
+        sent_ns = ring.send_command(sequence, steering)
+        timings.append((sequence, published_ns, picked_ns, sent_ns))
+    timings_queue.put(np.array(timings, dtype=np.int64).reshape(-1, 4))
+    ring.close()
+
+#-------------------------------------------------------Simulator Side
+
+def draw_scene(screen, road_type):
+    screen.fill(BLACK)
+    if road_type == "straight":
+        draw_road(screen)
+        draw_lane_lines(screen)
+    else:
+        draw_curved_road(screen, CURVE_CENTER_X, CURVE_CENTER_Y, CURVE_RADIUS,
+                         CURVE_START_ANGLE_DEG, CURVE_END_ANGLE_DEG, ROAD_WIDTH)
+        draw_curved_lane_lines(screen, CURVE_CENTER_X, CURVE_CENTER_Y, CURVE_RADIUS,
+                               CURVE_START_ANGLE_DEG, CURVE_END_ANGLE_DEG, LANE_WIDTH, LANE_LINE_WIDTH)
+
+def start_car(road_type):
+    """The car at the start of the road (same start poses as data_generator.py)."""
+    if road_type == "straight":
+        return Car(SCREEN_WIDTH / 2, SCREEN_HEIGHT - CAR_HEIGHT - 50, angle=90)
+    return Car(CURVE_CENTER_X, CURVE_CENTER_Y - CURVE_RADIUS, angle=90)
+
+def lane_offset(car, road_type):
+    """Signed distance (pixels) of the car from the lane centre / ideal curve radius."""
+    if road_type == "straight":
+        return car.x - SCREEN_WIDTH / 2
+    return np.hypot(car.x - CURVE_CENTER_X, car.y - CURVE_CENTER_Y) - CURVE_RADIUS
+
+def end_of_road(car, road_type):
+    """True when the car has driven past the end of the road (a normal end of episode)."""
+    if road_type == "straight":
+        return car.y < -CAR_HEIGHT
+    polar_angle_deg = np.degrees(np.arctan2(CURVE_CENTER_Y - car.y, car.x - CURVE_CENTER_X)) % 360
+    return polar_angle_deg >= CURVE_END_ANGLE_DEG
+
+def frame_difference(frame, reference):
+    """Mean absolute difference in grey levels between a uint8 frame and an int16 reference frame."""
+    return float(np.mean(np.abs(frame.astype(np.int16) - reference)))
+
+def skipped_steering(commands, step, mode):
+    """
+    Steering for a skipped frame from the last commands [(frame, steering), ...]:
+    the last one ("hold"), or a linear extrapolation of the last two ("extrapolate").
+    """
+    last_frame, last_steering = commands[-1]
+    if mode == "hold" or len(commands) < 2:
+        return last_steering
+    previous_frame, previous_steering = commands[-2]
+    slope = (last_steering - previous_steering) / (last_frame - previous_frame)
+    return last_steering + slope * (step - last_frame)
+
+def _latency_stats_us(durations_ns):
+    return {"p50": float(np.percentile(durations_ns, 50)) / 1e3,
+            "p99": float(np.percentile(durations_ns, 99)) / 1e3,
+            "mean": float(np.mean(durations_ns)) / 1e3}
+
+def run_closed_loop(road_type=ROAD_TYPE, num_steps=NUM_STEPS, model_path=MODEL_PATH,
+                    pipeline_depth=PIPELINE_DEPTH, threads=INFERENCE_THREADS, display=False,
+                    skip_threshold=SKIP_THRESHOLD, max_skip=MAX_SKIP_FRAMES, skip_steering=SKIP_STEERING):
+    """
+    Drives num_steps simulation steps with the model in a separate process.
+    With pipeline_depth > 1 the simulator keeps rendering while earlier frames are
+    still being inferred, and applies each steering command when it arrives.
+    With skip_threshold, nearly unchanged frames are not inferred (see the module comment);
+    frames are only skipped when no other frame is in flight.
+    Returns a report dict with lane-keeping, inference-call and per-hop latency statistics (microseconds).
+    """
+    import pygame
+    if not display:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Closed-Loop Lane Keeping")
+
+    ring = FrameRing(num_slots=max(pipeline_depth, 1) + 1)
+    timings_queue = mp.Queue()
+    worker = mp.Process(target=_inference_worker, args=(ring, model_path, threads, timings_queue))
+    worker.start()
+
+    car = start_car(road_type)
+    offsets = []
+    received = [] # (sequence, received_ns) per command
+    episodes = off_road = 0
+    in_flight = 0
+    commands = [] # (frame, steering) of the last two commands, for skipped frames
+    reference_frame = np.zeros(ring.frame_shape, dtype=np.int16) # The last frame sent to the model
+    has_reference = False
+    skipped = skipped_in_row = 0
+    start_time = time.perf_counter()
+    try:
+        for step in range(num_steps):
+            draw_scene(screen, road_type)
+            car.draw(screen)
+            # The camera frame is written straight into the shared slot
+            slot = ring.acquire_slot(timeout=COMMAND_TIMEOUT_S)
+            frame = ring.frames[slot]
+            get_camera_view(screen, car, out=frame)
+            if display:
+                pygame.event.pump()
+                pygame.display.flip()
+
+            if (skip_threshold is not None and has_reference and in_flight == 0 and skipped_in_row < max_skip
+                    and frame_difference(frame, reference_frame) < skip_threshold):
+                ring.discard_slot(slot)
+                skipped += 1
+                skipped_in_row += 1
+                car.steer_curved_road(skipped_steering(commands, step, skip_steering))
+            else:
+                if skip_threshold is not None:
+                    reference_frame[:] = frame
+                    has_reference = True
+                    skipped_in_row = 0
+                ring.publish(slot, step)
+                in_flight += 1
+
+            while in_flight >= pipeline_depth:
+                command = ring.receive_command(timeout=COMMAND_TIMEOUT_S)
+                if command is None:
+                    raise TimeoutError("No steering from the inference process")
+                received.append((command[0], time.perf_counter_ns()))
+                in_flight -= 1
+                car.steer_curved_road(command[1])
+                commands = (commands + [command[:2]])[-2:]
+
+            car.move()
+            offsets.append(lane_offset(car, road_type))
+            left_road = abs(offsets[-1]) > ROAD_WIDTH / 2 or car.y > SCREEN_HEIGHT + CAR_HEIGHT
+            if left_road or end_of_road(car, road_type):
+                off_road += int(left_road)
+                episodes += 1
+                car = start_car(road_type)
+                has_reference = False # The new episode's first frame is always inferred
+
+        while in_flight > 0: # Collect the last commands
+            command = ring.receive_command(timeout=COMMAND_TIMEOUT_S)
+            if command is None:
+                raise TimeoutError("No steering from the inference process")
+            received.append((command[0], time.perf_counter_ns()))
+            in_flight -= 1
+        elapsed = time.perf_counter() - start_time
+        ring.stop()
+        timings = timings_queue.get(timeout=COMMAND_TIMEOUT_S)
+        worker.join()
+    finally:
+        if worker.is_alive():
+            worker.terminate()
+        ring.close()
+        ring.unlink()
+        pygame.quit()
+
+    # Per-hop latencies, matched by frame number
+    received = dict(received)
+    sequences, published_ns, picked_ns, sent_ns = timings.T
+    received_ns = np.array([received[sequence] for sequence in sequences])
+    offsets = np.abs(offsets)
+    return {
+        "road_type": road_type, "num_steps": num_steps, "pipeline_depth": pipeline_depth,
+        "steps_per_s": num_steps / elapsed,
+        "mean_abs_lane_offset_px": float(offsets.mean()), "max_abs_lane_offset_px": float(offsets.max()),
+        "episodes": episodes, "off_road": off_road,
+        "inference_calls": num_steps - skipped, "skipped_frames": skipped,
+        "call_reduction": skipped / num_steps,
+        "latency_us": {
+            "frame_hop": _latency_stats_us(picked_ns - published_ns), # Publish -> inference process has it
+            "inference": _latency_stats_us(sent_ns - picked_ns), # Preprocess + model
+            "command_hop": _latency_stats_us(received_ns - sent_ns), # Steering sent -> simulator has it
+            "round_trip": _latency_stats_us(received_ns - published_ns),
+        },
+    }
+
+#-------------------------------------------------------Main Execution Block:
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Closed-loop driving with the model in a separate process.")
+    parser.add_argument("--road-type", choices=["straight", "curved"], default=ROAD_TYPE)
+    parser.add_argument("--steps", type=int, default=NUM_STEPS)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--pipeline-depth", type=int, default=PIPELINE_DEPTH,
+                        help="Frames in flight (1 = lockstep, more overlaps rendering and inference)")
+    parser.add_argument("--threads", type=int, default=INFERENCE_THREADS, help="ONNX Runtime intra-op threads")
+    parser.add_argument("--display", action="store_true", help="Show the pygame window (default: headless)")
+    parser.add_argument("--skip-threshold", type=float, default=SKIP_THRESHOLD,
+                        help="Skip inference below this mean frame difference (grey levels)")
+    parser.add_argument("--max-skip", type=int, default=MAX_SKIP_FRAMES, help="Most frames skipped in a row")
+    parser.add_argument("--skip-steering", choices=["hold", "extrapolate"], default=SKIP_STEERING)
+    parser.add_argument("--compare", action="store_true",
+                        help="With --skip-threshold, also drive with inference on every frame and compare")
+    args = parser.parse_args()
+
+    report = run_closed_loop(args.road_type, args.steps, args.model, args.pipeline_depth, args.threads, args.display,
+                             args.skip_threshold, args.max_skip, args.skip_steering)
+    print(f"{report['num_steps']} steps at {report['steps_per_s']:.0f} steps/s, "
+          f"mean |lane offset| {report['mean_abs_lane_offset_px']:.1f} px, "
+          f"{report['episodes']} episodes ({report['off_road']} off road)")
+    if args.skip_threshold is not None:
+        print(f"{report['inference_calls']} inference calls ({report['call_reduction']:.0%} fewer), "
+              f"steering {args.skip_steering} on skipped frames")
+        if args.compare:
+            baseline = run_closed_loop(args.road_type, args.steps, args.model, args.pipeline_depth, args.threads)
+            print(f"every frame: mean |lane offset| {baseline['mean_abs_lane_offset_px']:.1f} px, "
+                  f"max {baseline['max_abs_lane_offset_px']:.1f} px, {baseline['off_road']} off road; "
+                  f"adaptive: change in mean |lane offset| "
+                  f"{report['mean_abs_lane_offset_px'] - baseline['mean_abs_lane_offset_px']:+.2f} px, "
+                  f"max {report['max_abs_lane_offset_px']:.1f} px")
+    print(f"{'hop':<12} {'p50 us':>9} {'p99 us':>9} {'mean us':>9}")
+    for hop, stats in report["latency_us"].items():
+        print(f"{hop:<12} {stats['p50']:9.1f} {stats['p99']:9.1f} {stats['mean']:9.1f}")
@@ -0,0 +1,96 @@
+#----------------------------------------------libraries
+import os
+import glob
+import json
+import numpy as np
+
+#-------------------------------------------------------
+# A minimal columnar table on top of NumPy: rows are buffered in memory and every
+# batch is written as one compressed .npz "part" holding one array per column.
+# Readers load only the columns they ask for (.npz members are read lazily),
+# so nothing has to be parsed from text.
+PART_PATTERN = "part_{:05d}.npz"
+METADATA_FILENAME = "metadata.json"
+
+#-----------------------------------------------------ColumnarWriter class
+class ColumnarWriter:
+    """
+    Appends rows to a columnar table directory, flushing every batch_size rows.
+    columns maps column name -> NumPy dtype (use a "U<n>" dtype for strings).
+    With overwrite=True any existing parts are removed; otherwise new parts are appended after them.
+    """
+    def __init__(self, table_dir, columns, batch_size=1000, overwrite=True):
+        self.table_dir = table_dir
+        self.columns = columns
+        self.batch_size = batch_size
+        os.makedirs(table_dir, exist_ok=True)
+        existing_parts = _part_paths(table_dir)
+        if overwrite:
+            for path in existing_parts:
+                os.remove(path)
+            existing_parts = []
+        self.next_part = len(existing_parts)
+        self._buffer = {name: [] for name in columns}
+
+    def append(self, **row):
+        """Buffers one row (a value for every column) and flushes full batches."""
+        for name in self.columns:
+            self._buffer[name].append(row[name])
+        if len(self._buffer[next(iter(self.columns))]) >= self.batch_size:
+            self.flush()
+
+    def extend(self, **columns):
+        """Buffers many rows at once, given as one sequence per column."""
+        for name in self.columns:
+            self._buffer[name].extend(columns[name])
+        if len(self._buffer[next(iter(self.columns))]) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered rows as a new part. The part appears atomically (write then rename)."""
+        if not self._buffer[next(iter(self.columns))]:
+            return
+        arrays = {name: np.asarray(values, dtype=self.columns[name]) for name, values in self._buffer.items()}
+        part_path = os.path.join(self.table_dir, PART_PATTERN.format(self.next_part))
+        temp_path = part_path + ".tmp.npz"
+        np.savez_compressed(temp_path, **arrays)
+        os.replace(temp_path, part_path)
+        self.next_part += 1
+        self._buffer = {name: [] for name in self.columns}
+
+    def close(self):
+        self.flush()
+
+#-------------------------------------------------------Reading Functions
+
+def _part_paths(table_dir):
+    return sorted(path for path in glob.glob(os.path.join(table_dir, "part_*.npz"))
+                  if not path.endswith(".tmp.npz"))
+
+def read_columns(table_dir, columns=None):
+    """
+    Loads a columnar table as a dict of column name -> 1-D array.
+    Only the requested columns are read (all columns if None).
+    """
+    parts = {}
+    for path in _part_paths(table_dir):
+        with np.load(path) as part:
+            for name in (columns if columns is not None else part.files):
+                parts.setdefault(name, []).append(part[name])
+    if columns is not None:
+        missing = [name for name in columns if name not in parts]
+        if missing and parts:
+            raise KeyError(f"Columns {missing} not found in {table_dir}")
+    return {name: np.concatenate(arrays) for name, arrays in parts.items()}
+
+def write_metadata(table_dir, metadata):
+    """Stores run-level information (configuration, seed, ...) next to the table."""
+    os.makedirs(table_dir, exist_ok=True)
+    temp_path = os.path.join(table_dir, METADATA_FILENAME + ".tmp")
+    with open(temp_path, 'w') as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(temp_path, os.path.join(table_dir, METADATA_FILENAME))
+
+def read_metadata(table_dir):
+    with open(os.path.join(table_dir, METADATA_FILENAME)) as f:
+        return json.load(f)
@@ -1,13 +1,37 @@
 import os
 import shutil
+import argparse
 import pandas as pd
 
+from columnar import ColumnarWriter, read_columns
+from verify_data import read_quarantine
+from image_codec import get_codec, save_frame, load_frame
+from render_trajectory import RENDERS_SUBDIR
+
 base_data_dir = "data/all_data"
 master_images_dir = os.path.join(base_data_dir, "all_images")
 master_labels_filepath = os.path.join(base_data_dir, "combined_labels.csv")
+# Columnar copy of the combined labels (plus where each image came from), for readers
+# that want to load columns without parsing the CSV (see columnar.read_columns)
+master_telemetry_dir = os.path.join(base_data_dir, "combined_telemetry")
+# None copies every image as it is; a codec spec (e.g. "png", see image_codec.py) re-encodes
+# all images to that one format, e.g. to turn fast-encoded .npy/.tiff runs into PNGs for training
+OUTPUT_CODEC = None
+output_codec = get_codec(OUTPUT_CODEC) if OUTPUT_CODEC is not None else None
+
+parser = argparse.ArgumentParser(description="Combine the images and labels of every run_v* directory.")
+parser.add_argument("--renders", default=None, metavar="CONFIG",
+                    help="Runs with render_trajectory.py frames in <run>/renders/CONFIG/ contribute those "
+                         "instead of their own images (e.g. heading_200x150_offsetlogged_png)")
+args = parser.parse_args()
 
 os.makedirs(master_images_dir, exist_ok=True)
 
+# Images flagged by `verify_data.py --quarantine` (corrupt, wrong size, bad label, ...) are left out
+quarantined = read_quarantine(base_data_dir)
+if quarantined:
+    print(f"Skipping {len(quarantined)} quarantined images.")
+
 all_subdirectories = [d for d in os.listdir(base_data_dir) if os.path.isdir(os.path.join(base_data_dir, d)) and d.startswith("run_v")]
 
 master_labels_data = []
@@ -15,39 +39,68 @@ global_image_counter = 0
 
 for subdir_name in sorted(all_subdirectories): # Sort to ensure consistent order
     subdir_path = os.path.join(base_data_dir, subdir_name)
+    source_name = subdir_name # Where the images come from, as recorded in source_run and the quarantine list
+    if args.renders is not None:
+        renders_path = os.path.join(subdir_path, RENDERS_SUBDIR, args.renders)
+        if os.path.isdir(renders_path):
+            subdir_path = renders_path
+            source_name = f"{subdir_name}/{RENDERS_SUBDIR}/{args.renders}"
     subdir_images_path = os.path.join(subdir_path, "images")
     subdir_labels_path = os.path.join(subdir_path, "labels.csv")
+    subdir_telemetry_path = os.path.join(subdir_path, "telemetry")
 
-    if not os.path.exists(subdir_labels_path):
-        print(f"Warning: labels.csv not found in {subdir_name}. Skipping.")
+    if os.path.isdir(subdir_telemetry_path):
+        # Runs with a telemetry table: read just the two columns needed, no text parsing
+        current_subdir_labels = read_columns(subdir_telemetry_path, ["image_filename", "steering_angle"])
+    elif os.path.exists(subdir_labels_path):
+        # Load labels from the current subdirectory
+        current_subdir_labels = pd.read_csv(subdir_labels_path)
+    else:
+        print(f"Warning: labels.csv not found in {source_name}. Skipping.")
         continue
 
-    # Load labels from the current subdirectory
-    current_subdir_labels = pd.read_csv(subdir_labels_path)
-
-    for index, row in current_subdir_labels.iterrows():
-        original_filename = row['image_filename']
-        steering_angle = row['steering_angle']
+    seen_filenames = set()
+    for original_filename, steering_angle in zip(current_subdir_labels['image_filename'],
+                                                 current_subdir_labels['steering_angle']):
 
         original_image_path = os.path.join(subdir_images_path, original_filename)
+        if f"{source_name}/{original_filename}" in quarantined:
+            continue
+        # Duplicate label rows (reported by verify_data.py): only the first row of an image is used
+        if original_filename in seen_filenames:
+            continue
+        seen_filenames.add(original_filename)
 
         # Generate a unique filename (e.g., using a global counter)
         # Or you can use: new_filename = f"{subdir_name}_{original_filename}"
-        new_filename = f"image_{global_image_counter:06d}.png" # 06d for 6 digits, adjust as needed for total samples
+        # Keep the source extension unless re-encoding
+        extension = output_codec.extension if output_codec is not None else original_filename[original_filename.index("."):]
+        new_filename = f"image_{global_image_counter:06d}{extension}" # 06d for 6 digits, adjust as needed for total samples
         new_image_path = os.path.join(master_images_dir, new_filename)
 
         # Copy the image to the master directory
         if os.path.exists(original_image_path):
-            shutil.copy(original_image_path, new_image_path)
-            master_labels_data.append({'image_filename': new_filename, 'steering_angle': steering_angle})
+            if output_codec is not None:
+                save_frame(output_codec, load_frame(original_image_path), new_image_path)
+            else:
+                shutil.copy(original_image_path, new_image_path)
+            master_labels_data.append({'image_filename': new_filename, 'steering_angle': steering_angle,
+                                       'source_run': source_name, 'source_filename': original_filename})
             global_image_counter += 1
         else:
             print(f"Warning: Image {original_image_path} not found. Skipping.")
 
 # Save the master labels file
-master_labels_df = pd.DataFrame(master_labels_data)
-master_labels_df.to_csv(master_labels_filepath, index=False)
+master_labels_df = pd.DataFrame(master_labels_data, columns=['image_filename', 'steering_angle',
+                                                             'source_run', 'source_filename'])
+master_labels_df[['image_filename', 'steering_angle']].to_csv(master_labels_filepath, index=False)
+
+telemetry_writer = ColumnarWriter(master_telemetry_dir, {
+    'image_filename': "U32", 'steering_angle': float, 'source_run': "U128", 'source_filename': "U64",
+})
+telemetry_writer.extend(**{name: master_labels_df[name].tolist() for name in master_labels_df.columns})
+telemetry_writer.close()
 
 print(f"Consolidation complete. Total unique images: {global_image_counter}")
-print(f"Master labels saved to: {master_labels_filepath}")
+print(f"Master labels saved to: {master_labels_filepath} (columnar copy: {master_telemetry_dir})")
 print(f"All images saved to: {master_images_dir}")
@@ -2,7 +2,8 @@
 import pygame
 import numpy as np
 import os
-from PIL import Image
+import json
+import argparse
 
 # --- Curve Following Constants ---
 LOOK_AHEAD_DISTANCE = 100 # How far ahead (in pixels) the car "looks" on the curve
@@ -21,6 +22,10 @@ from simulator import (
     CURVE_START_ANGLE_DEG, CURVE_END_ANGLE_DEG,
     draw_curved_road, draw_curved_lane_lines
 )
+from tiled_world import TiledWorld
+from camera_sampling import CameraGrid, get_rotated_camera_view
+from columnar import ColumnarWriter, write_metadata
+from image_codec import get_codec, save_frame, is_frame_file
 
 #-------------------------------------------------------
 # --- Data Generation Constants
@@ -29,37 +34,307 @@ DATA_DIR = "data"
 CURRENT_RUN_NAME = "data_real_inference_straight"
 NUM_SAMPLES = 50
 ROAD_TYPE = "straight" # Set to "straight" or "curved" here
+# Straight road only: drive continuously through a long TiledWorld (camera follows the car)
+# instead of teleporting the car back to the bottom of the 800x600 screen.
+USE_TILED_WORLD = False
+# "fixed": axis-aligned camera that always looks up the screen (get_camera_view)
+# "heading": camera aligned with the car's heading, sampled through a precomputed grid
+CAMERA_MODE = "fixed"
+
+# --- Sampling / Decorrelation Policy ---
+# The simulation steps every frame, but only steps that become samples are rendered and saved.
+# Consecutive frames at ~3 px/step are near-identical, so thinning them out gives more diverse data per image.
+SAMPLE_STRIDE = 1 # Consider every k-th simulation step for a sample (1 = every step)
+MIN_POSE_CHANGE = 0 # Minimum pose change since the last saved sample (0 = off), in pixels...
+POSE_CHANGE_PX_PER_DEG = 5 # ...where one degree of heading change counts as this many pixels of travel
+
+# --- Trajectory-First Generation ---
+# With TRAJECTORY_ONLY = True nothing is rendered: each sample is logged as compact per-step
+# state to a columnar table, and frames are materialised later (at any camera configuration)
+# by render_trajectory.py. Simulation then runs once however often the frames are re-rendered.
+TRAJECTORY_ONLY = False
+SEED = None # Seed for np.random (None = pick one); logged so runs can be reproduced
+
+# --- Image Encoding ---
+# Codec the frames are saved with (see image_codec.py): "png" (PIL default level 6), "png:1"
+# (much faster zlib, slightly larger files), "npy", "tiff" or "lz4". Run benchmark_codecs.py to compare.
+IMAGE_CODEC = "png"
 
 IMAGES_SUBDIR = os.path.join(DATA_DIR, CURRENT_RUN_NAME, "images")
 LABELS_FILE_PATH = os.path.join(DATA_DIR, CURRENT_RUN_NAME, "labels.csv")
+TRAJECTORY_DIR = os.path.join(DATA_DIR, CURRENT_RUN_NAME, "trajectory")
+TELEMETRY_DIR = os.path.join(DATA_DIR, CURRENT_RUN_NAME, "telemetry")
+CHECKPOINT_FILE_PATH = os.path.join(DATA_DIR, CURRENT_RUN_NAME, "checkpoint.json")
+
+# --- Checkpointing ---
+# Every CHECKPOINT_INTERVAL samples, labels and telemetry are flushed to disk and the full
+# generator state (sample counter, car, controller, RNG) is written atomically.
+# Running with --resume continues from the last committed sample instead of starting over.
+# Samples after the checkpoint are simulated again (labels and telemetry are rolled back), but
+# their frames are not rendered again if they are already on disk: the restored RNG state makes
+# them identical, and a new run clears the frames of the run it replaces.
+CHECKPOINT_INTERVAL = 250
+
+# Columns of the trajectory log (one row per sample)
+TRAJECTORY_COLUMNS = {
+    "step": np.int64, # Simulation step the sample was taken at
+    "x": np.float32, "y": np.float32, "angle": np.float32, "speed": np.float32,
+    "camera_offset_y": np.float32,
+    "steering_label": np.float64, # Full precision, as written to labels.csv
+    "target_lateral_offset": np.float32,
+    "seed": np.int64,
+}
+
+# --- Per-Frame Telemetry ---
+# Written next to labels.csv for every saved frame, in batches, as a columnar table
+# (see columnar.py). Readers such as combine_data.py load just the columns they need.
+TELEMETRY_BATCH_SIZE = 500 # Rows per flushed part
+TELEMETRY_COLUMNS = {
+    "image_filename": "U32",
+    "steering_angle": np.float64, # Same value as labels.csv
+    "step": np.int64,
+    "x": np.float32, "y": np.float32, "angle": np.float32, "speed": np.float32,
+    "camera_offset_y": np.float32,
+    "lateral_offset": np.float32, # Distance from the lane centre / ideal curve radius (pixels)
+    "angle_error": np.float32, # Desired heading minus car heading (degrees)
+    "target_lateral_offset": np.float32,
+    "episode": np.int32, # Incremented at every environment reset
+    "reset": np.bool_, # A reset happened since the previous saved frame
+}
+
+#-------------------------------------------------------Checkpointing
+
+def save_checkpoint(checkpoint_path, state):
+    """Atomically writes the generator state (a JSON-serialisable dict plus the NumPy RNG state)."""
+    rng_name, rng_keys, rng_pos, rng_has_gauss, rng_cached_gaussian = np.random.get_state()
+    state = dict(state, rng_state=[rng_name, rng_keys.tolist(), rng_pos, rng_has_gauss, rng_cached_gaussian])
+    temp_path = checkpoint_path + ".tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, checkpoint_path)
+
+def load_checkpoint(checkpoint_path):
+    """Reads a checkpoint written by save_checkpoint and restores the NumPy RNG state. Returns the state dict."""
+    with open(checkpoint_path) as f:
+        state = json.load(f)
+    rng_name, rng_keys, rng_pos, rng_has_gauss, rng_cached_gaussian = state.pop("rng_state")
+    np.random.set_state((rng_name, np.array(rng_keys, dtype=np.uint32), rng_pos, rng_has_gauss, rng_cached_gaussian))
+    return state
+
+def _append_durably(filepath, lines):
+    """Appends lines to a text file and forces them to disk. Returns the new file size."""
+    with open(filepath, 'a') as f:
+        f.writelines(lines)
+        f.flush()
+        os.fsync(f.fileno())
+        return f.tell()
+
+def _discard_parts_after(table_dir, next_part):
+    """Removes columnar parts written after the last checkpoint (they belong to uncommitted samples)."""
+    for filename in os.listdir(table_dir):
+        if filename.startswith("part_") and filename.endswith(".npz"):
+            part_index = filename[len("part_"):-len(".npz")]
+            if not part_index.isdigit() or int(part_index) >= next_part:
+                os.remove(os.path.join(table_dir, filename))
+
+#-------------------------------------------------------Sampling Policy
+
+def should_sample(step, car, last_sample_pose):
+    """
+    Decides from the car's pose alone (before anything is drawn) whether this
+    simulation step is rendered and saved, following SAMPLE_STRIDE and MIN_POSE_CHANGE.
+    last_sample_pose is (x, y, angle) of the last saved sample, or None.
+    """
+    if step % SAMPLE_STRIDE != 0:
+        return False
+    if last_sample_pose is None or MIN_POSE_CHANGE <= 0:
+        return True
+    last_x, last_y, last_angle = last_sample_pose
+    distance_moved = np.hypot(car.x - last_x, car.y - last_y)
+    heading_change = abs((car.angle - last_angle + 180) % 360 - 180)
+    return distance_moved + heading_change * POSE_CHANGE_PX_PER_DEG >= MIN_POSE_CHANGE
+
+#-------------------------------------------------------Curved Road Controller
+
+def curved_road_controller(x, y, angle, target_lateral_offset):
+    """
+    Pure pursuit-like steering label of the curved road for a car at (x, y) with heading angle.
+    Works on scalars or NumPy arrays (hard_examples.py labels whole batches of states).
+    Returns (steering_label, angle_error, offset_from_ideal_radius), before any random deviation.
+    """
+    # 1. Calculate car's position relative to the curve's center (for math coordinates)
+    car_rel_x = x - CURVE_CENTER_X
+    car_rel_y_math = -(y - CURVE_CENTER_Y) # Flip y-axis for standard math angles (y increases upwards)
+
+    # 2. Calculate the car's current angle relative to the curve's center (polar angle in math coords)
+    current_polar_angle_rad = np.arctan2(car_rel_y_math, car_rel_x)
+
+    # 3. Calculate the ideal target point on the curve (look-ahead point)
+    angular_step_rad = LOOK_AHEAD_DISTANCE / CURVE_RADIUS
+    target_polar_angle_rad = current_polar_angle_rad + angular_step_rad
+
+    # Calculate the target (x, y) coordinates on the ideal curve (Pygame coordinates)
+    target_x = CURVE_CENTER_X + CURVE_RADIUS * np.cos(target_polar_angle_rad)
+    target_y = CURVE_CENTER_Y - CURVE_RADIUS * np.sin(target_polar_angle_rad) # Flip y-axis back for Pygame display
+
+    # 4. Calculate the required heading angle for the car to point towards the target
+    dx = target_x - x
+    dy_for_arctan2 = y - target_y
+
+    angle_to_target_deg = np.degrees(np.arctan2(dy_for_arctan2, dx))
+    angle_to_target_deg = (angle_to_target_deg + 360) % 360
+
+    # 5. Calculate the difference between current car angle and desired angle
+    angle_error = angle_to_target_deg - angle
+    angle_error = (angle_error + 180) % 360 - 180
+
+    # 6. Calculate perpendicular distance from car to ideal curve (for offset correction)
+    offset_from_ideal_radius = np.sqrt(car_rel_x**2 + car_rel_y_math**2) - CURVE_RADIUS
+
+    # Incorporate target_lateral_offset into the offset error calculation
+    # The controller tries to minimize (offset_from_ideal_radius - target_lateral_offset)
+    effective_offset_error = offset_from_ideal_radius - target_lateral_offset
+
+    # 7. Determine steering label (combining angle error and effective offset error)
+    steering_label = angle_error * KP_ANGLE - effective_offset_error * KP_OFFSET
+    return steering_label, angle_error, offset_from_ideal_radius
 
 #-------------------------------------------------------Automated Driving Logic
 
-def generate_data(screen, clock, car, num_samples, road_type):
+def generate_data(screen, clock, car, num_samples, road_type, world=None, resume=False):
     """
     Define how the car "drives" to generate data for various road scenarios,
     based on the specified road_type.
+    If a TiledWorld is given (straight road only), car coordinates are world
+    coordinates and the screen is a camera that follows the car.
+    With resume=True the run continues from its last checkpoint (if there is one).
     """
     print(f"Generating {num_samples} samples for {road_type} road...")
 
-    os.makedirs(IMAGES_SUBDIR, exist_ok=True)
-    labels_filepath = LABELS_FILE_PATH
+    # Size of the area the car drives in: the screen, or the whole tiled world
+    track_width = world.width if world is not None else SCREEN_WIDTH
+    track_height = world.height if world is not None else SCREEN_HEIGHT
+    origin = (0, 0) # World position of the screen's top-left corner
+    # The heading-aligned camera's base sampling grid is built once per run
+    camera_grid = CameraGrid() if CAMERA_MODE == "heading" else None
+    image_codec = get_codec(IMAGE_CODEC)
+
+    checkpoint = None
+    if resume and os.path.exists(CHECKPOINT_FILE_PATH):
+        checkpoint = load_checkpoint(CHECKPOINT_FILE_PATH) # Also restores the RNG state
+        print(f"Resuming from checkpoint at sample {checkpoint['samples_generated']}.")
+    elif resume:
+        print(f"No checkpoint found at {CHECKPOINT_FILE_PATH}, starting a new run.")
+
+    if checkpoint is not None:
+        seed = checkpoint["seed"]
+    else:
+        seed = SEED if SEED is not None else int(np.random.randint(2**31 - 1))
+        np.random.seed(seed)
+
+    # Run configuration, stored with the trajectory log or telemetry table
+    run_config = {
+        "run_name": CURRENT_RUN_NAME, "road_type": road_type, "seed": seed, "num_samples": num_samples,
+        "camera_mode": CAMERA_MODE, "camera_width": CAMERA_WIDTH, "camera_height": CAMERA_HEIGHT,
+        "world_width": track_width, "world_height": track_height,
+        "sample_stride": SAMPLE_STRIDE, "min_pose_change": MIN_POSE_CHANGE,
+        "kp_angle": KP_ANGLE, "kp_offset": KP_OFFSET, "image_codec": IMAGE_CODEC,
+    }
+    if checkpoint is not None:
+        # Resuming with different settings would silently mix two datasets (num_samples may grow)
+        changed = [key for key, value in checkpoint["run_config"].items()
+                   if key != "num_samples" and run_config.get(key) != value]
+        if changed:
+            raise ValueError(f"Settings {changed} differ from the checkpointed run; "
+                             f"start a new run instead of resuming {CURRENT_RUN_NAME}")
+        if not TRAJECTORY_ONLY:
+            # The committed label rows cannot be regenerated without replaying the whole run
+            labels_size = os.path.getsize(LABELS_FILE_PATH) if os.path.exists(LABELS_FILE_PATH) else None
+            if labels_size is None or labels_size < checkpoint["labels_bytes"]:
+                raise FileNotFoundError(f"{LABELS_FILE_PATH} is missing or shorter than at the checkpoint "
+                                        f"({checkpoint['labels_bytes']} bytes); start a new run instead "
+                                        f"of resuming {CURRENT_RUN_NAME}")
+
+    # On resume, anything written after the last checkpoint is dropped and regenerated
+    # (the restored RNG state makes the regenerated samples identical)
+    table_dir = TRAJECTORY_DIR if TRAJECTORY_ONLY else TELEMETRY_DIR
+    if checkpoint is not None:
+        _discard_parts_after(table_dir, checkpoint["next_part"])
+    table_writer = ColumnarWriter(table_dir, TRAJECTORY_COLUMNS if TRAJECTORY_ONLY else TELEMETRY_COLUMNS,
+                                  TELEMETRY_BATCH_SIZE, overwrite=checkpoint is None)
+    write_metadata(table_dir, run_config)
+    trajectory_writer = table_writer if TRAJECTORY_ONLY else None
+    telemetry_writer = None if TRAJECTORY_ONLY else table_writer
 
-    with open(labels_filepath, 'w') as f:
-        f.write("image_filename,steering_angle\n")
+    labels_filepath = LABELS_FILE_PATH
+    pending_label_lines = [] # Label rows not yet committed to labels.csv
+    labels_bytes = 0 # Size of labels.csv at the last checkpoint
+    if not TRAJECTORY_ONLY:
+        os.makedirs(IMAGES_SUBDIR, exist_ok=True)
+        if checkpoint is not None:
+            # Drop label rows written after the last checkpoint
+            with open(labels_filepath, 'r+') as f:
+                f.truncate(checkpoint["labels_bytes"])
+            labels_bytes = checkpoint["labels_bytes"]
+        else:
+            with open(labels_filepath, 'w') as f:
+                f.write("image_filename,steering_angle\n")
+            labels_bytes = os.path.getsize(labels_filepath)
+            # Frames of the run being replaced would otherwise be taken for this run's on resume
+            stale_frames = [filename for filename in os.listdir(IMAGES_SUBDIR) if is_frame_file(filename)]
+            for filename in stale_frames:
+                os.remove(os.path.join(IMAGES_SUBDIR, filename))
+            if stale_frames:
+                print(f"Removed {len(stale_frames)} frames of the previous {CURRENT_RUN_NAME} run.")
 
     samples_generated = 0
+    simulation_steps = 0
+    frames_reused = 0 # Frames already on disk when resuming (not rendered again)
+    last_sample_pose = None # (x, y, angle) of the last saved sample, for the decorrelation policy
+    episode = 0 # Number of environment resets so far (telemetry)
+    last_sample_episode = 0
 
     # --- Diversification Variables for Curved Road ---
     # These variables control the car's target offset from the lane center.
     target_lateral_offset = 0 # Initial target offset (pixels, positive = right of center)
     offset_change_timer = 0
+
+    if checkpoint is not None:
+        samples_generated = checkpoint["samples_generated"]
+        simulation_steps = checkpoint["simulation_steps"]
+        last_sample_pose = checkpoint["last_sample_pose"]
+        episode = checkpoint["episode"]
+        last_sample_episode = checkpoint["last_sample_episode"]
+        target_lateral_offset = checkpoint["target_lateral_offset"]
+        offset_change_timer = checkpoint["offset_change_timer"]
+        car.x, car.y, car.angle, car.speed, car.camera_offset_y = checkpoint["car"]
+    elif os.path.exists(CHECKPOINT_FILE_PATH):
+        os.remove(CHECKPOINT_FILE_PATH) # A new run replaces the old one
+
+    def commit():
+        # Flush labels and the columnar table, then record the state they correspond to
+        nonlocal labels_bytes
+        if not TRAJECTORY_ONLY:
+            labels_bytes = _append_durably(labels_filepath, pending_label_lines)
+            pending_label_lines.clear()
+        table_writer.flush()
+        save_checkpoint(CHECKPOINT_FILE_PATH, {
+            "seed": seed, "samples_generated": samples_generated, "simulation_steps": simulation_steps,
+            "last_sample_pose": last_sample_pose, "episode": episode, "last_sample_episode": last_sample_episode,
+            "target_lateral_offset": float(target_lateral_offset), "offset_change_timer": offset_change_timer,
+            "car": [float(car.x), float(car.y), float(car.angle), float(car.speed), float(car.camera_offset_y)],
+            "labels_bytes": labels_bytes, "next_part": table_writer.next_part, "run_config": run_config,
+        })
+
     # Change target offset every X seconds (FPS * seconds)
     OFFSET_CHANGE_INTERVAL = FPS * 1 #3 # Change target offset every 3 seconds
 
     while samples_generated < num_samples:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                commit() # Keep the samples generated so far (resumable with --resume)
                 pygame.quit()
                 return
 
@@ -73,8 +348,9 @@ def generate_data(screen, clock, car, num_samples, road_type):
             # --- STRAIGHT ROAD LOGIC ---
             # Infinite straight road loop
             if car.y < -CAR_HEIGHT:
-                car.y = SCREEN_HEIGHT + CAR_HEIGHT / 2
+                car.y = track_height + CAR_HEIGHT / 2
                 car.x = SCREEN_WIDTH / 2 + np.random.uniform(-20, 20) # Reset to center +/- 20 pixels
+                episode += 1
 
             # Simulate Car Deviations (random steering)
             if np.random.rand() < 0.15:
@@ -97,13 +373,18 @@ def generate_data(screen, clock, car, num_samples, road_type):
             horizontal_offset = car.x - lane_center_x
             steering_label = -horizontal_offset * 0.1 # Tune this factor to correct for offset
 
+            # Telemetry: the straight road's desired heading is straight up (90 degrees)
+            lateral_offset = horizontal_offset
+            angle_error = (90 - car.angle + 180) % 360 - 180
+
             # --- Environment Reset for straight road (Corrected) ---
             # If car goes too far off the screen, reset it to the bottom
-            if car.y < -CAR_HEIGHT or car.y > SCREEN_HEIGHT + CAR_HEIGHT:
+            if car.y < -CAR_HEIGHT or car.y > track_height + CAR_HEIGHT:
                 car.x = SCREEN_WIDTH / 2 + np.random.uniform(-20, 20)
-                car.y = SCREEN_HEIGHT - CAR_HEIGHT - 50
+                car.y = track_height - CAR_HEIGHT - 50
                 car.angle = 90
                 car.camera_offset_y = CAMERA_Y_OFFSET_FROM_CAR_CENTER
+                episode += 1
 
         elif road_type == "curved":
             # --- CURVED ROAD LOGIC: Pure Pursuit-like Controller ---
@@ -116,41 +397,10 @@ def generate_data(screen, clock, car, num_samples, road_type):
                 target_lateral_offset = np.random.uniform(-LANE_WIDTH, LANE_WIDTH)
                 offset_change_timer = 0
 
-            # 1. Calculate car's position relative to the curve's center (for math coordinates)
-            car_rel_x = car.x - CURVE_CENTER_X
-            car_rel_y_math = -(car.y - CURVE_CENTER_Y) # Flip y-axis for standard math angles (y increases upwards)
-
-            # 2. Calculate the car's current angle relative to the curve's center (polar angle in math coords)
-            current_polar_angle_rad = np.arctan2(car_rel_y_math, car_rel_x)
-
-            # 3. Calculate the ideal target point on the curve (look-ahead point)
-            angular_step_rad = LOOK_AHEAD_DISTANCE / CURVE_RADIUS
-            target_polar_angle_rad = current_polar_angle_rad + angular_step_rad
-
-            # Calculate the target (x, y) coordinates on the ideal curve (Pygame coordinates)
-            target_x = CURVE_CENTER_X + CURVE_RADIUS * np.cos(target_polar_angle_rad)
-            target_y = CURVE_CENTER_Y - CURVE_RADIUS * np.sin(target_polar_angle_rad) # Flip y-axis back for Pygame display
-
-            # 4. Calculate the required heading angle for the car to point towards the target
-            dx = target_x - car.x
-            dy_for_arctan2 = car.y - target_y
-
-            angle_to_target_deg = np.degrees(np.arctan2(dy_for_arctan2, dx))
-            angle_to_target_deg = (angle_to_target_deg + 360) % 360
-
-            # 5. Calculate the difference between current car angle and desired angle
-            angle_error = angle_to_target_deg - car.angle
-            angle_error = (angle_error + 180) % 360 - 180
-
-            # 6. Calculate perpendicular distance from car to ideal curve (for offset correction)
-            offset_from_ideal_radius = np.sqrt(car_rel_x**2 + car_rel_y_math**2) - CURVE_RADIUS
-
-            # Incorporate target_lateral_offset into the offset error calculation
-            # The controller tries to minimize (offset_from_ideal_radius - target_lateral_offset)
-            effective_offset_error = offset_from_ideal_radius - target_lateral_offset
-
-            # 7. Determine steering label (combining angle error and effective offset error)
-            steering_label = angle_error * KP_ANGLE - effective_offset_error * KP_OFFSET
+            # 1.-7. Pure pursuit steering label towards the look-ahead point (see curved_road_controller)
+            steering_label, angle_error, offset_from_ideal_radius = curved_road_controller(
+                car.x, car.y, car.angle, target_lateral_offset)
+            lateral_offset = offset_from_ideal_radius # Telemetry
 
             # Add a small random component for diversity
             if np.random.rand() < 0.1: # 5% chance of random deviation per frame
@@ -171,7 +421,7 @@ def generate_data(screen, clock, car, num_samples, road_type):
             if current_polar_angle_deg_normalized >= CURVE_END_ANGLE_DEG or \
                car.x < CURVE_CENTER_X - CURVE_RADIUS - ROAD_WIDTH/2 - CAR_WIDTH/2 or \
                car.y > CURVE_CENTER_Y + ROAD_WIDTH/2 + CAR_HEIGHT/2 or \
-               np.sqrt(car_rel_x**2 + car_rel_y_math**2) > CURVE_RADIUS + ROAD_WIDTH/2 + CAR_WIDTH:
+               offset_from_ideal_radius > ROAD_WIDTH/2 + CAR_WIDTH:
 
                 # --- Randomize Reset Position and Angle for Diversification ---
                 ideal_reset_x = CURVE_CENTER_X
@@ -193,6 +443,7 @@ def generate_data(screen, clock, car, num_samples, road_type):
                 # Reset offset change timer and target offset for the new segment
                 offset_change_timer = 0
                 target_lateral_offset = 0 # Start new segment centered
+                episode += 1
 
             # Debugging print statements (optional, uncomment to see real-time values)
             # print(f"Car: ({car.x:.1f}, {car.y:.1f}) Angle: {car.angle:.1f} Label: {steering_label:.2f}")
@@ -202,63 +453,103 @@ def generate_data(screen, clock, car, num_samples, road_type):
 
         # Always move the car after determining its steering
         car.move()
+        simulation_steps += 1
 
-        # --- Drawing Road for visualisation ---
-        screen.fill(BLACK)
-        if road_type == "straight":
-            draw_road(screen)
-            draw_lane_lines(screen)
-        elif road_type == "curved":
-            draw_curved_road(screen, CURVE_CENTER_X, CURVE_CENTER_Y, CURVE_RADIUS,
-                             CURVE_START_ANGLE_DEG, CURVE_END_ANGLE_DEG, ROAD_WIDTH)
-            draw_curved_lane_lines(screen, CURVE_CENTER_X, CURVE_CENTER_Y, CURVE_RADIUS,
-                                   CURVE_START_ANGLE_DEG, CURVE_END_ANGLE_DEG, LANE_WIDTH, LANE_LINE_WIDTH)
-
-        car.draw(screen)
+        # --- Decide whether this step becomes a sample, before doing any rendering ---
+        # Only save if car is somewhat on screen (prevents saving black screens when car is off-track)
+        car_on_track = car.x >= -CAR_WIDTH/2 and car.x <= track_width + CAR_WIDTH/2 and \
+                       car.y >= -CAR_HEIGHT/2 and car.y <= track_height + CAR_HEIGHT/2
+        if not car_on_track or not should_sample(simulation_steps, car, last_sample_pose):
+            continue # Simulation only: nothing is drawn, captured or encoded for this step
 
         # --- Diversify Camera Position (Applies to both road types) ---
         base_camera_offset_y = CAMERA_Y_OFFSET_FROM_CAR_CENTER
         car.camera_offset_y = base_camera_offset_y + np.random.uniform(-100, 100) # -10, 10)
 
-        # --- Capture Camera View & Determine Label (Steering label is set above) ---
-        camera_view_array, camera_rect = get_camera_view(screen, car)
-
-        # Only save if car is somewhat on screen (prevents saving black screens when car is off-track)
-        if car.x >= -CAR_WIDTH/2 and car.x <= SCREEN_WIDTH + CAR_WIDTH/2 and \
-           car.y >= -CAR_HEIGHT/2 and car.y <= SCREEN_HEIGHT + CAR_HEIGHT/2:
-            image_filename = f"frame_{samples_generated:05d}.png"
-            image_filepath = os.path.join(IMAGES_SUBDIR, image_filename)
-            img_to_save = Image.fromarray((camera_view_array * 255).astype(np.uint8), mode='L')
-            img_to_save.save(image_filepath)
-
-            with open(labels_filepath, 'a') as f:
-                f.write(f"{image_filename},{steering_label}\n")
-
-            samples_generated += 1
-
-            if samples_generated % 100 == 0:
-                print(f"Generated {samples_generated}/{num_samples} samples.")
+        if trajectory_writer is not None:
+            # Trajectory-first mode: log the state only, frames are rendered later
+            trajectory_writer.append(step=simulation_steps, x=car.x, y=car.y, angle=car.angle, speed=car.speed,
+                                     camera_offset_y=car.camera_offset_y, steering_label=steering_label,
+                                     target_lateral_offset=target_lateral_offset, seed=seed)
         else:
-            # If car goes completely off screen, it means the reset condition probably didn't catch it
-            pass
-
-        pygame.display.flip()
-        clock.tick(FPS)
-
+            image_filename = f"frame_{samples_generated:05d}{image_codec.extension}"
+            image_filepath = os.path.join(IMAGES_SUBDIR, image_filename)
+            if os.path.exists(image_filepath):
+                # Written before an interruption: the same frame (see Checkpointing), so it is kept
+                frames_reused += 1
+            else:
+                # --- Drawing Road for visualisation ---
+                screen.fill(BLACK)
+                if world is not None:
+                    # Only the tiles under the camera are drawn, so cost does not grow with track length
+                    camera_rect = world.camera_rect(car)
+                    origin = camera_rect.topleft
+                    world.render(screen, camera_rect)
+                elif road_type == "straight":
+                    draw_road(screen)
+                    draw_lane_lines(screen)
+                elif road_type == "curved":
+                    draw_curved_road(screen, CURVE_CENTER_X, CURVE_CENTER_Y, CURVE_RADIUS,
+                                     CURVE_START_ANGLE_DEG, CURVE_END_ANGLE_DEG, ROAD_WIDTH)
+                    draw_curved_lane_lines(screen, CURVE_CENTER_X, CURVE_CENTER_Y, CURVE_RADIUS,
+                                           CURVE_START_ANGLE_DEG, CURVE_END_ANGLE_DEG, LANE_WIDTH, LANE_LINE_WIDTH)
+
+                car.draw(screen, origin)
+
+                # --- Capture Camera View & Determine Label (Steering label is set above) ---
+                if camera_grid is not None:
+                    camera_view_array, camera_corners = get_rotated_camera_view(screen, car, camera_grid, origin)
+                else:
+                    camera_view_array, camera_rect = get_camera_view(screen, car, origin)
+
+                # Written then renamed, so a crash never leaves a truncated image behind
+                save_frame(image_codec, (camera_view_array * 255).astype(np.uint8), image_filepath)
+
+                pygame.display.flip()
+                clock.tick(FPS)
+
+            pending_label_lines.append(f"{image_filename},{steering_label}\n")
+
+            telemetry_writer.append(image_filename=image_filename, steering_angle=steering_label,
+                                    step=simulation_steps, x=car.x, y=car.y, angle=car.angle, speed=car.speed,
+                                    camera_offset_y=car.camera_offset_y, lateral_offset=lateral_offset,
+                                    angle_error=angle_error, target_lateral_offset=target_lateral_offset,
+                                    episode=episode, reset=episode != last_sample_episode)
+
+        samples_generated += 1
+        last_sample_pose = (car.x, car.y, car.angle)
+        last_sample_episode = episode
+
+        if samples_generated % 100 == 0:
+            print(f"Generated {samples_generated}/{num_samples} samples ({simulation_steps} simulation steps).")
+        if samples_generated % CHECKPOINT_INTERVAL == 0:
+            commit()
+
+    commit()
     pygame.quit()
+    if frames_reused:
+        print(f"Kept {frames_reused} frames already written before the interruption.")
     print(f"Data generation complete. Saved {samples_generated} samples to {DATA_DIR}")
 
 #-------------------------------------------------------Main Execution Block:
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate simulated driving data.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue CURRENT_RUN_NAME from its last checkpoint instead of starting over")
+    args = parser.parse_args()
+
     pygame.init()
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
     pygame.display.set_caption("Data Generation Simulator")
     clock = pygame.time.Clock()
 
+    # The tiled world only describes a straight road
+    world = TiledWorld() if USE_TILED_WORLD and ROAD_TYPE == "straight" else None
+
     # --- Initialize car based on ROAD_TYPE ---
     if ROAD_TYPE == "straight":
         initial_car_x = SCREEN_WIDTH / 2
-        initial_car_y = SCREEN_HEIGHT - CAR_HEIGHT - 50
+        initial_car_y = (world.height if world is not None else SCREEN_HEIGHT) - CAR_HEIGHT - 50
         initial_car_angle = 90
     elif ROAD_TYPE == "curved":
         # For the test curve (90 to 180 deg, center at SCREEN_WIDTH/2, SCREEN_HEIGHT/2)
@@ -270,4 +561,4 @@ if __name__ == "__main__":
     car = Car(initial_car_x, initial_car_y, angle=initial_car_angle)
 
     # Pass ROAD_TYPE to the generate_data function
-    generate_data(screen, clock, car, NUM_SAMPLES, ROAD_TYPE)
+    generate_data(screen, clock, car, NUM_SAMPLES, ROAD_TYPE, world, resume=args.resume)
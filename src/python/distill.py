@@ -0,0 +1,188 @@
+#----------------------------------------------libraries
+import os
+import json
+import argparse
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torch.optim.lr_scheduler import ReduceLROnPlateau
+
+from image_codec import find_frame_files, load_frame
+from preprocessing import Preprocessor, NORMALIZED_LEVELS
+from model import STUDENT_CONFIGS, build_student, count_parameters
+from model_export import WEIGHTS_PATH, load_model, export_onnx
+from benchmark_inference import create_session, time_batch
+
+#-------------------------------------------------------
+# Distils the trained PilotNet (the teacher, best_lane_keeping_model.pth) into the smaller
+# StudentPilotNet variants of model.py, on CPU. Students regress the teacher's steering on frames
+# from the generated runs (no labels needed), are exported through model_export.export_onnx,
+# and the report sets each ONNX model's CPU latency against its steering error vs the teacher
+# on held-out frames.
+FRAMES_DIR = "data" # Searched recursively for frames (images/ of every run)
+MAX_FRAMES = 20000 # Resized frames are kept in memory (13 KB each)
+LOAD_CHUNK = 1000
+VALIDATION_FRACTION = 0.15
+EPOCHS = 15
+BATCH_SIZE = 64
+LEARNING_RATE = 1e-3
+LATENCY_THREADS = 1 # Intra-op threads for the latency measurements (low-end CPUs)
+LATENCY_BATCH_SIZES = [1, 32] # 1 = closed-loop control, 32 = offline scoring
+SEED = 42
+STUDENT_WEIGHTS_PATH = "models/student_{name}.pth"
+STUDENT_ONNX_PATH = "models/student_{name}.onnx"
+TEACHER_ONNX_PATH = "models/teacher.onnx" # Re-exported from --teacher every run (not the shipped nvidia_pilotnet.onnx)
+REPORT_PATH = "models/distillation_report.json"
+
+#-------------------------------------------------------Data
+
+def load_resized_frames(frames_dir, max_frames=MAX_FRAMES, seed=SEED):
+    """Up to max_frames random frames under frames_dir, resized to uint8 (N, 66, 200)."""
+    paths = find_frame_files(frames_dir)
+    if not paths:
+        raise FileNotFoundError(f"No frames found under {frames_dir}")
+    paths = list(np.random.default_rng(seed).permutation(paths))[:max_frames]
+    preprocess = Preprocessor()
+    chunks = []
+    for start in range(0, len(paths), LOAD_CHUNK):
+        chunks.append(preprocess.resize(np.stack([load_frame(path) for path in paths[start:start + LOAD_CHUNK]])))
+    return np.concatenate(chunks)
+
+def model_inputs(pixels):
+    """Normalized float32 model input (N, 1, 66, 200) for resized uint8 frames."""
+    return torch.from_numpy(NORMALIZED_LEVELS[pixels[:, None]])
+
+def teacher_targets(teacher, pixels, batch_size=256):
+    """The teacher's steering for every frame, (N,) float32."""
+    outputs = []
+    with torch.no_grad():
+        for start in range(0, len(pixels), batch_size):
+            outputs.append(teacher(model_inputs(pixels[start:start + batch_size])).view(-1))
+    return torch.cat(outputs)
+
+#-------------------------------------------------------Distillation
+
+def train_student(student, pixels, targets, train_indices, val_indices,
+                  epochs=EPOCHS, batch_size=BATCH_SIZE, learning_rate=LEARNING_RATE, seed=SEED):
+    """
+    Trains student to match the teacher's outputs (MSE), keeping the weights with the
+    lowest validation loss. Returns that validation loss.
+    """
+    torch.manual_seed(seed)
+    rng = np.random.default_rng(seed)
+    criterion = nn.MSELoss()
+    optimizer = optim.Adam(student.parameters(), lr=learning_rate)
+    scheduler = ReduceLROnPlateau(optimizer, mode='min', factor=0.2, patience=3, min_lr=1e-6)
+    val_inputs = model_inputs(pixels[val_indices])
+    val_targets = targets[val_indices].view(-1, 1)
+
+    best_val_loss = float('inf')
+    best_state = None # Stays None if no epoch runs or every validation loss is NaN
+    for epoch in range(epochs):
+        student.train()
+        running_train_loss = 0.0
+        shuffled = rng.permutation(train_indices)
+        for start in range(0, len(shuffled), batch_size):
+            batch_indices = np.sort(shuffled[start:start + batch_size])
+            inputs = model_inputs(pixels[batch_indices])
+            optimizer.zero_grad()
+            loss = criterion(student(inputs), targets[batch_indices].view(-1, 1))
+            loss.backward()
+            optimizer.step()
+            running_train_loss += loss.item() * len(batch_indices)
+
+        student.eval()
+        with torch.no_grad():
+            val_loss = criterion(student(val_inputs), val_targets).item()
+        scheduler.step(val_loss)
+        print(f"  Epoch [{epoch + 1}/{epochs}], Train Loss: {running_train_loss / len(shuffled):.6f}, "
+              f"Val Loss: {val_loss:.6f}")
+        if val_loss < best_val_loss:
+            best_val_loss = val_loss
+            best_state = {key: value.clone() for key, value in student.state_dict().items()}
+
+    if best_state is None:
+        raise RuntimeError(f"No epoch of {epochs} gave a finite validation loss (student diverged or epochs=0)")
+    student.load_state_dict(best_state)
+    student.eval()
+    return best_val_loss
+
+#-------------------------------------------------------Report
+
+def evaluate_onnx(onnx_model_path, val_inputs, val_targets, threads=LATENCY_THREADS):
+    """Steering error vs the teacher and CPU latency of an exported model."""
+    session = create_session(onnx_model_path, threads, None, "sequential", "all")
+    inputs = val_inputs.numpy()
+    predictions = session.run(None, {session.get_inputs()[0].name: inputs})[0].reshape(-1)
+    error = np.abs(predictions - val_targets.numpy())
+    return {
+        "onnx_path": onnx_model_path,
+        "size_kb": os.path.getsize(onnx_model_path) / 1024,
+        "mae_vs_teacher": float(error.mean()),
+        "max_error_vs_teacher": float(error.max()),
+        "latency": {batch_size: time_batch(session, inputs, batch_size) for batch_size in LATENCY_BATCH_SIZES},
+    }
+
+#-------------------------------------------------------Main Execution Block:
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distil PilotNet into smaller students and compare them.")
+    parser.add_argument("--frames-dir", default=FRAMES_DIR)
+    parser.add_argument("--teacher", default=WEIGHTS_PATH)
+    parser.add_argument("--students", nargs="+", choices=list(STUDENT_CONFIGS), default=list(STUDENT_CONFIGS))
+    parser.add_argument("--max-frames", type=int, default=MAX_FRAMES)
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--train-threads", type=int, default=None, help="torch threads (default: all cores)")
+    parser.add_argument("--latency-threads", type=int, default=LATENCY_THREADS)
+    parser.add_argument("--closed-loop-steps", type=int, default=0,
+                        help="Also drive each model in closed_loop.py for this many steps (lane offset check)")
+    args = parser.parse_args()
+
+    if args.train_threads:
+        torch.set_num_threads(args.train_threads)
+    teacher = load_model(args.teacher)
+    pixels = load_resized_frames(args.frames_dir, args.max_frames)
+    targets = teacher_targets(teacher, pixels)
+    indices = np.random.default_rng(SEED).permutation(len(pixels))
+    num_val = max(1, int(len(pixels) * VALIDATION_FRACTION))
+    val_indices, train_indices = np.sort(indices[:num_val]), np.sort(indices[num_val:])
+    val_inputs, val_targets = model_inputs(pixels[val_indices]), targets[val_indices]
+    print(f"Distilling on {len(train_indices)} frames, validating on {len(val_indices)} frames.")
+
+    # The teacher goes through the same export and measurement as the students
+    export_onnx(teacher, TEACHER_ONNX_PATH)
+    report = {"teacher": {"parameters": count_parameters(teacher), "weights_path": args.teacher,
+                          **evaluate_onnx(TEACHER_ONNX_PATH, val_inputs, val_targets, args.latency_threads)}}
+    for name in args.students:
+        print(f"Student {name}: {STUDENT_CONFIGS[name]}")
+        student = build_student(name)
+        val_loss = train_student(student, pixels, targets, train_indices, val_indices, epochs=args.epochs)
+        weights_path = STUDENT_WEIGHTS_PATH.format(name=name)
+        onnx_model_path = STUDENT_ONNX_PATH.format(name=name)
+        torch.save(student.state_dict(), weights_path)
+        export_onnx(student, onnx_model_path)
+        report[name] = {"parameters": count_parameters(student), "weights_path": weights_path,
+                        "val_mse_vs_teacher": val_loss,
+                        **evaluate_onnx(onnx_model_path, val_inputs, val_targets, args.latency_threads)}
+
+    if args.closed_loop_steps:
+        from closed_loop import run_closed_loop
+        for name, result in report.items():
+            drive = run_closed_loop(num_steps=args.closed_loop_steps, model_path=result["onnx_path"],
+                                    threads=args.latency_threads)
+            result["closed_loop"] = {key: drive[key] for key in
+                                     ("mean_abs_lane_offset_px", "max_abs_lane_offset_px", "off_road")}
+
+    latency_header = " ".join(f"{f'b={b} p50 ms':>13}" for b in LATENCY_BATCH_SIZES)
+    print(f"{'model':<12} {'params':>8} {'MAE':>8} {'max err':>8} {latency_header} {'fps b=' + str(LATENCY_BATCH_SIZES[-1]):>10}")
+    for name, result in report.items():
+        latencies = " ".join(f"{result['latency'][b]['p50_ms']:13.3f}" for b in LATENCY_BATCH_SIZES)
+        print(f"{name:<12} {result['parameters']:8d} {result['mae_vs_teacher']:8.4f} "
+              f"{result['max_error_vs_teacher']:8.4f} {latencies} {result['latency'][LATENCY_BATCH_SIZES[-1]]['fps']:10.0f}")
+        if "closed_loop" in result:
+            print(f"{'':<12} closed loop: mean |lane offset| {result['closed_loop']['mean_abs_lane_offset_px']:.1f} px, "
+                  f"{result['closed_loop']['off_road']} off road")
+
+    with open(REPORT_PATH, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to {REPORT_PATH}")
@@ -0,0 +1,144 @@
+#----------------------------------------------libraries
+import time
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+from simulator import CAMERA_WIDTH, CAMERA_HEIGHT
+
+#-------------------------------------------------------
+# A fixed-slot ring of camera frames in shared memory, for running the simulator and the
+# model in separate processes without pickling frames through a Queue.
+# The producer writes each frame in place into a free slot (e.g. get_camera_view(..., out=slot))
+# and publishes it; the consumer reads the slot directly and releases it.
+# Commands (steering) travel back through a second, tiny ring in the same segment.
+# Every hop is timestamped with time.perf_counter_ns (CLOCK_MONOTONIC, shared by all processes).
+RING_SLOTS = 4
+STOP_SEQUENCE = -1 # Published instead of a frame to tell the consumer to exit
+
+# Per-slot metadata columns (int64), for frames and for commands
+META_SEQUENCE = 0 # Frame number (for a command: the frame it answers)
+META_TIME_NS = 1 # When the frame was published / the command was sent
+META_COLUMNS = 2
+
+#-----------------------------------------------------FrameRing class
+
+class FrameRing:
+    """
+    Single-producer, single-consumer frame ring buffer with a command back channel.
+    Create it in the parent process and pass it to the child process as a Process argument
+    (the semaphores and the shared memory segment are re-attached there).
+    The producer must receive commands as they come: at most num_slots may be unread.
+    Call close() in every process and unlink() once, in the creating process.
+    """
+    def __init__(self, num_slots=RING_SLOTS, height=CAMERA_HEIGHT, width=CAMERA_WIDTH):
+        self.num_slots = num_slots
+        self.frame_shape = (height, width)
+        self._shm = shared_memory.SharedMemory(create=True, size=self._segment_size())
+        self._attach()
+        self.frame_meta.fill(0)
+        self.command_meta.fill(0)
+        self.command_values.fill(0)
+        # Classic bounded buffer: free slots, published frames, and sent commands
+        self._free = mp.Semaphore(num_slots)
+        self._published = mp.Semaphore(0)
+        self._sent = mp.Semaphore(0)
+        self._next_write = 0 # Producer side
+        self._next_command_read = 0
+        self._next_read = 0 # Consumer side
+        self._next_command_write = 0
+
+    def _segment_size(self):
+        frame_bytes = self.num_slots * self.frame_shape[0] * self.frame_shape[1]
+        return frame_bytes + self.num_slots * 8 * (2 * META_COLUMNS + 1)
+
+    def _attach(self):
+        # NumPy views onto the shared segment: frames, frame metadata, command metadata, command values
+        buffer = self._shm.buf
+        offset = self.num_slots * self.frame_shape[0] * self.frame_shape[1]
+        self.frames = np.ndarray((self.num_slots, *self.frame_shape), dtype=np.uint8, buffer=buffer)
+        self.frame_meta = np.ndarray((self.num_slots, META_COLUMNS), dtype=np.int64, buffer=buffer, offset=offset)
+        offset += self.frame_meta.nbytes
+        self.command_meta = np.ndarray((self.num_slots, META_COLUMNS), dtype=np.int64, buffer=buffer, offset=offset)
+        offset += self.command_meta.nbytes
+        self.command_values = np.ndarray(self.num_slots, dtype=np.float64, buffer=buffer, offset=offset)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ("_shm", "frames", "frame_meta", "command_meta", "command_values"):
+            del state[name]
+        state["_shm_name"] = self._shm.name
+        return state
+
+    def __setstate__(self, state):
+        shm_name = state.pop("_shm_name")
+        self.__dict__.update(state)
+        self._shm = shared_memory.SharedMemory(name=shm_name)
+        self._attach()
+
+    # --- Producer side ---
+    def acquire_slot(self, timeout=None):
+        """Waits for a free slot and returns its index; write the frame into self.frames[index]."""
+        if not self._free.acquire(timeout=timeout):
+            raise TimeoutError("No free frame slot (is the consumer running?)")
+        index = self._next_write
+        self._next_write = (index + 1) % self.num_slots
+        return index
+
+    def publish(self, index, sequence):
+        """Hands the frame in slot index (frame number sequence) to the consumer."""
+        self.frame_meta[index, META_SEQUENCE] = sequence
+        self.frame_meta[index, META_TIME_NS] = time.perf_counter_ns()
+        self._published.release()
+
+    def discard_slot(self, index):
+        """Gives back the slot just acquired without publishing it (e.g. the frame was not needed)."""
+        self._next_write = index
+        self._free.release()
+
+    def stop(self):
+        """Tells the consumer to exit once it has read the frames published so far."""
+        self.publish(self.acquire_slot(), STOP_SEQUENCE)
+
+    def receive_command(self, timeout=None):
+        """Waits for the next command. Returns (sequence, value, sent_ns), or None on timeout."""
+        if not self._sent.acquire(timeout=timeout):
+            return None
+        index = self._next_command_read
+        self._next_command_read = (index + 1) % self.num_slots
+        sequence, sent_ns = self.command_meta[index]
+        return int(sequence), float(self.command_values[index]), int(sent_ns)
+
+    # --- Consumer side ---
+    def next_frame(self, timeout=None):
+        """
+        Waits for the next published frame. Returns (index, sequence, published_ns);
+        sequence is STOP_SEQUENCE when the producer has stopped. Release the slot when done.
+        """
+        if not self._published.acquire(timeout=timeout):
+            raise TimeoutError("No frame published (is the producer running?)")
+        index = self._next_read
+        self._next_read = (index + 1) % self.num_slots
+        return index, int(self.frame_meta[index, META_SEQUENCE]), int(self.frame_meta[index, META_TIME_NS])
+
+    def release_slot(self, index):
+        """Returns slot index to the producer (slots are released in the order they were read)."""
+        self._free.release()
+
+    def send_command(self, sequence, value):
+        """Sends a command (e.g. the steering for frame sequence) back to the producer. Returns the send time."""
+        index = self._next_command_write
+        self._next_command_write = (index + 1) % self.num_slots
+        sent_ns = time.perf_counter_ns()
+        self.command_values[index] = value
+        self.command_meta[index] = (sequence, sent_ns)
+        self._sent.release()
+        return sent_ns
+
+    # --- Cleanup ---
+    def close(self):
+        del self.frames, self.frame_meta, self.command_meta, self.command_values # Views go before the mapping
+        self._shm.close()
+
+    def unlink(self):
+        self._shm.unlink()
@@ -0,0 +1,305 @@
+#----------------------------------------------libraries
+import os
+import time
+import argparse
+import pygame
+import numpy as np
+
+from simulator import (
+    SCREEN_WIDTH, SCREEN_HEIGHT, BLACK,
+    LANE_WIDTH, ROAD_WIDTH, LANE_LINE_WIDTH, CAR_WIDTH, CAR_HEIGHT, CAR_SPEED,
+    CAMERA_WIDTH, CAMERA_HEIGHT, CAMERA_Y_OFFSET_FROM_CAR_CENTER,
+    CURVE_CENTER_X, CURVE_CENTER_Y, CURVE_RADIUS,
+    CURVE_START_ANGLE_DEG, CURVE_END_ANGLE_DEG,
+    Car, draw_road, draw_lane_lines, draw_curved_road, draw_curved_lane_lines, get_camera_view
+)
+from data_generator import TELEMETRY_COLUMNS, TELEMETRY_BATCH_SIZE, curved_road_controller
+from batch_renderer import BatchRenderer
+from camera_sampling import CameraGrid, get_rotated_camera_view
+from columnar import ColumnarWriter, write_metadata
+from image_codec import get_codec, save_frame
+from preprocessing import Preprocessor
+from model_export import ONNX_MODEL_PATH
+from benchmark_inference import create_session
+
+#-------------------------------------------------------
+# Model-guided data generation: instead of writing every state the random diversification of
+# data_generator.py visits (most of which the model already handles), candidate simulator states
+# are drawn from the same ranges, rendered in memory with BatchRenderer and scored in batches by
+# the current ONNX model against the controller's steering_label. Refinement rounds perturb the
+# hardest states found so far, and the frames written are sampled in proportion to the model's
+# error, so far fewer samples are generated, stored and trained on.
+# BatchRenderer is only used for scoring. The frames that are written are drawn like
+# data_generator.py's (pygame road, Car.draw, get_camera_view / get_rotated_camera_view), so they
+# are the same images as the other runs even where the view leaves the screen.
+# Labels are the controller's, without data_generator's random deviations. The output has the
+# run layout (images/, labels.csv, telemetry/), so it can go to data/all_data for combine_data.py.
+DATA_DIR = "data"
+RUN_NAME = "run_v8_HardExamples"
+ROAD_TYPE = "curved" # "straight" or "curved"
+CAMERA_MODE = "fixed" # As data_generator.py ("fixed" or "heading")
+NUM_SAMPLES = 2000 # Frames written
+CANDIDATES_PER_ROUND = 10000 # States rendered and scored per round (never written)
+REFINE_ROUNDS = 2 # Rounds of perturbing the hardest states after the first, uniform round
+REFINE_PARENT_FRACTION = 0.1 # Hardest fraction of the scored states that refinement starts from
+REFINE_SCALE = 0.05 # Perturbation standard deviation, as a fraction of each state range
+UNIFORM_MIX = 0.2 # Share of the selection probability spread evenly (keeps easy states represented)
+SCORE_BATCH_SIZE = 256
+SCORE_THREADS = None # ORT intra-op threads (None = all cores)
+IMAGE_CODEC = "png"
+SEED = None # None = pick one; logged with the run
+
+# Ranges the candidate states are drawn from, matching data_generator.py's diversification:
+# its reset offsets and heading deviations (relative to the controller's desired heading on the
+# curved road), target_lateral_offset values and camera offset jitter
+STATE_RANGES = {
+    "curved": {
+        "position": (CURVE_START_ANGLE_DEG, CURVE_END_ANGLE_DEG), # Polar angle along the arc (degrees)
+        "lateral_offset": (-LANE_WIDTH / 2, LANE_WIDTH / 2), # From the ideal curve radius
+        "heading_deviation": (-35, 35),
+        "target_lateral_offset": (-LANE_WIDTH, LANE_WIDTH),
+        "camera_jitter": (-100, 100),
+    },
+    "straight": {
+        "position": (CAR_HEIGHT, SCREEN_HEIGHT), # Car y on the screen
+        "lateral_offset": (-(ROAD_WIDTH - CAR_WIDTH) / 2, (ROAD_WIDTH - CAR_WIDTH) / 2), # Within the safe bounds
+        "heading_deviation": (-10, 10), # From straight up (90 degrees); corrected beyond 85-95
+        "target_lateral_offset": (0, 0), # Unused by the straight road controller
+        "camera_jitter": (-100, 100),
+    },
+}
+
+#-------------------------------------------------------States
+
+def sample_states(rng, num_states, road_type):
+    """Uniformly drawn state parameters: dict of (num_states,) float64 arrays."""
+    return {name: rng.uniform(low, high, num_states) for name, (low, high) in STATE_RANGES[road_type].items()}
+
+def perturb_states(rng, parents, num_states, road_type):
+    """num_states states near randomly chosen parent states (Gaussian steps, clipped to the ranges)."""
+    choice = rng.integers(0, len(parents["position"]), num_states)
+    states = {}
+    for name, (low, high) in STATE_RANGES[road_type].items():
+        step = rng.normal(0.0, REFINE_SCALE * (high - low), num_states)
+        states[name] = np.clip(parents[name][choice] + step, low, high)
+    return states
+
+def state_poses(states, road_type):
+    """
+    Car poses, controller labels and telemetry for state parameters.
+    Returns a dict of arrays: x, y, angle, camera_offset_y, steering_label, lateral_offset,
+    angle_error and target_lateral_offset.
+    """
+    target_lateral_offset = states["target_lateral_offset"]
+    if road_type == "curved":
+        polar_rad = np.radians(states["position"])
+        radius = CURVE_RADIUS + states["lateral_offset"]
+        x = CURVE_CENTER_X + radius * np.cos(polar_rad)
+        y = CURVE_CENTER_Y - radius * np.sin(polar_rad) # Pygame y points down
+        # With heading 0 the controller's angle error is the desired heading itself
+        _, desired_heading, _ = curved_road_controller(x, y, 0.0, target_lateral_offset)
+        angle = (desired_heading - states["heading_deviation"]) % 360
+        steering_label, angle_error, lateral_offset = curved_road_controller(x, y, angle, target_lateral_offset)
+    else:
+        x = SCREEN_WIDTH / 2 + states["lateral_offset"]
+        y = states["position"]
+        angle = 90 + states["heading_deviation"]
+        lateral_offset = states["lateral_offset"]
+        angle_error = -states["heading_deviation"]
+        steering_label = -lateral_offset * 0.1 # data_generator.py's straight road label
+    return {"x": x, "y": y, "angle": angle,
+            "camera_offset_y": CAMERA_Y_OFFSET_FROM_CAR_CENTER + states["camera_jitter"],
+            "steering_label": steering_label, "lateral_offset": lateral_offset,
+            "angle_error": angle_error, "target_lateral_offset": target_lateral_offset}
+
+def _concatenate(parts):
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+def _take(columns, indices):
+    return {name: values[indices] for name, values in columns.items()}
+
+#-------------------------------------------------------Scoring
+
+class ModelScorer:
+    """Renders poses in memory and runs the ONNX model on them in batches."""
+    def __init__(self, model_path, renderer, batch_size=SCORE_BATCH_SIZE, threads=SCORE_THREADS):
+        self.session = create_session(model_path, threads or 0, None, "sequential", "all")
+        self.input_name = self.session.get_inputs()[0].name
+        # Models exported with --fused take the raw uint8 frames
+        self.preprocess = None if self.session.get_inputs()[0].type == "tensor(uint8)" else Preprocessor()
+        self.renderer = renderer
+        self.batch_size = batch_size
+        self.frames = np.empty((batch_size, renderer.grid.height, renderer.grid.width), dtype=np.uint8)
+
+    def predict(self, poses):
+        """The model's steering for every pose, (N,) float32."""
+        num_poses = len(poses["x"])
+        predictions = np.empty(num_poses, dtype=np.float32)
+        # get_camera_view ignores the car's camera_offset_y (only the heading camera uses it)
+        camera_offsets_y = (poses["camera_offset_y"] if self.renderer.heading_aligned
+                            else np.full(num_poses, CAMERA_Y_OFFSET_FROM_CAR_CENTER, dtype=np.float32))
+        for start in range(0, num_poses, self.batch_size):
+            batch = slice(start, min(start + self.batch_size, num_poses))
+            frames = self.frames[:batch.stop - batch.start]
+            self.renderer.render(poses["x"][batch], poses["y"][batch], poses["angle"][batch],
+                                 camera_offsets_y[batch], out=frames)
+            inputs = frames if self.preprocess is None else self.preprocess(frames)
+            predictions[batch] = self.session.run(None, {self.input_name: inputs})[0].reshape(-1)
+        return predictions
+
+def select_hard_examples(rng, errors, num_samples, uniform_mix=UNIFORM_MIX):
+    """Indices of num_samples states drawn without replacement, with probability growing with the error."""
+    if num_samples > len(errors):
+        raise ValueError(f"Cannot select {num_samples} samples from {len(errors)} scored states")
+    error_share = errors / errors.sum() if errors.sum() > 0 else np.full(len(errors), 1 / len(errors))
+    probabilities = uniform_mix / len(errors) + (1 - uniform_mix) * error_share
+    return np.sort(rng.choice(len(errors), num_samples, replace=False, p=probabilities / probabilities.sum()))
+
+def error_stats(errors):
+    return {"mean": float(errors.mean()), "p50": float(np.percentile(errors, 50)),
+            "p90": float(np.percentile(errors, 90)), "max": float(errors.max())}
+
+def search_hard_examples(scorer, rng, road_type, candidates_per_round=CANDIDATES_PER_ROUND,
+                         refine_rounds=REFINE_ROUNDS):
+    """
+    Scores a uniform round of candidate states, then refine_rounds rounds around the hardest
+    states so far. Returns the state parameters, poses, predictions, round of every scored state
+    and a per-round summary.
+    """
+    states_parts, poses_parts, prediction_parts, round_parts = [], [], [], []
+    rounds = []
+    errors = np.empty(0)
+    for search_round in range(refine_rounds + 1):
+        round_start = time.perf_counter()
+        if search_round == 0:
+            states = sample_states(rng, candidates_per_round, road_type)
+        else:
+            num_parents = max(1, int(len(errors) * REFINE_PARENT_FRACTION))
+            parents = _take(_concatenate(states_parts), np.argsort(errors)[-num_parents:])
+            states = perturb_states(rng, parents, candidates_per_round, road_type)
+        poses = state_poses(states, road_type)
+        predictions = scorer.predict(poses)
+        round_errors = np.abs(predictions - poses["steering_label"])
+        states_parts.append(states)
+        poses_parts.append(poses)
+        prediction_parts.append(predictions)
+        round_parts.append(np.full(candidates_per_round, search_round, dtype=np.int32))
+        errors = np.concatenate([errors, round_errors])
+        elapsed = time.perf_counter() - round_start
+        rounds.append({"round": search_round, "candidates": candidates_per_round,
+                       "states_per_s": candidates_per_round / elapsed, **error_stats(round_errors)})
+        print(f"Round {search_round}: {candidates_per_round} states scored in {elapsed:.1f} s "
+              f"({rounds[-1]['states_per_s']:.0f}/s), mean |error| {rounds[-1]['mean']:.3f}, "
+              f"p90 {rounds[-1]['p90']:.3f}")
+    return (_concatenate(states_parts), _concatenate(poses_parts), np.concatenate(prediction_parts),
+            np.concatenate(round_parts), rounds)
+
+#-------------------------------------------------------Writing
+
+def draw_road_surface(road_type):
+    """The static road on a screen-sized Surface, drawn as data_generator.py draws it."""
+    road = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    road.fill(BLACK)
+    if road_type == "straight":
+        draw_road(road)
+        draw_lane_lines(road)
+    else:
+        draw_curved_road(road, CURVE_CENTER_X, CURVE_CENTER_Y, CURVE_RADIUS,
+                         CURVE_START_ANGLE_DEG, CURVE_END_ANGLE_DEG, ROAD_WIDTH)
+        draw_curved_lane_lines(road, CURVE_CENTER_X, CURVE_CENTER_Y, CURVE_RADIUS,
+                               CURVE_START_ANGLE_DEG, CURVE_END_ANGLE_DEG, LANE_WIDTH, LANE_LINE_WIDTH)
+    return road
+
+def write_run(run_dir, road_type, camera_mode, poses, predictions, search_rounds, run_config, codec_spec=IMAGE_CODEC):
+    """Renders (through pygame) and saves the selected frames with labels.csv and telemetry, like data_generator.py."""
+    images_dir = os.path.join(run_dir, "images")
+    os.makedirs(images_dir, exist_ok=True)
+    codec = get_codec(codec_spec)
+    columns = dict(TELEMETRY_COLUMNS, model_steering=np.float32, model_error=np.float32, search_round=np.int32)
+    telemetry_dir = os.path.join(run_dir, "telemetry")
+    telemetry_writer = ColumnarWriter(telemetry_dir, columns, TELEMETRY_BATCH_SIZE)
+    write_metadata(telemetry_dir, run_config)
+
+    road = draw_road_surface(road_type)
+    screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    camera_grid = CameraGrid() if camera_mode == "heading" else None
+    num_samples = len(poses["x"])
+    label_lines = ["image_filename,steering_angle\n"]
+    for index in range(num_samples):
+        car = Car(float(poses["x"][index]), float(poses["y"][index]), float(poses["angle"][index]))
+        car.camera_offset_y = float(poses["camera_offset_y"][index])
+        screen.blit(road, (0, 0))
+        car.draw(screen)
+        if camera_grid is not None:
+            camera_view_array, _ = get_rotated_camera_view(screen, car, camera_grid)
+        else:
+            camera_view_array, _ = get_camera_view(screen, car)
+        image_filename = f"frame_{index:05d}{codec.extension}"
+        save_frame(codec, (camera_view_array * 255).astype(np.uint8), os.path.join(images_dir, image_filename))
+        steering_label = float(poses["steering_label"][index])
+        label_lines.append(f"{image_filename},{steering_label}\n")
+        # Every sample is an independent state, so each one is its own episode
+        telemetry_writer.append(image_filename=image_filename, steering_angle=steering_label,
+                                step=index, x=poses["x"][index], y=poses["y"][index],
+                                angle=poses["angle"][index], speed=CAR_SPEED,
+                                camera_offset_y=poses["camera_offset_y"][index],
+                                lateral_offset=poses["lateral_offset"][index],
+                                angle_error=poses["angle_error"][index],
+                                target_lateral_offset=poses["target_lateral_offset"][index],
+                                episode=index, reset=True, model_steering=predictions[index],
+                                model_error=abs(predictions[index] - steering_label),
+                                search_round=search_rounds[index])
+    telemetry_writer.close()
+    with open(os.path.join(run_dir, "labels.csv"), 'w') as f:
+        f.writelines(label_lines)
+
+#-------------------------------------------------------Main Execution Block:
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the frames the current model gets most wrong.")
+    parser.add_argument("--model", default=ONNX_MODEL_PATH, help="ONNX model to score with (float or --fused)")
+    parser.add_argument("--run-dir", default=os.path.join(DATA_DIR, RUN_NAME))
+    parser.add_argument("--road-type", choices=list(STATE_RANGES), default=ROAD_TYPE)
+    parser.add_argument("--camera-mode", choices=["fixed", "heading"], default=CAMERA_MODE)
+    parser.add_argument("--num-samples", type=int, default=NUM_SAMPLES)
+    parser.add_argument("--candidates-per-round", type=int, default=CANDIDATES_PER_ROUND)
+    parser.add_argument("--refine-rounds", type=int, default=REFINE_ROUNDS)
+    parser.add_argument("--uniform-mix", type=float, default=UNIFORM_MIX)
+    parser.add_argument("--threads", type=int, default=SCORE_THREADS)
+    parser.add_argument("--codec", default=IMAGE_CODEC)
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args()
+
+    seed = args.seed if args.seed is not None else int(np.random.randint(2**31 - 1))
+    rng = np.random.default_rng(seed)
+    renderer = BatchRenderer(args.road_type, CAMERA_WIDTH, CAMERA_HEIGHT,
+                             heading_aligned=args.camera_mode == "heading")
+    scorer = ModelScorer(args.model, renderer, threads=args.threads)
+    print(f"Searching {args.refine_rounds + 1} x {args.candidates_per_round} {args.road_type} road states "
+          f"with {args.model} for {args.num_samples} hard examples...")
+    states, poses, predictions, search_rounds, rounds = search_hard_examples(
+        scorer, rng, args.road_type, args.candidates_per_round, args.refine_rounds)
+    errors = np.abs(predictions - poses["steering_label"])
+    selected = select_hard_examples(rng, errors, args.num_samples, args.uniform_mix)
+
+    # Uniform round-0 candidates are what random diversification would have written
+    uniform_stats = error_stats(errors[search_rounds == 0])
+    selected_stats = error_stats(errors[selected])
+    run_config = {
+        "run_name": os.path.basename(os.path.normpath(args.run_dir)), "road_type": args.road_type,
+        "seed": seed, "num_samples": args.num_samples, "camera_mode": args.camera_mode,
+        "camera_width": CAMERA_WIDTH, "camera_height": CAMERA_HEIGHT, "image_codec": args.codec,
+        "generator": "hard_examples", "model": args.model, "scored_states": len(errors),
+        "candidates_per_round": args.candidates_per_round, "refine_rounds": args.refine_rounds,
+        "refine_parent_fraction": REFINE_PARENT_FRACTION, "refine_scale": REFINE_SCALE,
+        "uniform_mix": args.uniform_mix, "rounds": rounds,
+        "uniform_error": uniform_stats, "selected_error": selected_stats,
+    }
+    write_run(args.run_dir, args.road_type, args.camera_mode, _take(poses, selected), predictions[selected],
+              search_rounds[selected], run_config, args.codec)
+
+    print(f"{'':<22} {'mean':>8} {'p50':>8} {'p90':>8} {'max':>8}")
+    for name, stats in (("uniform candidates", uniform_stats), ("written samples", selected_stats)):
+        print(f"{name:<22} {stats['mean']:8.3f} {stats['p50']:8.3f} {stats['p90']:8.3f} {stats['max']:8.3f}")
+    print(f"Wrote {args.num_samples} of {len(errors)} scored states ({args.num_samples / len(errors):.1%}) "
+          f"to {args.run_dir}; mean |error| {selected_stats['mean'] / max(uniform_stats['mean'], 1e-12):.1f}x "
+          f"that of uniform sampling.")
@@ -0,0 +1,133 @@
+#----------------------------------------------libraries
+import io
+import os
+import numpy as np
+from PIL import Image
+
+try:
+    import lz4.frame # Optional: only needed for the "lz4" codec
+except ImportError:
+    lz4 = None
+
+#-------------------------------------------------------
+# Codecs for the 8-bit grayscale camera frames. A codec is chosen by a spec string:
+#   "png" / "png:<level>"  PNG at zlib level 0-9 (PIL's default is 6; 1 is much faster, slightly larger)
+#   "npy"                  raw uint8 NumPy array (no compression, fastest, largest)
+#   "tiff"                 TIFF with PackBits run-length compression (fast, lossless, needs no extra package)
+#   "lz4"                  raw array compressed with LZ4 (needs the lz4 package)
+# Every codec is lossless, and frames are decoded by file extension, so runs written with
+# different codecs can be mixed.
+DEFAULT_CODEC = "png"
+PNG_DEFAULT_COMPRESS_LEVEL = 6
+
+#-----------------------------------------------------Codec classes
+
+class PngCodec:
+    extension = ".png"
+
+    def __init__(self, compress_level=PNG_DEFAULT_COMPRESS_LEVEL):
+        if not 0 <= compress_level <= 9:
+            raise ValueError(f"PNG compress level must be 0-9, got {compress_level}")
+        self.compress_level = compress_level
+        self.name = f"png:{compress_level}"
+
+    def encode(self, frame):
+        buffer = io.BytesIO()
+        Image.fromarray(frame, mode='L').save(buffer, format="PNG", compress_level=self.compress_level)
+        return buffer.getvalue()
+
+    def decode(self, data):
+        with Image.open(io.BytesIO(data)) as img:
+            return np.asarray(img.convert('L'))
+
+class NpyCodec:
+    extension = ".npy"
+    name = "npy"
+
+    def encode(self, frame):
+        buffer = io.BytesIO()
+        np.save(buffer, frame, allow_pickle=False)
+        return buffer.getvalue()
+
+    def decode(self, data):
+        return np.load(io.BytesIO(data), allow_pickle=False)
+
+class TiffCodec:
+    extension = ".tiff"
+    name = "tiff"
+
+    def encode(self, frame):
+        buffer = io.BytesIO()
+        Image.fromarray(frame, mode='L').save(buffer, format="TIFF", compression="packbits")
+        return buffer.getvalue()
+
+    def decode(self, data):
+        with Image.open(io.BytesIO(data)) as img:
+            return np.asarray(img.convert('L'))
+
+class Lz4Codec:
+    extension = ".npy.lz4"
+    name = "lz4"
+
+    def encode(self, frame):
+        _require_lz4()
+        return lz4.frame.compress(NpyCodec().encode(frame))
+
+    def decode(self, data):
+        _require_lz4()
+        return NpyCodec().decode(lz4.frame.decompress(data))
+
+def _require_lz4():
+    if lz4 is None:
+        raise ImportError("The lz4 codec needs the lz4 package (pip install lz4)")
+
+#-------------------------------------------------------Codec Functions
+
+def get_codec(spec=DEFAULT_CODEC):
+    """Returns the codec for a spec string such as "png", "png:1", "npy", "tiff" or "lz4"."""
+    name, _, option = spec.partition(":")
+    if name == "png":
+        return PngCodec(int(option)) if option else PngCodec()
+    if option:
+        raise ValueError(f"Codec {name} takes no option, got {spec}")
+    if name == "npy":
+        return NpyCodec()
+    if name == "tiff":
+        return TiffCodec()
+    if name == "lz4":
+        _require_lz4()
+        return Lz4Codec()
+    raise ValueError(f"Unknown image codec: {spec}")
+
+# Decoders by file extension, longest first (".npy.lz4" before ".npy")
+_CODEC_CLASSES = (Lz4Codec, PngCodec, NpyCodec, TiffCodec)
+FRAME_EXTENSIONS = tuple(codec_class.extension for codec_class in _CODEC_CLASSES)
+
+def is_frame_file(filename):
+    """True for frame images of any codec (temporary files of interrupted writes excluded)."""
+    return filename.endswith(FRAME_EXTENSIONS) and ".tmp" not in filename
+
+def find_frame_files(root_dir):
+    """Sorted paths of all frame images (any codec) under root_dir."""
+    paths = []
+    for directory, _, filenames in os.walk(root_dir):
+        paths += [os.path.join(directory, f) for f in filenames if is_frame_file(f)]
+    return sorted(paths)
+
+def _codec_for_path(path):
+    for codec_class in _CODEC_CLASSES:
+        if path.endswith(codec_class.extension):
+            return codec_class()
+    raise ValueError(f"No image codec for {path}")
+
+def save_frame(codec, frame, path):
+    """Encodes an (H, W) uint8 frame to path. Write then rename, so readers never see a partial file."""
+    temp_path = path + ".tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(codec.encode(frame))
+    os.replace(temp_path, path)
+
+def load_frame(path):
+    """Decodes a frame written by any codec (chosen by file extension). Returns an (H, W) uint8 array."""
+    with open(path, 'rb') as f:
+        return _codec_for_path(path).decode(f.read())
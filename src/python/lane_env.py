@@ -0,0 +1,227 @@
+#----------------------------------------------libraries
+import time
+import argparse
+import numpy as np
+import gymnasium as gym # Optional dependency: only this module needs it (pip install gymnasium)
+from gymnasium import spaces
+from gymnasium.vector import VectorEnv, AsyncVectorEnv, AutoresetMode
+from gymnasium.vector.utils import batch_space
+
+from simulator import (
+    SCREEN_WIDTH, SCREEN_HEIGHT,
+    LANE_WIDTH, ROAD_WIDTH, CAR_HEIGHT, CAR_SPEED,
+    CAMERA_WIDTH, CAMERA_HEIGHT, CAMERA_Y_OFFSET_FROM_CAR_CENTER,
+    CURVE_CENTER_X, CURVE_CENTER_Y, CURVE_RADIUS, CURVE_END_ANGLE_DEG
+)
+from batch_renderer import BatchRenderer
+
+#-------------------------------------------------------
+# Gymnasium environments around the simulator, for RL fine-tuning and policy evaluation.
+# Observation: the (CAMERA_HEIGHT, CAMERA_WIDTH) uint8 camera frame. BatchRenderer draws the road
+# with the simulator's pygame functions, so it is the frame data_generator would save for that
+# pose (get_camera_view), except where the view leaves the screen and get_camera_view clamps it.
+# Action: steering angle change in degrees (Car.steer_curved_road), clipped to MAX_STEERING_DEG.
+# Reward: 1 at the lane centre, falling linearly to 0 at the road edge.
+# Episodes terminate when the car leaves the road or reaches the end of the curve,
+# and are truncated after MAX_EPISODE_STEPS.
+# All cars are stepped as arrays and frames come from BatchRenderer, so there is no pygame
+# window and no frame-rate cap: the environments run headless at full speed.
+# Measured on one CPU core (python lane_env.py --num-envs N --road-type R, N = 8 and 64):
+# LaneKeepingVectorEnv ~5.4k-6.7k env-steps/s vs ~2.2k-2.8k for stepping LaneKeepingEnv N times,
+# because BatchRenderer gathers frames from a cached road raster instead of redrawing the road.
+MAX_STEERING_DEG = 10.0
+MAX_EPISODE_STEPS = 1000
+RESET_LATERAL_OFFSET = LANE_WIDTH / 4 # Start poses are randomised by up to this many pixels...
+RESET_ANGLE_DEG = 10 # ...and degrees of heading
+
+#-------------------------------------------------------Vectorised Simulation
+
+class LaneKeepingSim:
+    """
+    N cars driving the "straight" or "curved" road, stored as arrays
+    (same kinematics as Car.move and Car.steer_curved_road).
+    """
+    def __init__(self, num_cars, road_type="curved", heading_aligned=False):
+        self.num_cars = num_cars
+        self.road_type = road_type
+        self.renderer = BatchRenderer(road_type, CAMERA_WIDTH, CAMERA_HEIGHT, heading_aligned=heading_aligned)
+        self.x = np.zeros(num_cars)
+        self.y = np.zeros(num_cars)
+        self.angle = np.zeros(num_cars)
+        self.camera_offsets = np.full(num_cars, CAMERA_Y_OFFSET_FROM_CAR_CENTER, dtype=np.float32)
+
+    def reset_cars(self, mask, rng):
+        """Puts the selected cars back at the start of the road with a random offset and heading."""
+        count = int(np.count_nonzero(mask))
+        lateral = rng.uniform(-RESET_LATERAL_OFFSET, RESET_LATERAL_OFFSET, count)
+        if self.road_type == "straight":
+            self.x[mask] = SCREEN_WIDTH / 2 + lateral
+            self.y[mask] = SCREEN_HEIGHT - CAR_HEIGHT - 50
+        else:
+            self.x[mask] = CURVE_CENTER_X + lateral
+            self.y[mask] = CURVE_CENTER_Y - CURVE_RADIUS
+        self.angle[mask] = 90 + rng.uniform(-RESET_ANGLE_DEG, RESET_ANGLE_DEG, count)
+
+    def step(self, steering_deg):
+        self.angle = (self.angle + steering_deg) % 360
+        angle_rad = np.deg2rad(self.angle)
+        self.x += CAR_SPEED * np.cos(angle_rad)
+        self.y -= CAR_SPEED * np.sin(angle_rad)
+        if self.road_type == "straight":
+            # The straight road repeats vertically, so driving off the top wraps around
+            self.y = np.where(self.y < -CAR_HEIGHT, self.y + SCREEN_HEIGHT + 2 * CAR_HEIGHT, self.y)
+
+    def lane_offsets(self):
+        """Signed distance (pixels) from the lane centre / ideal curve radius, as in data_generator."""
+        if self.road_type == "straight":
+            return self.x - SCREEN_WIDTH / 2
+        return np.hypot(self.x - CURVE_CENTER_X, self.y - CURVE_CENTER_Y) - CURVE_RADIUS
+
+    def end_of_road(self):
+        if self.road_type == "straight":
+            return np.zeros(self.num_cars, dtype=bool)
+        polar_angle_deg = np.degrees(np.arctan2(CURVE_CENTER_Y - self.y, self.x - CURVE_CENTER_X)) % 360
+        return polar_angle_deg >= CURVE_END_ANGLE_DEG
+
+    def render(self, mask=None):
+        """Renders a new (N, H, W) uint8 array of camera frames (only the selected cars if mask is given)."""
+        if mask is None:
+            return self.renderer.render(self.x, self.y, self.angle, self.camera_offsets)
+        return self.renderer.render(self.x[mask], self.y[mask], self.angle[mask], self.camera_offsets[mask])
+
+def _rewards_and_terminations(sim):
+    offsets = sim.lane_offsets()
+    off_road = np.abs(offsets) > ROAD_WIDTH / 2
+    rewards = np.clip(1 - np.abs(offsets) / (ROAD_WIDTH / 2), 0, 1)
+    return rewards, off_road | sim.end_of_road(), offsets, off_road
+
+def _observation_space():
+    return spaces.Box(0, 255, (CAMERA_HEIGHT, CAMERA_WIDTH), dtype=np.uint8)
+
+def _action_space():
+    return spaces.Box(-MAX_STEERING_DEG, MAX_STEERING_DEG, (1,), dtype=np.float32)
+
+#-----------------------------------------------------LaneKeepingEnv class
+
+class LaneKeepingEnv(gym.Env):
+    """Single-car lane keeping environment (see the module comment for spaces and reward)."""
+    metadata = {"render_modes": ["rgb_array"]}
+
+    def __init__(self, road_type="curved", max_episode_steps=MAX_EPISODE_STEPS, render_mode=None):
+        self.sim = LaneKeepingSim(1, road_type)
+        self.max_episode_steps = max_episode_steps
+        self.render_mode = render_mode
+        self.observation_space = _observation_space()
+        self.action_space = _action_space()
+        self._steps = 0
+        self._frame = None
+
+    def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        self.sim.reset_cars(np.ones(1, dtype=bool), self.np_random)
+        self._steps = 0
+        self._frame = self.sim.render()[0]
+        return self._frame, {"lane_offset": float(self.sim.lane_offsets()[0])}
+
+    def step(self, action):
+        steering = np.clip(np.asarray(action, dtype=np.float64).reshape(1), -MAX_STEERING_DEG, MAX_STEERING_DEG)
+        self.sim.step(steering)
+        self._steps += 1
+        rewards, terminated, offsets, off_road = _rewards_and_terminations(self.sim)
+        info = {"lane_offset": float(offsets[0]), "off_road": bool(off_road[0])}
+        self._frame = self.sim.render()[0]
+        return self._frame, float(rewards[0]), bool(terminated[0]), self._steps >= self.max_episode_steps, info
+
+    def render(self):
+        if self.render_mode == "rgb_array" and self._frame is not None:
+            return np.repeat(self._frame[..., None], 3, axis=-1)
+        return None
+
+#-----------------------------------------------------LaneKeepingVectorEnv class
+
+class LaneKeepingVectorEnv(VectorEnv):
+    """
+    num_envs cars stepped together in one process with array operations and one batched render.
+    Finished environments are reset in the same step (AutoresetMode.SAME_STEP): the returned
+    observation and lane_offset are the new episode's, and the last frame and step info are in
+    info["final_obs"] and info["final_info"] (masked by "_final_obs" / "_final_info", as SyncVectorEnv).
+    """
+    metadata = {"autoreset_mode": AutoresetMode.SAME_STEP}
+
+    def __init__(self, num_envs, road_type="curved", max_episode_steps=MAX_EPISODE_STEPS):
+        self.num_envs = num_envs
+        self.sim = LaneKeepingSim(num_envs, road_type)
+        self.max_episode_steps = max_episode_steps
+        self.single_observation_space = _observation_space()
+        self.single_action_space = _action_space()
+        self.observation_space = batch_space(self.single_observation_space, num_envs)
+        self.action_space = batch_space(self.single_action_space, num_envs)
+        self._steps = np.zeros(num_envs, dtype=np.int64)
+        self._np_random = None
+
+    def reset(self, seed=None, options=None):
+        if seed is not None or self._np_random is None:
+            self._np_random = np.random.default_rng(seed)
+        self.sim.reset_cars(np.ones(self.num_envs, dtype=bool), self._np_random)
+        self._steps[:] = 0
+        return self.sim.render(), {"lane_offset": self.sim.lane_offsets()}
+
+    def step(self, actions):
+        steering = np.clip(np.asarray(actions, dtype=np.float64).reshape(self.num_envs),
+                           -MAX_STEERING_DEG, MAX_STEERING_DEG)
+        self.sim.step(steering)
+        self._steps += 1
+        rewards, terminations, offsets, off_road = _rewards_and_terminations(self.sim)
+        truncations = (self._steps >= self.max_episode_steps) & ~terminations
+        infos = {"lane_offset": offsets, "off_road": off_road}
+
+        observations = self.sim.render()
+        done = terminations | truncations
+        if done.any():
+            final_observations = np.zeros_like(observations)
+            final_observations[done] = observations[done]
+            infos["final_obs"] = final_observations
+            infos["_final_obs"] = done
+            infos["final_info"] = {"lane_offset": np.where(done, offsets, 0.0), "_lane_offset": done,
+                                   "off_road": off_road & done, "_off_road": done}
+            infos["_final_info"] = done
+            self.sim.reset_cars(done, self._np_random)
+            self._steps[done] = 0
+            observations[done] = self.sim.render(done) # Only the reset cars are rendered again
+            infos["lane_offset"] = self.sim.lane_offsets()
+        return observations, rewards, terminations, truncations, infos
+
+def make_async_vector_env(num_envs, road_type="curved", max_episode_steps=MAX_EPISODE_STEPS):
+    """One LaneKeepingEnv per subprocess (gymnasium's AsyncVectorEnv), e.g. to spread rendering over cores."""
+    return AsyncVectorEnv([lambda: LaneKeepingEnv(road_type, max_episode_steps) for _ in range(num_envs)])
+
+#----------------------------------------------Throughput Benchmark
+
+def benchmark(env, num_steps, vectorized):
+    """Runs random actions for num_steps calls to step(). Returns env-steps/s."""
+    env.reset(seed=0)
+    env.action_space.seed(0)
+    start_time = time.perf_counter()
+    for _ in range(num_steps):
+        observation, reward, terminated, truncated, info = env.step(env.action_space.sample())
+        if not vectorized and (terminated or truncated):
+            env.reset()
+    elapsed = time.perf_counter() - start_time
+    return num_steps * (env.num_envs if vectorized else 1) / elapsed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Env-steps/s of the lane keeping environments.")
+    parser.add_argument("--road-type", choices=["straight", "curved"], default="curved")
+    parser.add_argument("--num-envs", type=int, default=64)
+    parser.add_argument("--steps", type=int, default=200, help="step() calls per environment type")
+    parser.add_argument("--async-envs", type=int, default=0, help="Also benchmark AsyncVectorEnv with this many processes")
+    args = parser.parse_args()
+
+    env = LaneKeepingEnv(args.road_type)
+    print(f"LaneKeepingEnv: {benchmark(env, args.steps, False):.0f} env-steps/s")
+    vector_env = LaneKeepingVectorEnv(args.num_envs, args.road_type)
+    print(f"LaneKeepingVectorEnv ({args.num_envs} envs): {benchmark(vector_env, args.steps, True):.0f} env-steps/s")
+    if args.async_envs:
+        async_env = make_async_vector_env(args.async_envs, args.road_type)
+        print(f"AsyncVectorEnv ({args.async_envs} processes): {benchmark(async_env, args.steps, True):.0f} env-steps/s")
+        async_env.close()
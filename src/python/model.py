@@ -0,0 +1,109 @@
+#----------------------------------------------libraries
+import torch
+import torch.nn as nn
+
+#-------------------------------------------------------
+# Model architectures. NVIDIA_PilotNet is the trained model (best_lane_keeping_model.pth);
+# StudentPilotNet builds smaller networks for distillation (distill.py).
+# All models take the same (N, 1, 66, 200) input in [-1, 1] and return (N, 1) steering,
+# so every exported model is a drop-in replacement for models/nvidia_pilotnet.onnx.
+IMG_HEIGHT, IMG_WIDTH, IMG_CHANNELS = 66, 200, 1 # For grayscale
+
+# Student configurations: conv layers as (out_channels, kernel_size, stride), FC hidden sizes,
+# depthwise-separable convs (after the first layer), and input_pool, an average pooling
+# applied to the input first (a smaller input image at the same ONNX interface)
+STUDENT_CONFIGS = {
+    "half": {"conv_layers": [(12, 5, 2), (18, 5, 2), (24, 5, 2), (32, 3, 1), (32, 3, 1)],
+             "fc_sizes": [50, 10]},
+    "depthwise": {"conv_layers": [(24, 5, 2), (36, 5, 2), (48, 5, 2), (64, 3, 1), (64, 3, 1)],
+                  "fc_sizes": [50, 10], "depthwise": True},
+    "small_input": {"conv_layers": [(24, 5, 2), (36, 5, 2), (48, 3, 2)],
+                    "fc_sizes": [50, 10], "input_pool": 2},
+    "tiny": {"conv_layers": [(8, 5, 2), (16, 5, 2), (24, 3, 2)],
+             "fc_sizes": [16], "depthwise": True, "input_pool": 2},
+}
+
+#-----------------------------------------------------NVIDIA_PilotNet class
+
+class NVIDIA_PilotNet(nn.Module):
+    def __init__(self):
+        super(NVIDIA_PilotNet, self).__init__()
+
+        # Convolutional Layers
+        # Input: (Batch_Size, C, H, W) -> (Batch_Size, 1, 66, 200) for grayscale
+        self.conv_layers = nn.Sequential(
+            nn.Conv2d(IMG_CHANNELS, 24, kernel_size=5, stride=2), # Output: (24, 31, 98) assuming 66x200 input
+            nn.ReLU(),
+            nn.Conv2d(24, 36, kernel_size=5, stride=2), # Output: (36, 14, 47)
+            nn.ReLU(),
+            nn.Conv2d(36, 48, kernel_size=5, stride=2), # Output: (48, 5, 22)
+            nn.ReLU(),
+            nn.Conv2d(48, 64, kernel_size=3, stride=1), # Output: (64, 3, 20)
+            nn.ReLU(),
+            nn.Conv2d(64, 64, kernel_size=3, stride=1), # Output: (64, 1, 18)
+            nn.ReLU()
+        )
+
+        # Fully Connected Layers
+        self.fc_layers = nn.Sequential(
+            nn.Linear(64 * 1 * 18, 100),
+            nn.ReLU(),
+            nn.Dropout(0.5), # Dropout for regularisation
+            nn.Linear(100, 50),
+            nn.ReLU(),
+            nn.Dropout(0.5),
+            nn.Linear(50, 10),
+            nn.ReLU(),
+            nn.Linear(10, 1) # Output for steering angle (regression)
+        )
+
+    def forward(self, x):
+        x = self.conv_layers(x)
+        # Flatten for fully connected layers, except for batch dimension
+        # (reshape rather than view: with channels_last the conv output is not contiguous)
+        x = x.reshape(x.size(0), -1)
+        x = self.fc_layers(x)
+        return x
+
+#-----------------------------------------------------StudentPilotNet class
+
+class StudentPilotNet(nn.Module):
+    """PilotNet-style network with configurable width, depthwise-separable convs and input pooling."""
+    def __init__(self, conv_layers, fc_sizes, depthwise=False, input_pool=1):
+        super(StudentPilotNet, self).__init__()
+        layers = [nn.AvgPool2d(input_pool)] if input_pool > 1 else []
+        in_channels = IMG_CHANNELS
+        for index, (out_channels, kernel_size, stride) in enumerate(conv_layers):
+            if depthwise and index > 0:
+                # Per-channel spatial conv, then a 1x1 conv to mix channels
+                layers += [nn.Conv2d(in_channels, in_channels, kernel_size, stride=stride, groups=in_channels),
+                           nn.Conv2d(in_channels, out_channels, kernel_size=1)]
+            else:
+                layers.append(nn.Conv2d(in_channels, out_channels, kernel_size, stride=stride))
+            layers.append(nn.ReLU())
+            in_channels = out_channels
+        self.conv_layers = nn.Sequential(*layers)
+
+        # Flattened size from the conv output for a 66x200 input
+        with torch.no_grad():
+            flat_size = self.conv_layers(torch.zeros(1, IMG_CHANNELS, IMG_HEIGHT, IMG_WIDTH)).numel()
+        fc_layers = []
+        for hidden_size in fc_sizes:
+            fc_layers += [nn.Linear(flat_size, hidden_size), nn.ReLU()]
+            flat_size = hidden_size
+        fc_layers.append(nn.Linear(flat_size, 1))
+        self.fc_layers = nn.Sequential(*fc_layers)
+
+    def forward(self, x):
+        x = self.conv_layers(x)
+        x = x.reshape(x.size(0), -1)
+        return self.fc_layers(x)
+
+def build_student(name):
+    """The StudentPilotNet named in STUDENT_CONFIGS."""
+    if name not in STUDENT_CONFIGS:
+        raise ValueError(f"Unknown student {name!r}, expected one of {list(STUDENT_CONFIGS)}")
+    return StudentPilotNet(**STUDENT_CONFIGS[name])
+
+def count_parameters(model):
+    return sum(parameter.numel() for parameter in model.parameters())
@@ -1,87 +1,175 @@
+#----------------------------------------------libraries
+import argparse
+import numpy as np
 import torch
 import torch.nn as nn
 
-# Define the NVIDIA_PilotNet class (copy-pasted for self-containment,
-# but consider moving this to src/python/model.py for better project structure)
-class NVIDIA_PilotNet(nn.Module):
-    def __init__(self):
-        super(NVIDIA_PilotNet, self).__init__()
-        self.conv_layers = nn.Sequential(
-            nn.Conv2d(1, 24, kernel_size=5, stride=2),
-            nn.ReLU(),
-            nn.Conv2d(24, 36, kernel_size=5, stride=2),
-            nn.ReLU(),
-            nn.Conv2d(36, 48, kernel_size=5, stride=2),
-            nn.ReLU(),
-            nn.Conv2d(48, 64, kernel_size=3, stride=1),
-            nn.ReLU(),
-            nn.Conv2d(64, 64, kernel_size=3, stride=1),
-            nn.ReLU()
-        )
-        self.fc_layers = nn.Sequential(
-            nn.Linear(64 * 1 * 18, 100),
-            nn.ReLU(),
-            nn.Dropout(0.5),
-            nn.Linear(100, 50),
-            nn.ReLU(),
-            nn.Dropout(0.5),
-            nn.Linear(50, 10),
-            nn.ReLU(),
-            nn.Linear(10, 1)
-        )
-
-    def forward(self, x):
-        x = self.conv_layers(x)
-        x = x.view(x.size(0), -1)
-        x = self.fc_layers(x)
-        return x
-
-# --- Model Export Code ---
-
-# 1. Instantiate the model
-model = NVIDIA_PilotNet()
-
-# 2. Load the best trained weights
-# Ensure the path to your best model is correct.
-# Assuming 'best_lane_keeping_model.pth' is located in your 'models/' directory.
-model_path = 'models/best_lane_keeping_model.pth'
-
-# It's good practice to map location to CPU if you trained on GPU
-# and want to ensure it loads correctly on any system for export.
-model.load_state_dict(torch.load(model_path, map_location=torch.device('cpu')))
-model.eval() # Set the model to evaluation mode (important for layers like dropout, batchnorm)
-
-# 3. Create a dummy input tensor
-# This dummy input must match the expected input size of your model (Batch_Size, C, H, W).
-# For this PilotNet model, it's (1, 1, 66, 200) for a single grayscale image.
-dummy_input = torch.randn(1, 1, 66, 200)
-
-# 4. Define the ONNX export path
-onnx_model_path = "models/nvidia_pilotnet.onnx" # The ONNX model will be saved in the 'models/' directory.
-
-# 5. Export the model
-torch.onnx.export(
-    model,
-    dummy_input,
-    onnx_model_path,
-    export_params=True,          # Store the trained parameter weights inside the model file
-    opset_version=11,            # The ONNX opset version to use (version 11 is common and stable)
-    do_constant_folding=True,    # Whether to execute constant folding for optimization
-    input_names=['input'],       # Name the input tensor
-    output_names=['output'],     # Name the output tensor
-    dynamic_axes={               # Define dynamic axes if your batch size can vary
-        'input': {0: 'batch_size'},
-        'output': {0: 'batch_size'}
-    }
-)
-
-print(f"Model exported to ONNX format at: {onnx_model_path}")
-
-# Optional: Verify the ONNX model (requires onnx installed)
-try:
-    import onnx
-    onnx_model = onnx.load(onnx_model_path)
-    onnx.checker.check_model(onnx_model)
-    print("ONNX model check passed!")
-except Exception as e:
-    print(f"ONNX model check failed: {e}")
+from simulator import CAMERA_WIDTH, CAMERA_HEIGHT
+from preprocessing import MODEL_INPUT_HEIGHT, MODEL_INPUT_WIDTH, PIL_PRECISION_BITS, pil_bilinear_weights
+from model import NVIDIA_PilotNet
+
+#-------------------------------------------------------
+# Exports the trained PilotNet (or any model from model.py, e.g. distilled students) to ONNX.
+#   default:  float32 input (N, 1, 66, 200) in [-1, 1]; the caller preprocesses every frame
+#   --fused:  uint8 camera frames in, with the training preprocessing (grayscale, resize to 66x200,
+#             normalize to [-1, 1]) inside the graph, matching preprocessing.Preprocessor exactly.
+#             "gray" takes (N, 150, 200) frames as produced by get_camera_view,
+#             "rgb" takes (N, 150, 200, 3) frames in RGB channel order (convert BGR first); its
+#             grayscale can differ by one level on rare pixels (float summation order, as np.dot varies too).
+WEIGHTS_PATH = "models/best_lane_keeping_model.pth"
+ONNX_MODEL_PATH = "models/nvidia_pilotnet.onnx"
+FUSED_MODEL_PATHS = {"gray": "models/nvidia_pilotnet_uint8.onnx",
+                     "rgb": "models/nvidia_pilotnet_rgb_uint8.onnx"}
+OPSET_VERSION = 11 # The ONNX opset version to use (version 11 is common and stable)
+GRAYSCALE_WEIGHTS = [0.2989, 0.5870, 0.1140] # Luminosity method, as in get_camera_view
+VERIFY_FRAMES = 64 # Frames from data/test_images (or random frames) to compare fused vs float model
+
+#-----------------------------------------------------FusedPreprocessing class
+
+class FusedPreprocessing(nn.Module):
+    """
+    Wraps a model so that it takes uint8 camera frames and preprocesses them itself,
+    with the same arithmetic as preprocessing.Preprocessor (and so as the training notebook):
+    PIL's fixed-point resize weights are applied as one MatMul per axis in float64, where
+    they are exact, and every pass is rounded to 8-bit levels like PIL does.
+    """
+    def __init__(self, model, input_format="gray", in_height=CAMERA_HEIGHT, in_width=CAMERA_WIDTH,
+                 out_height=MODEL_INPUT_HEIGHT, out_width=MODEL_INPUT_WIDTH):
+        super(FusedPreprocessing, self).__init__()
+        if input_format not in FUSED_MODEL_PATHS:
+            raise ValueError(f"input_format must be one of {list(FUSED_MODEL_PATHS)}, got {input_format!r}")
+        self.model = model
+        self.input_format = input_format
+        row_weights = pil_bilinear_weights(in_height, out_height)
+        column_weights = pil_bilinear_weights(in_width, out_width)
+        self.resize_rows = row_weights is not None
+        self.resize_columns = column_weights is not None
+        # Graph constants (unused ones are dropped from the export)
+        self.register_buffer("grayscale_weights", torch.tensor(GRAYSCALE_WEIGHTS, dtype=torch.float64))
+        self.register_buffer("row_weights", torch.from_numpy(
+            row_weights if self.resize_rows else np.eye(in_height)))
+        self.register_buffer("column_weights", torch.from_numpy(
+            column_weights.T.copy() if self.resize_columns else np.eye(in_width)))
+
+    def _round_pass(self, accumulated):
+        # PIL: (sum + rounding offset) >> precision bits
+        return torch.floor((accumulated + 2.0 ** (PIL_PRECISION_BITS - 1)) / 2.0 ** PIL_PRECISION_BITS)
+
+    def forward(self, frames):
+        pixels = frames.to(torch.float64)
+        if self.input_format == "rgb":
+            # get_camera_view saves (gray / 255 * 255) truncated to uint8
+            pixels = torch.floor(torch.matmul(pixels, self.grayscale_weights) / 255.0 * 255.0)
+        # Horizontal pass first, then vertical, as PIL does
+        if self.resize_columns:
+            pixels = self._round_pass(torch.matmul(pixels, self.column_weights))
+        if self.resize_rows:
+            pixels = self._round_pass(torch.matmul(self.row_weights, pixels))
+        pixels = torch.clamp(pixels.to(torch.float32), 0.0, 255.0)
+        model_input = (pixels / 255.0 - 0.5) / 0.5 # ToTensor + Normalize(mean=0.5, std=0.5)
+        return self.model(model_input.unsqueeze(1))
+
+#----------------------------------------------Export Functions
+
+def load_model(weights_path=WEIGHTS_PATH):
+    """PilotNet with the trained weights, in evaluation mode (no dropout)."""
+    model = NVIDIA_PilotNet()
+    # It's good practice to map location to CPU if you trained on GPU
+    # and want to ensure it loads correctly on any system for export.
+    model.load_state_dict(torch.load(weights_path, map_location=torch.device('cpu')))
+    model.eval() # Set the model to evaluation mode (important for layers like dropout, batchnorm)
+    return model
+
+def _export(model, dummy_input, onnx_model_path, opset_version):
+    torch.onnx.export(
+        model,
+        dummy_input,
+        onnx_model_path,
+        export_params=True,          # Store the trained parameter weights inside the model file
+        opset_version=opset_version,
+        do_constant_folding=True,    # Whether to execute constant folding for optimization
+        input_names=['input'],       # Name the input tensor
+        output_names=['output'],     # Name the output tensor
+        dynamic_axes={               # Define dynamic axes if your batch size can vary
+            'input': {0: 'batch_size'},
+            'output': {0: 'batch_size'}
+        },
+        dynamo=False                 # TorchScript exporter (the default before torch 2.9)
+    )
+
+def export_onnx(model, onnx_model_path=ONNX_MODEL_PATH, opset_version=OPSET_VERSION):
+    """Float model: input (N, 1, 66, 200) float32 in [-1, 1]. Any model from model.py can be exported."""
+    dummy_input = torch.randn(1, 1, MODEL_INPUT_HEIGHT, MODEL_INPUT_WIDTH)
+    _export(model, dummy_input, onnx_model_path, opset_version)
+
+def export_fused_onnx(model, onnx_model_path, input_format="gray", opset_version=OPSET_VERSION):
+    """Model with preprocessing inside: input (N, 150, 200) or (N, 150, 200, 3) uint8 frames."""
+    fused_model = FusedPreprocessing(model, input_format).eval()
+    frame_shape = (CAMERA_HEIGHT, CAMERA_WIDTH) + ((3,) if input_format == "rgb" else ())
+    dummy_input = torch.zeros((1,) + frame_shape, dtype=torch.uint8)
+    _export(fused_model, dummy_input, onnx_model_path, opset_version)
+
+def check_onnx(onnx_model_path):
+    # Optional: Verify the ONNX model (requires onnx installed)
+    try:
+        import onnx
+        onnx_model = onnx.load(onnx_model_path)
+        onnx.checker.check_model(onnx_model)
+        print("ONNX model check passed!")
+    except Exception as e:
+        print(f"ONNX model check failed: {e}")
+
+def verify_fused(fused_model_path, float_model_path, frames, input_format="gray"):
+    """
+    Runs both ONNX models with onnxruntime: the fused one on the uint8 frames (gray, or RGB),
+    the float one on Preprocessor output. Returns the maximum absolute steering difference.
+    """
+    import onnxruntime as ort
+    from preprocessing import Preprocessor
+    fused_session = ort.InferenceSession(fused_model_path, providers=["CPUExecutionProvider"])
+    float_session = ort.InferenceSession(float_model_path, providers=["CPUExecutionProvider"])
+    if input_format == "rgb":
+        gray_frames = np.multiply(np.dot(frames, GRAYSCALE_WEIGHTS) / 255.0, 255).astype(np.uint8)
+    else:
+        gray_frames = frames
+    fused_output = fused_session.run(None, {"input": frames})[0]
+    float_output = float_session.run(None, {"input": Preprocessor()(gray_frames)})[0]
+    return float(np.abs(fused_output - float_output).max())
+
+def _verification_frames(input_format, num_frames=VERIFY_FRAMES):
+    # Saved camera frames are grayscale; random colour frames cover the RGB path
+    from image_codec import find_frame_files, load_frame
+    rng = np.random.default_rng(0)
+    if input_format == "rgb":
+        return rng.integers(0, 256, (num_frames, CAMERA_HEIGHT, CAMERA_WIDTH, 3), dtype=np.uint8)
+    frames = [load_frame(path) for path in find_frame_files("data/test_images")[:num_frames]]
+    frames = [frame for frame in frames if frame.shape == (CAMERA_HEIGHT, CAMERA_WIDTH)]
+    if frames:
+        return np.stack(frames)
+    return rng.integers(0, 256, (num_frames, CAMERA_HEIGHT, CAMERA_WIDTH), dtype=np.uint8)
+
+#-------------------------------------------------------Main Execution Block:
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the trained PilotNet to ONNX.")
+    parser.add_argument("--weights", default=WEIGHTS_PATH)
+    parser.add_argument("--output", default=ONNX_MODEL_PATH, help="Float model (always written)")
+    parser.add_argument("--opset", type=int, default=OPSET_VERSION)
+    parser.add_argument("--fused", choices=list(FUSED_MODEL_PATHS), default=None,
+                        help="Also export a uint8-input model with preprocessing in the graph")
+    parser.add_argument("--fused-output", default=None,
+                        help="Path of the fused model (default: models/nvidia_pilotnet[_rgb]_uint8.onnx)")
+    args = parser.parse_args()
+
+    model = load_model(args.weights)
+    export_onnx(model, args.output, args.opset)
+    print(f"Model exported to ONNX format at: {args.output}")
+    check_onnx(args.output)
+
+    if args.fused:
+        fused_model_path = args.fused_output or FUSED_MODEL_PATHS[args.fused]
+        export_fused_onnx(model, fused_model_path, args.fused, args.opset)
+        print(f"Model with {args.fused} uint8 input and fused preprocessing exported to: {fused_model_path}")
+        check_onnx(fused_model_path)
+        frames = _verification_frames(args.fused)
+        max_difference = verify_fused(fused_model_path, args.output, frames, args.fused)
+        print(f"Max |steering difference| vs float model + Preprocessor on {len(frames)} frames: {max_difference:.2e}")
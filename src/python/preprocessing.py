@@ -0,0 +1,106 @@
+#----------------------------------------------libraries
+import numpy as np
+
+from simulator import CAMERA_WIDTH, CAMERA_HEIGHT
+
+#-------------------------------------------------------
+# Model input preprocessing without PIL/torchvision, for batches of uint8 camera frames.
+# Reproduces the training pipeline of the notebook exactly:
+#   mpimg.imread (frame / 255) -> ToPILImage (x * 255 back to uint8; lossless for all 256 levels)
+#   -> Resize((66, 200)) (PIL bilinear with antialiasing, fixed-point, rounded to uint8)
+#   -> ToTensor (/ 255) -> Normalize(mean=0.5, std=0.5), i.e. [-1, 1]
+# The resize is separable, so it is one precomputed weight matrix per axis.
+MODEL_INPUT_HEIGHT = 66
+MODEL_INPUT_WIDTH = 200
+PIL_PRECISION_BITS = 32 - 8 - 2 # Fixed-point precision of PIL's 8-bit resampling
+# ToTensor + Normalize for every 8-bit level, applied as a lookup
+NORMALIZED_LEVELS = (np.arange(256, dtype=np.float32) / 255 - 0.5) / 0.5
+
+#-------------------------------------------------------Resize Weights
+
+def pil_bilinear_weights(in_size, out_size):
+    """
+    Weight matrix (out_size, in_size) of PIL's antialiased bilinear resize along one axis,
+    as the integer fixed-point coefficients PIL applies to 8-bit images.
+    Returns None when the size does not change (PIL skips that pass).
+    """
+    if in_size == out_size:
+        return None
+    scale = in_size / out_size
+    filter_scale = max(scale, 1.0)
+    support = 1.0 * filter_scale # The bilinear (triangle) filter has support 1, widened when downsampling
+    weights = np.zeros((out_size, in_size), dtype=np.float64)
+    for out_index in range(out_size):
+        center = (out_index + 0.5) * scale
+        first = max(int(center - support + 0.5), 0)
+        last = min(int(center + support + 0.5), in_size)
+        taps = (np.arange(first, last) - center + 0.5) / filter_scale
+        kernel = np.maximum(1.0 - np.abs(taps), 0.0)
+        weights[out_index, first:last] = kernel / kernel.sum()
+    # Same rounding as PIL's normalize_coeffs_8bpc
+    fixed = weights * (1 << PIL_PRECISION_BITS)
+    return np.trunc(np.where(fixed < 0, fixed - 0.5, fixed + 0.5))
+
+def _filter_taps(weights):
+    """
+    Sparse form of a resize weight matrix: for every output position, the input indices
+    and weights of its (few) non-zero taps, zero-padded to the same count. Shapes (out, taps).
+    """
+    num_taps = int((weights != 0).sum(axis=1).max())
+    indices = np.zeros((weights.shape[0], num_taps), dtype=np.intp)
+    coefficients = np.zeros((weights.shape[0], num_taps), dtype=np.int32)
+    for out_index, row in enumerate(weights):
+        taps = np.nonzero(row)[0]
+        indices[out_index, :len(taps)] = taps
+        coefficients[out_index, :len(taps)] = row[taps]
+    return indices, coefficients
+
+def _resample(pixels, taps, axis):
+    # A handful of gathered multiply-adds per output pixel instead of a dense matmul, in the
+    # same integer arithmetic as PIL (the weights sum to 2**22, so 8-bit sums fit in int32)
+    indices, coefficients = taps
+    if axis == 1:
+        shape = (pixels.shape[0], indices.shape[0], pixels.shape[2])
+    else:
+        shape = (pixels.shape[0], pixels.shape[1], indices.shape[0])
+    accumulated = np.full(shape, 1 << (PIL_PRECISION_BITS - 1), dtype=np.int32) # Rounding offset
+    for tap in range(indices.shape[1]):
+        if axis == 1:
+            accumulated += pixels[:, indices[:, tap], :] * coefficients[:, tap, None]
+        else:
+            accumulated += pixels[:, :, indices[:, tap]] * coefficients[:, tap]
+    accumulated >>= PIL_PRECISION_BITS
+    return np.clip(accumulated, 0, 255).astype(np.uint8)
+
+#-----------------------------------------------------Preprocessor class
+
+class Preprocessor:
+    """
+    Turns uint8 camera frames (N, H, W) (or a single (H, W) frame) into the model's
+    float32 (N, 1, 66, 200) input in [-1, 1]. Weights are built once per frame size.
+    """
+    def __init__(self, in_height=CAMERA_HEIGHT, in_width=CAMERA_WIDTH,
+                 out_height=MODEL_INPUT_HEIGHT, out_width=MODEL_INPUT_WIDTH):
+        self.in_shape = (in_height, in_width)
+        row_weights = pil_bilinear_weights(in_height, out_height)
+        column_weights = pil_bilinear_weights(in_width, out_width)
+        self.row_taps = _filter_taps(row_weights) if row_weights is not None else None
+        self.column_taps = _filter_taps(column_weights) if column_weights is not None else None
+
+    def __call__(self, frames):
+        return NORMALIZED_LEVELS[self.resize(frames)[:, None]]
+
+    def resize(self, frames):
+        """The resized frames as uint8 (N, 66, 200), before normalization (4x smaller to keep in memory)."""
+        frames = np.asarray(frames)
+        if frames.ndim == 2:
+            frames = frames[None]
+        if frames.shape[1:] != self.in_shape:
+            raise ValueError(f"Expected frames of shape (N, {self.in_shape[0]}, {self.in_shape[1]}), got {frames.shape}")
+        pixels = frames.astype(np.uint8, copy=False)
+        # PIL resamples horizontally first, then vertically (rounding to uint8 after each pass)
+        if self.column_taps is not None:
+            pixels = _resample(pixels, self.column_taps, axis=2)
+        if self.row_taps is not None:
+            pixels = _resample(pixels, self.row_taps, axis=1)
+        return pixels
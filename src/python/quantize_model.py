@@ -0,0 +1,167 @@
+#----------------------------------------------libraries
+import os
+import time
+import json
+import argparse
+import numpy as np
+import onnx
+import onnxruntime as ort
+from onnxruntime.quantization import (
+    CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic, quantize_static
+)
+from onnxruntime.quantization.shape_inference import quant_pre_process
+
+from image_codec import find_frame_files, load_frame
+from preprocessing import Preprocessor
+
+#-------------------------------------------------------
+# INT8 variants of the exported float model (model_export.py), and a report comparing them:
+# steering MAE against the float model on real frames, and CPU latency per batch size.
+#   dynamic: weights stored as INT8, activations quantized on the fly (no calibration)
+#   static:  weights and activations INT8 (QDQ format), activation ranges calibrated on frames
+#            from the generated runs
+FLOAT_MODEL_PATH = "models/nvidia_pilotnet.onnx"
+FRAMES_DIR = "data" # Searched recursively for frames (images/ of every run)
+CALIBRATION_FRAMES = 256
+EVALUATION_FRAMES = 1000 # Taken from the frames not used for calibration, when there are enough
+CALIBRATION_BATCH_SIZE = 32
+LATENCY_BATCH_SIZES = [1, 8, 32, 128]
+LATENCY_THREADS = 1 # Intra-op threads for the latency measurements (edge CPUs have few cores)
+LATENCY_REPEATS = 50
+SEED = 0
+# Per-channel QDQ quantization needs DequantizeLinear's axis attribute (opset 13);
+# older exports (model_export.py uses opset 11) are converted first
+MIN_QUANTIZATION_OPSET = 13
+
+#-------------------------------------------------------Calibration Data
+
+class FrameCalibrationReader(CalibrationDataReader):
+    """Feeds preprocessed frames to the static quantizer in batches."""
+    def __init__(self, model_inputs, input_name, batch_size=CALIBRATION_BATCH_SIZE):
+        self._batches = iter([{input_name: model_inputs[start:start + batch_size]}
+                              for start in range(0, len(model_inputs), batch_size)])
+
+    def get_next(self):
+        return next(self._batches, None)
+
+def load_frame_sets(frames_dir, num_calibration, num_evaluation, seed=SEED):
+    """
+    Preprocessed model inputs for calibration and for evaluation, from disjoint random frames
+    (evaluation reuses calibration frames only if there are not enough frames).
+    """
+    paths = find_frame_files(frames_dir)
+    if not paths:
+        raise FileNotFoundError(f"No frames found under {frames_dir}")
+    paths = list(np.random.default_rng(seed).permutation(paths))
+    calibration_paths = paths[:num_calibration]
+    evaluation_paths = paths[num_calibration:num_calibration + num_evaluation] or calibration_paths
+    preprocess = Preprocessor()
+    calibration_inputs = preprocess(np.stack([load_frame(path) for path in calibration_paths]))
+    evaluation_inputs = preprocess(np.stack([load_frame(path) for path in evaluation_paths]))
+    return calibration_inputs, evaluation_inputs
+
+#-------------------------------------------------------Quantization
+
+def quantize_variants(float_model_path, calibration_inputs):
+    """Writes the dynamic and static INT8 models next to the float model. Returns {variant: path}."""
+    base_path, extension = os.path.splitext(float_model_path)
+    paths = {"float32": float_model_path,
+             "int8_dynamic": f"{base_path}_int8_dynamic{extension}",
+             "int8_static": f"{base_path}_int8_static{extension}"}
+
+    # Shape inference and graph cleanup first, as recommended for quantization
+    prepared_path = f"{base_path}_prepared{extension}"
+    model = onnx.load(float_model_path)
+    opset = next(entry.version for entry in model.opset_import if entry.domain in ("", "ai.onnx"))
+    if opset < MIN_QUANTIZATION_OPSET:
+        model = onnx.version_converter.convert_version(model, MIN_QUANTIZATION_OPSET)
+    onnx.save(model, prepared_path)
+    quant_pre_process(prepared_path, prepared_path)
+    try:
+        quantize_dynamic(prepared_path, paths["int8_dynamic"], weight_type=QuantType.QInt8)
+        input_name = ort.InferenceSession(prepared_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+        quantize_static(prepared_path, paths["int8_static"],
+                        FrameCalibrationReader(calibration_inputs, input_name),
+                        quant_format=QuantFormat.QDQ, per_channel=True,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    finally:
+        os.remove(prepared_path)
+    return paths
+
+#-------------------------------------------------------Report
+
+def _session(model_path, threads):
+    session_options = ort.SessionOptions()
+    session_options.intra_op_num_threads = threads
+    return ort.InferenceSession(model_path, session_options, providers=["CPUExecutionProvider"])
+
+def measure_latency(session, model_inputs, batch_sizes=LATENCY_BATCH_SIZES, repeats=LATENCY_REPEATS):
+    """Median milliseconds per Run() call at each batch size."""
+    input_name = session.get_inputs()[0].name
+    latencies = {}
+    for batch_size in batch_sizes:
+        # Repeat the available frames if there are fewer than batch_size
+        batch = np.resize(model_inputs, (batch_size, *model_inputs.shape[1:]))
+        session.run(None, {input_name: batch}) # Warm-up
+        timings = []
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            session.run(None, {input_name: batch})
+            timings.append(time.perf_counter() - start_time)
+        latencies[batch_size] = float(np.median(timings)) * 1e3
+    return latencies
+
+def compare_variants(model_paths, evaluation_inputs, threads=LATENCY_THREADS):
+    """Steering MAE vs the float model, model size and latency of every variant."""
+    predictions = {}
+    report = {}
+    for variant, model_path in model_paths.items():
+        session = _session(model_path, threads)
+        input_name = session.get_inputs()[0].name
+        predictions[variant] = session.run(None, {input_name: evaluation_inputs})[0].reshape(-1)
+        error = np.abs(predictions[variant] - predictions["float32"])
+        report[variant] = {
+            "path": model_path,
+            "size_kb": os.path.getsize(model_path) / 1024,
+            "mae_vs_float": float(error.mean()),
+            "max_error_vs_float": float(error.max()),
+            "latency_ms": measure_latency(session, evaluation_inputs),
+        }
+    return report
+
+#-------------------------------------------------------Main Execution Block:
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export INT8 variants of the ONNX model and compare them.")
+    parser.add_argument("--model", default=FLOAT_MODEL_PATH, help="Float ONNX model written by model_export.py")
+    parser.add_argument("--frames-dir", default=FRAMES_DIR)
+    parser.add_argument("--threads", type=int, default=LATENCY_THREADS)
+    parser.add_argument("--closed-loop-steps", type=int, default=0,
+                        help="Also drive each variant in closed_loop.py for this many steps (lane offset check)")
+    args = parser.parse_args()
+
+    calibration_inputs, evaluation_inputs = load_frame_sets(args.frames_dir, CALIBRATION_FRAMES, EVALUATION_FRAMES)
+    print(f"Calibrating on {len(calibration_inputs)} frames, evaluating on {len(evaluation_inputs)} frames.")
+    model_paths = quantize_variants(args.model, calibration_inputs)
+    report = compare_variants(model_paths, evaluation_inputs, args.threads)
+
+    if args.closed_loop_steps:
+        from closed_loop import run_closed_loop
+        for variant, model_path in model_paths.items():
+            drive = run_closed_loop(num_steps=args.closed_loop_steps, model_path=model_path, threads=args.threads)
+            report[variant]["closed_loop"] = {key: drive[key] for key in
+                                              ("mean_abs_lane_offset_px", "max_abs_lane_offset_px", "off_road")}
+
+    batch_header = " ".join(f"{f'b={b} ms':>10}" for b in LATENCY_BATCH_SIZES)
+    print(f"{'variant':<14} {'size KB':>8} {'MAE':>8} {'max err':>8} {batch_header}")
+    for variant, result in report.items():
+        latencies = " ".join(f"{result['latency_ms'][b]:10.3f}" for b in LATENCY_BATCH_SIZES)
+        print(f"{variant:<14} {result['size_kb']:8.0f} {result['mae_vs_float']:8.4f} "
+              f"{result['max_error_vs_float']:8.4f} {latencies}")
+        if "closed_loop" in result:
+            print(f"{'':<14} closed loop: mean |lane offset| {result['closed_loop']['mean_abs_lane_offset_px']:.1f} px, "
+                  f"{result['closed_loop']['off_road']} off road")
+
+    report_path = os.path.splitext(args.model)[0] + "_quantization_report.json"
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to {report_path}")
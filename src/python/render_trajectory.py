@@ -0,0 +1,142 @@
+#----------------------------------------------libraries
+import os
+import json
+import hashlib
+import argparse
+import numpy as np
+from multiprocessing import Pool
+
+from simulator import CAMERA_WIDTH, CAMERA_HEIGHT, CAMERA_Y_OFFSET_FROM_CAR_CENTER
+from batch_renderer import BatchRenderer
+from columnar import read_columns, read_metadata
+from image_codec import DEFAULT_CODEC, get_codec, save_frame
+
+#-------------------------------------------------------
+# Materialises camera frames from a trajectory log written by data_generator.py
+# (TRAJECTORY_ONLY = True). Frames go to <run>/renders/<camera configuration>/ with the
+# same images/ + labels.csv layout as a normal run; `combine_data.py --renders <configuration>`
+# takes them instead of the run's own images. BatchRenderer draws the road with the simulator's
+# pygame functions, so while the view lies inside the screen a re-render at the run's camera
+# settings gives the frames data_generator.py would have saved, pixel for pixel.
+# Frames that already exist for a configuration are not rendered again, as long as the trajectory
+# (a hash of the rendered columns), its sampling settings and the codec are unchanged.
+RENDERS_SUBDIR = "renders"
+RENDER_INFO_FILENAME = "render_info.json"
+FRAMES_PER_TASK = 256 # Frames rendered as one batch by a worker process
+
+#-------------------------------------------------------Worker Functions
+_worker_renderer = None # One BatchRenderer per worker process
+_worker_codec = None
+
+def _init_worker(road_type, width, height, heading_aligned, road_center_x, codec_spec):
+    global _worker_renderer, _worker_codec
+    _worker_renderer = BatchRenderer(road_type, width, height, heading_aligned, road_center_x=road_center_x)
+    _worker_codec = get_codec(codec_spec)
+
+def _render_task(task):
+    xs, ys, angles, camera_offsets, image_paths = task
+    frames = _worker_renderer.render(xs, ys, angles, camera_offsets)
+    for frame, image_path in zip(frames, image_paths):
+        # Written then renamed, so an interrupted render never leaves a truncated (but "cached") frame
+        save_frame(_worker_codec, frame, image_path)
+    return len(image_paths)
+
+#-------------------------------------------------------Rendering
+
+def trajectory_hash(columns, names=("x", "y", "angle", "camera_offset_y")):
+    """SHA-256 of the trajectory columns the frames are rendered from."""
+    digest = hashlib.sha256()
+    for name in names:
+        digest.update(np.ascontiguousarray(columns[name]).tobytes())
+    return digest.hexdigest()
+
+def render_trajectory(run_dir, camera_mode=None, width=CAMERA_WIDTH, height=CAMERA_HEIGHT,
+                      camera_offset_y=None, workers=None, codec=DEFAULT_CODEC):
+    """
+    Renders every sample of run_dir's trajectory log at the given camera configuration.
+    camera_mode: "fixed" or "heading" (default: the mode the run was logged with).
+    camera_offset_y: a number, "logged" (each sample's logged offset), or None for what
+    data_generator would have captured (get_camera_view uses the fixed default offset).
+    codec: image codec spec for the frames (see image_codec.py).
+    Returns the output directory.
+    """
+    trajectory_dir = os.path.join(run_dir, "trajectory")
+    metadata = read_metadata(trajectory_dir)
+    columns = read_columns(trajectory_dir, ["x", "y", "angle", "camera_offset_y", "steering_label"])
+    num_samples = len(columns["x"])
+
+    camera_mode = camera_mode or metadata["camera_mode"]
+    if camera_offset_y is None:
+        camera_offset_y = "logged" if camera_mode == "heading" else CAMERA_Y_OFFSET_FROM_CAR_CENTER
+    if camera_offset_y == "logged":
+        camera_offsets = columns["camera_offset_y"]
+        offset_name = "logged"
+    else:
+        camera_offsets = np.full(num_samples, float(camera_offset_y), dtype=np.float32)
+        offset_name = f"{float(camera_offset_y):g}"
+
+    codec_name = codec.replace(":", "-") # e.g. "png-1"
+    output_dir = os.path.join(run_dir, RENDERS_SUBDIR,
+                              f"{camera_mode}_{width}x{height}_offset{offset_name}_{codec_name}")
+    images_dir = os.path.join(output_dir, "images")
+    os.makedirs(images_dir, exist_ok=True)
+
+    # Cached frames are only valid for the trajectory they were rendered from
+    render_info = {"trajectory_sha256": trajectory_hash(columns), "seed": metadata["seed"],
+                   "num_samples": num_samples, "sample_stride": metadata.get("sample_stride"),
+                   "min_pose_change": metadata.get("min_pose_change"), "codec": codec}
+    render_info_path = os.path.join(output_dir, RENDER_INFO_FILENAME)
+    if os.path.exists(render_info_path):
+        with open(render_info_path) as f:
+            if json.load(f) != render_info:
+                print(f"Trajectory or settings changed since {output_dir} was rendered. Clearing cached frames.")
+                for filename in os.listdir(images_dir):
+                    os.remove(os.path.join(images_dir, filename))
+    with open(render_info_path, 'w') as f:
+        json.dump(render_info, f)
+
+    extension = get_codec(codec).extension
+    image_filenames = [f"frame_{i:05d}{extension}" for i in range(num_samples)]
+    missing = [i for i, filename in enumerate(image_filenames)
+               if not os.path.exists(os.path.join(images_dir, filename))]
+    print(f"{num_samples - len(missing)}/{num_samples} frames cached, rendering {len(missing)} into {output_dir}")
+
+    tasks = []
+    for start in range(0, len(missing), FRAMES_PER_TASK):
+        indices = np.array(missing[start:start + FRAMES_PER_TASK])
+        tasks.append((columns["x"][indices], columns["y"][indices], columns["angle"][indices],
+                      camera_offsets[indices],
+                      [os.path.join(images_dir, image_filenames[i]) for i in indices]))
+
+    if tasks:
+        init_args = (metadata["road_type"], width, height, camera_mode == "heading", metadata["world_width"] / 2,
+                     codec)
+        with Pool(workers, initializer=_init_worker, initargs=init_args) as pool:
+            rendered = 0
+            for count in pool.imap_unordered(_render_task, tasks):
+                rendered += count
+                print(f"Rendered {rendered}/{len(missing)} frames.")
+
+    with open(os.path.join(output_dir, "labels.csv"), 'w') as f:
+        f.write("image_filename,steering_angle\n")
+        for filename, steering_label in zip(image_filenames, columns["steering_label"]):
+            f.write(f"{filename},{steering_label}\n")
+    return output_dir
+
+#-------------------------------------------------------Main Execution Block:
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render camera frames from a trajectory-only run.")
+    parser.add_argument("run_dir", help="Run directory containing trajectory/ (e.g. data/run_v8_...)")
+    parser.add_argument("--camera-mode", choices=["fixed", "heading"], default=None,
+                        help="Camera type (default: the mode the run was logged with)")
+    parser.add_argument("--width", type=int, default=CAMERA_WIDTH)
+    parser.add_argument("--height", type=int, default=CAMERA_HEIGHT)
+    parser.add_argument("--camera-offset", default=None,
+                        help='Camera y offset from the car centre in pixels, or "logged" for the per-sample offsets')
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--codec", default=DEFAULT_CODEC,
+                        help='Image codec: "png", "png:<level>", "npy", "tiff" or "lz4" (see image_codec.py)')
+    args = parser.parse_args()
+
+    render_trajectory(args.run_dir, args.camera_mode, args.width, args.height, args.camera_offset, args.workers,
+                      args.codec)
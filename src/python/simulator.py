@@ -22,6 +22,8 @@ CAR_WIDTH = 30
 CAR_HEIGHT = 50
 CAR_SPEED = 3 # Pixels per frame
 CAR_STEERING_SPEED = 2 # Degrees per frame
+CAR_COLOR = (0, 0, 200) # Blue car
+CAR_SPRITE_ANGLE_STEP_DEG = 1 # Heading resolution of the pre-rotated car sprites
 
 # Camera parameters (what the ML model "sees")
 CAMERA_WIDTH = 200
@@ -45,6 +47,30 @@ CURVE_END_ANGLE_DEG = 180   # End at the left of the circle (clockwise arc)
 CURVE_START_ANGLE_RAD = np.radians(CURVE_START_ANGLE_DEG)
 CURVE_END_ANGLE_RAD = np.radians(CURVE_END_ANGLE_DEG)
 
+#-----------------------------------------------------Car Sprite Cache
+# Pre-rotated car sprites, shared by every car with the same size and colour.
+# Key: (width, height, color, angle_step_deg) -> list of rotated surfaces
+_car_sprite_cache = {}
+
+def get_car_sprites(width=CAR_WIDTH, height=CAR_HEIGHT, color=CAR_COLOR,
+                    angle_step_deg=CAR_SPRITE_ANGLE_STEP_DEG):
+    """
+    Returns the car rendered once at every angle_step_deg heading
+    (entry i is the car at heading i * angle_step_deg).
+    The sprites are built on first use and reused by all later calls.
+    """
+    key = (width, height, color, angle_step_deg)
+    sprites = _car_sprite_cache.get(key)
+    if sprites is None:
+        car_surf = pygame.Surface((width, height), pygame.SRCALPHA) # SRCALPHA for transparency
+        pygame.draw.rect(car_surf, color, (0, 0, width, height))
+        sprites = []
+        for i in range(int(round(360 / angle_step_deg))):
+            # Adjust angle for Pygame's default rotation (the unrotated sprite points up, i.e. 90 degrees)
+            sprites.append(pygame.transform.rotate(car_surf, i * angle_step_deg - 90))
+        _car_sprite_cache[key] = sprites
+    return sprites
+
 #-----------------------------------------------------Car clasee
 # This class will manage the car's position, orientation, and 
 #provide methods for movement and drawing.
@@ -54,6 +80,7 @@ class Car:
         self.y = y
         self.angle = angle # Angle in degrees, 0=right, 90=up, 180=left, 270=down
         self.speed = CAR_SPEED
+        self.color = CAR_COLOR
         # Allow camera offset to be adjusted per car (for diversification)
         self.camera_offset_y = CAMERA_Y_OFFSET_FROM_CAR_CENTER
 
@@ -80,14 +107,16 @@ class Car:
         self.angle %= 360
 
 
-    def draw(self, screen):
-        # Rotate car image/rectangle
-        car_surf = pygame.Surface((CAR_WIDTH, CAR_HEIGHT), pygame.SRCALPHA) # SRCALPHA for transparency
-        pygame.draw.rect(car_surf, (0, 0, 200), (0, 0, CAR_WIDTH, CAR_HEIGHT)) # Blue car
-        rotated_car = pygame.transform.rotate(car_surf, self.angle - 90) # Adjust angle for Pygame's default rotation
+    def draw(self, screen, origin=(0, 0)):
+        # origin is the world position of the screen's top-left corner
+        # (non-zero when the screen is a camera onto a larger TiledWorld)
+        # Blit the cached sprite nearest to the car's heading (no per-frame surface allocation)
+        sprites = get_car_sprites(CAR_WIDTH, CAR_HEIGHT, self.color)
+        sprite_index = int(round(self.angle / CAR_SPRITE_ANGLE_STEP_DEG)) % len(sprites)
+        rotated_car = sprites[sprite_index]
 
         # Get the rotated rectangle to position it correctly
-        new_rect = rotated_car.get_rect(center=(self.x, self.y))
+        new_rect = rotated_car.get_rect(center=(self.x - origin[0], self.y - origin[1]))
         screen.blit(rotated_car, new_rect.topleft)
 
 #------------------------------------------------------- Drawing Functions:
@@ -155,7 +184,7 @@ def draw_curved_lane_lines(screen, center_x, center_y, radius, start_angle_deg,
         current_angle_deg += dash_step_deg + gap_step_deg
 
 #------------------------------------------------ Camera View Capture
-def get_camera_view(screen, car):
+def get_camera_view(screen, car, origin=(0, 0), out=None):
     # Calculate camera top-left position relative to the car's orientation
     # This is simplified. For rotating camera, you'd need more complex geometry.
     # For now, assume camera looks "up" relative to screen, even if car rotates.
@@ -165,9 +194,12 @@ def get_camera_view(screen, car):
 
     # Calculate the top-left corner of the camera view
     # The camera is always fixed at the top of the car's bounding box
-    camera_x = car.x - CAMERA_WIDTH / 2
+    # origin is the world position of the screen's top-left corner (see Car.draw)
+    # out is an optional (CAMERA_HEIGHT, CAMERA_WIDTH) uint8 array that also receives the frame
+    # as it is saved to disk ((x * 255) truncated), e.g. a slot of a shared-memory FrameRing
+    camera_x = car.x - origin[0] - CAMERA_WIDTH / 2
     #camera_y = car.y + CAMERA_Y_RELATIVE_TO_CAR_FRONT # From the car's "front"
-    camera_y = car.y + CAMERA_Y_OFFSET_FROM_CAR_CENTER 
+    camera_y = car.y - origin[1] + CAMERA_Y_OFFSET_FROM_CAR_CENTER 
 
     # Ensure camera view is within screen bounds
     camera_x = max(0, min(camera_x, SCREEN_WIDTH - CAMERA_WIDTH))
@@ -192,6 +224,8 @@ def get_camera_view(screen, car):
 
     # Normalize to 0-1 range
     normalized_img = grayscale_img / 255.0
+    if out is not None:
+        np.multiply(normalized_img, 255, out=out, casting='unsafe') # Same as (x * 255).astype(np.uint8)
     # colour image to test
     ##normalized_img = img_array / 255.0 # Normalize RGB pixel values to 0-1
 
@@ -0,0 +1,105 @@
+#----------------------------------------------libraries
+import pygame
+from collections import OrderedDict
+
+from simulator import (
+    SCREEN_WIDTH, SCREEN_HEIGHT,
+    WHITE, BLACK, GRAY, YELLOW,
+    ROAD_WIDTH, LANE_WIDTH, LANE_LINE_WIDTH
+)
+
+#-------------------------------------------------------
+# --- Tiled World Constants
+# The world is larger than the screen and is stored as square tiles that are
+# rasterized the first time the camera needs them. Only the most recently used
+# tiles are kept, so memory and per-frame cost stay constant however long the drive.
+TILE_SIZE = 256 # Pixels per tile side
+MAX_CACHED_TILES = 64 # LRU capacity; a 800x600 camera touches at most 5x4 = 20 tiles
+WORLD_WIDTH = SCREEN_WIDTH # Same road layout across the screen as draw_road/draw_lane_lines
+WORLD_HEIGHT = SCREEN_HEIGHT * 100 # A long straight track (~20k frames at CAR_SPEED)
+
+#------------------------------------------------Tile Rasterizers
+
+def draw_straight_road_tile(tile, origin_x, origin_y, world):
+    """
+    Draws the part of a vertical straight road (same layout as draw_road and
+    draw_lane_lines, centred on the world) that falls inside one tile.
+    origin_x/origin_y is the world position of the tile's top-left corner.
+    """
+    tile_size = tile.get_width()
+    road_center_x = world.width / 2
+
+    # Road surface (pygame clips anything outside the tile)
+    road_left_x = road_center_x - ROAD_WIDTH / 2
+    pygame.draw.rect(tile, GRAY, (road_left_x - origin_x, 0, ROAD_WIDTH, tile_size))
+
+    # Left Lane Line (Dashed). Dashes are anchored to world y so they line up across tiles.
+    left_line_x = road_center_x - ROAD_WIDTH / 2 + LANE_WIDTH / 2
+    dash_period = LANE_LINE_WIDTH * 3
+    first_dash_y = origin_y - origin_y % dash_period
+    for y in range(first_dash_y, origin_y + tile_size, dash_period):
+        pygame.draw.rect(tile, WHITE, (left_line_x - LANE_LINE_WIDTH / 2 - origin_x, y - origin_y,
+                                       LANE_LINE_WIDTH, LANE_LINE_WIDTH * 2))
+
+    # Right Lane Line (Solid Yellow)
+    right_line_x = road_center_x + ROAD_WIDTH / 2 - LANE_WIDTH / 2
+    pygame.draw.rect(tile, YELLOW, (right_line_x - LANE_LINE_WIDTH / 2 - origin_x, 0, LANE_LINE_WIDTH, tile_size))
+
+#-----------------------------------------------------TiledWorld class
+
+class TiledWorld:
+    """
+    A world larger than the screen, rasterized lazily into tiles held in an LRU cache.
+    The camera follows the car and only tiles intersecting the camera rect are drawn.
+    """
+    def __init__(self, width=WORLD_WIDTH, height=WORLD_HEIGHT, tile_size=TILE_SIZE,
+                 max_tiles=MAX_CACHED_TILES, rasterize_tile=draw_straight_road_tile):
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+        self.rasterize_tile = rasterize_tile
+        self._tiles = OrderedDict() # (tile_x, tile_y) -> Surface, least recently used first
+        # Cache statistics (useful to check the LRU capacity is large enough)
+        self.tile_hits = 0
+        self.tile_misses = 0
+
+    def get_tile(self, tile_x, tile_y):
+        """Returns the Surface for tile (tile_x, tile_y), rasterizing it on first use."""
+        key = (tile_x, tile_y)
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+            self.tile_hits += 1
+            return tile
+
+        self.tile_misses += 1
+        tile = pygame.Surface((self.tile_size, self.tile_size))
+        tile.fill(BLACK)
+        self.rasterize_tile(tile, tile_x * self.tile_size, tile_y * self.tile_size, self)
+        self._tiles[key] = tile
+        if len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False) # Evict the least recently used tile
+        return tile
+
+    def camera_rect(self, car, view_width=SCREEN_WIDTH, view_height=SCREEN_HEIGHT):
+        """Returns the world-space camera rect centred on the car, clamped to the world."""
+        camera_x = car.x - view_width / 2
+        camera_y = car.y - view_height / 2
+        camera_x = max(0, min(camera_x, self.width - view_width))
+        camera_y = max(0, min(camera_y, self.height - view_height))
+        return pygame.Rect(int(camera_x), int(camera_y), view_width, view_height)
+
+    def render(self, screen, camera_rect):
+        """Blits only the tiles intersecting camera_rect; areas outside the world stay black."""
+        screen.fill(BLACK)
+        first_tile_x = max(0, camera_rect.left // self.tile_size)
+        first_tile_y = max(0, camera_rect.top // self.tile_size)
+        last_tile_x = min((self.width - 1) // self.tile_size, (camera_rect.right - 1) // self.tile_size)
+        last_tile_y = min((self.height - 1) // self.tile_size, (camera_rect.bottom - 1) // self.tile_size)
+
+        for tile_y in range(first_tile_y, last_tile_y + 1):
+            for tile_x in range(first_tile_x, last_tile_x + 1):
+                tile = self.get_tile(tile_x, tile_y)
+                screen.blit(tile, (tile_x * self.tile_size - camera_rect.left,
+                                   tile_y * self.tile_size - camera_rect.top))
@@ -0,0 +1,228 @@
+#----------------------------------------------libraries
+import os
+import time
+import json
+import argparse
+import contextlib
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torch.optim.lr_scheduler import ReduceLROnPlateau
+from torch.utils.data import Dataset, DataLoader
+
+from image_codec import load_frame
+from preprocessing import Preprocessor, NORMALIZED_LEVELS
+from model import NVIDIA_PilotNet, STUDENT_CONFIGS, build_student
+
+#-------------------------------------------------------
+# Training script for the lane keeping model, equivalent to the notebook
+# (notebooks/deep-learning-for-simulated-driving.ipynb: same preprocessing, loss, optimizer,
+# learning-rate schedule and split fractions), with CPU options:
+#   --channels-last   NHWC memory format for the convolutions
+#   --threads / --interop-threads   torch intra-/inter-op thread pools
+#   --compile         torch.compile the model (falls back to eager if unavailable)
+#   --bf16            bfloat16 autocast on CPU (weights and optimizer stay float32)
+# The best weights are saved as a plain state_dict, like models/best_lane_keeping_model.pth,
+# so model_export.py loads them unchanged. Every epoch logs samples/s, time spent waiting for
+# data and time spent in training steps, to tell input-bound from compute-bound training.
+DATA_DIR = "data/all_data" # Output of combine_data.py
+IMAGES_DIR = os.path.join(DATA_DIR, "all_images")
+LABELS_FILE = os.path.join(DATA_DIR, "combined_labels.csv")
+BEST_MODEL_PATH = "models/best_lane_keeping_model.pth"
+CHECKPOINT_PATH = "models/train_checkpoint.pt" # Last epoch (model, optimizer, scheduler), for --resume
+SEED = 42
+TEST_FRACTION = 0.15
+VALIDATION_FRACTION = 0.176 # Of the rest: ~15% of the total dataset
+NUM_EPOCHS = 49
+BATCH_SIZE = 64
+LEARNING_RATE = 0.0001
+NUM_WORKERS = 2 # DataLoader worker processes
+
+#-----------------------------------------------------LaneKeepingDataset class
+
+class LaneKeepingDataset(Dataset):
+    """Resized uint8 (66, 200) frames and steering angles; batches are normalized in collate_batch."""
+    def __init__(self, image_paths, steering_angles):
+        self.image_paths = image_paths
+        self.steering_angles = steering_angles
+        self.preprocess = Preprocessor()
+
+    def __len__(self):
+        return len(self.image_paths)
+
+    def __getitem__(self, idx):
+        pixels = self.preprocess.resize(load_frame(self.image_paths[idx]))[0]
+        return pixels, np.float32(self.steering_angles[idx])
+
+def collate_batch(items):
+    """(N, 1, 66, 200) float32 images in [-1, 1] (ToTensor + Normalize) and (N, 1) angles."""
+    pixels = np.stack([item[0] for item in items])
+    angles = np.array([item[1] for item in items], dtype=np.float32)
+    return torch.from_numpy(NORMALIZED_LEVELS[pixels[:, None]]), torch.from_numpy(angles).view(-1, 1)
+
+def split_dataset(labels_file=LABELS_FILE, images_dir=IMAGES_DIR, seed=SEED):
+    """Train/validation/test datasets with the notebook's split fractions."""
+    df_labels = pd.read_csv(labels_file)
+    image_paths = np.array([os.path.join(images_dir, name) for name in df_labels['image_filename']])
+    angles = df_labels['steering_angle'].to_numpy(dtype=np.float32)
+    indices = np.random.default_rng(seed).permutation(len(df_labels))
+    num_test = int(round(len(indices) * TEST_FRACTION))
+    num_val = int(round((len(indices) - num_test) * VALIDATION_FRACTION))
+    test, val, train = indices[:num_test], indices[num_test:num_test + num_val], indices[num_test + num_val:]
+    return [LaneKeepingDataset(image_paths[part], angles[part]) for part in (train, val, test)]
+
+#-------------------------------------------------------Model
+
+def build_model(architecture):
+    """"pilotnet" (NVIDIA_PilotNet) or a student name from model.STUDENT_CONFIGS."""
+    return NVIDIA_PilotNet() if architecture == "pilotnet" else build_student(architecture)
+
+def compile_model(model):
+    """torch.compile when this torch build supports it, else the model itself."""
+    if not hasattr(torch, "compile"):
+        print("torch.compile is not available in this torch version; training eagerly.")
+        return model
+    try:
+        return torch.compile(model)
+    except Exception as e:
+        print(f"torch.compile failed ({type(e).__name__}: {e}); training eagerly.")
+        return model
+
+def plain_state_dict(model):
+    """A state_dict loadable by NVIDIA_PilotNet().load_state_dict (contiguous float32 tensors)."""
+    return {key: value.detach().contiguous() for key, value in model.state_dict().items()}
+
+#-------------------------------------------------------Training
+
+def run_epoch(model, loader, criterion, optimizer=None, channels_last=False, bf16=False):
+    """
+    One pass over loader (training if an optimizer is given). Returns the mean loss and timings:
+    data_wait_s (blocked on the DataLoader) and step_s (forward, backward and optimizer step).
+    """
+    model.train(optimizer is not None)
+    running_loss = 0.0
+    samples = 0
+    data_wait_s = step_s = 0.0
+    autocast = torch.autocast("cpu", dtype=torch.bfloat16) if bf16 else contextlib.nullcontext()
+    iterator = iter(loader)
+    with torch.set_grad_enabled(optimizer is not None):
+        while True:
+            wait_start = time.perf_counter()
+            batch = next(iterator, None)
+            data_wait_s += time.perf_counter() - wait_start
+            if batch is None:
+                break
+            images, steering_angles = batch
+            step_start = time.perf_counter()
+            if channels_last:
+                images = images.contiguous(memory_format=torch.channels_last)
+            with autocast:
+                outputs = model(images)
+            loss = criterion(outputs.float(), steering_angles)
+            if optimizer is not None:
+                optimizer.zero_grad()
+                loss.backward()
+                optimizer.step()
+            step_s += time.perf_counter() - step_start
+            running_loss += loss.item() * images.size(0)
+            samples += images.size(0)
+    return running_loss / max(samples, 1), {"samples": samples, "data_wait_s": data_wait_s, "step_s": step_s}
+
+def train(args):
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    if args.interop_threads:
+        torch.set_num_interop_threads(args.interop_threads)
+    torch.manual_seed(SEED)
+
+    train_dataset, val_dataset, test_dataset = split_dataset(args.labels_file, args.images_dir)
+    loader_options = {"batch_size": args.batch_size, "num_workers": args.num_workers,
+                      "collate_fn": collate_batch, "persistent_workers": args.num_workers > 0}
+    train_loader = DataLoader(train_dataset, shuffle=True, **loader_options)
+    val_loader = DataLoader(val_dataset, shuffle=False, **loader_options)
+    test_loader = DataLoader(test_dataset, shuffle=False, **loader_options)
+    print(f"Training samples: {len(train_dataset)}, validation samples: {len(val_dataset)}, "
+          f"test samples: {len(test_dataset)}; {torch.get_num_threads()} threads")
+
+    model = build_model(args.architecture)
+    if args.init_weights:
+        model.load_state_dict(torch.load(args.init_weights, map_location=torch.device('cpu')))
+    if args.channels_last:
+        model = model.to(memory_format=torch.channels_last)
+    criterion = nn.MSELoss()
+    optimizer = optim.Adam(model.parameters(), lr=args.learning_rate)
+    scheduler = ReduceLROnPlateau(optimizer, mode='min', factor=0.2, patience=5, min_lr=0.0000001)
+
+    start_epoch = 0
+    best_val_loss = float('inf')
+    history = []
+    if args.resume and os.path.exists(args.checkpoint):
+        checkpoint = torch.load(args.checkpoint, map_location=torch.device('cpu'))
+        model.load_state_dict(checkpoint["model"])
+        optimizer.load_state_dict(checkpoint["optimizer"])
+        scheduler.load_state_dict(checkpoint["scheduler"])
+        start_epoch, best_val_loss, history = checkpoint["epoch"], checkpoint["best_val_loss"], checkpoint["history"]
+        print(f"Resuming after epoch {start_epoch} (best Val Loss: {best_val_loss:.4f})")
+    # Parameters are shared with the compiled module, so the optimizer and state_dicts use model
+    train_model = compile_model(model) if args.compile else model
+
+    for epoch in range(start_epoch, args.epochs):
+        epoch_start = time.perf_counter()
+        train_loss, timings = run_epoch(train_model, train_loader, criterion, optimizer,
+                                        args.channels_last, args.bf16)
+        epoch_s = time.perf_counter() - epoch_start
+        val_loss, _ = run_epoch(train_model, val_loader, criterion, None, args.channels_last, args.bf16)
+        scheduler.step(val_loss)
+
+        stats = {"epoch": epoch + 1, "train_loss": train_loss, "val_loss": val_loss,
+                 "samples_per_s": timings["samples"] / epoch_s, "epoch_s": epoch_s,
+                 "data_wait_s": timings["data_wait_s"], "step_s": timings["step_s"],
+                 "step_ms": timings["step_s"] / max(len(train_loader), 1) * 1e3,
+                 "lr": optimizer.param_groups[0]["lr"]}
+        history.append(stats)
+        print(f"Epoch [{epoch + 1}/{args.epochs}], Train Loss: {train_loss:.4f}, Val Loss: {val_loss:.4f} | "
+              f"{stats['samples_per_s']:.0f} samples/s, data wait {stats['data_wait_s']:.1f} s, "
+              f"steps {stats['step_s']:.1f} s ({stats['step_ms']:.1f} ms/step)")
+
+        # --- ---- Model Checkpointing (Saving the best model) ---
+        if val_loss < best_val_loss:
+            best_val_loss = val_loss
+            torch.save(plain_state_dict(model), args.output) # Saves only the model's learned parameters
+            print(f"--> Saved best model with Val Loss: {best_val_loss:.4f}")
+        torch.save({"model": plain_state_dict(model), "optimizer": optimizer.state_dict(),
+                    "scheduler": scheduler.state_dict(), "epoch": epoch + 1,
+                    "best_val_loss": best_val_loss, "history": history}, args.checkpoint)
+
+    # Test loss of the best weights
+    if os.path.exists(args.output):
+        model.load_state_dict(torch.load(args.output, map_location=torch.device('cpu')))
+    test_loss, _ = run_epoch(model, test_loader, criterion, None, args.channels_last, args.bf16)
+    print(f"Test Loss (MSE): {test_loss:.4f}")
+
+    log_path = os.path.splitext(args.output)[0] + "_train_log.json"
+    with open(log_path, 'w') as f:
+        json.dump({"options": vars(args), "test_loss": test_loss, "history": history}, f, indent=2)
+    print(f"Training log saved to {log_path}")
+
+#-------------------------------------------------------Main Execution Block:
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the lane keeping model on CPU.")
+    parser.add_argument("--labels-file", default=LABELS_FILE)
+    parser.add_argument("--images-dir", default=IMAGES_DIR)
+    parser.add_argument("--architecture", choices=["pilotnet"] + list(STUDENT_CONFIGS), default="pilotnet")
+    parser.add_argument("--output", default=BEST_MODEL_PATH, help="Best weights (state_dict)")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--resume", action="store_true", help="Continue from --checkpoint")
+    parser.add_argument("--init-weights", default=None, help="Start from these weights (fine-tuning)")
+    parser.add_argument("--epochs", type=int, default=NUM_EPOCHS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--learning-rate", type=float, default=LEARNING_RATE)
+    parser.add_argument("--num-workers", type=int, default=NUM_WORKERS)
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads (default: all cores)")
+    parser.add_argument("--interop-threads", type=int, default=None)
+    parser.add_argument("--channels-last", action="store_true")
+    parser.add_argument("--compile", action="store_true")
+    parser.add_argument("--bf16", action="store_true", help="bfloat16 autocast (fast on CPUs with AVX512-BF16/AMX)")
+    train(parser.parse_args())
@@ -0,0 +1,212 @@
+#----------------------------------------------libraries
+import os
+import json
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+from multiprocessing import Pool
+from PIL import Image
+
+from simulator import CAMERA_WIDTH, CAMERA_HEIGHT
+from columnar import read_columns
+from image_codec import is_frame_file, load_frame
+
+#-------------------------------------------------------
+# Checks every run_v* directory that combine_data.py would consolidate:
+# each image must decode as a CAMERA_WIDTH x CAMERA_HEIGHT 8-bit grayscale frame, each label must
+# be finite, and images and label rows must match one to one.
+# Per-image results are cached by (size, mtime, hash), so re-running only decodes changed files.
+BASE_DATA_DIR = "data/all_data"
+CACHE_FILENAME = "verify_cache.json"
+REPORT_FILENAME = "verify_report.json"
+QUARANTINE_FILENAME = "quarantine.txt" # "<run>/<image filename>" per line, skipped by combine_data.py
+# Problems that are reported but do not quarantine the image: for a duplicate label row the first
+# row is valid, and combine_data.py only uses the first row of each image
+REPORT_ONLY_PROBLEMS = ("duplicate label row",)
+IMAGES_PER_TASK = 64 # Images checked per worker task
+
+#-------------------------------------------------------Worker Functions
+
+def _file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _decode_error(path):
+    """Returns None if path is a valid camera frame, otherwise a short description of the problem."""
+    try:
+        if path.endswith(".png"):
+            with Image.open(path) as img:
+                img.verify() # Chunk structure and CRCs
+            with Image.open(path) as img:
+                if img.mode != "L":
+                    return f"mode {img.mode}, expected L"
+        frame = load_frame(path) # Full decode
+    except Exception as e:
+        return f"decode failed: {e}"
+    if frame.dtype != np.uint8 or frame.shape != (CAMERA_HEIGHT, CAMERA_WIDTH):
+        return f"{frame.dtype} frame of shape {frame.shape}, expected uint8 {CAMERA_HEIGHT}x{CAMERA_WIDTH}"
+    return None
+
+def _check_images(task):
+    """Checks a list of (path, cached entry or None). Returns the fresh cache entry for each path."""
+    results = []
+    for path, cached in task:
+        stat = os.stat(path)
+        entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        entry["hash"] = _file_hash(path)
+        if cached is not None and cached["hash"] == entry["hash"]:
+            entry["error"] = cached["error"] # Touched but unchanged content
+        else:
+            entry["error"] = _decode_error(path)
+        results.append((path, entry))
+    return results
+
+#-------------------------------------------------------Label Checks
+
+def load_run_labels(run_dir):
+    """Reads a run's (image_filename, steering_angle) columns, as combine_data.py does. None if there are none."""
+    telemetry_dir = os.path.join(run_dir, "telemetry")
+    labels_path = os.path.join(run_dir, "labels.csv")
+    if os.path.isdir(telemetry_dir):
+        return read_columns(telemetry_dir, ["image_filename", "steering_angle"])
+    if os.path.exists(labels_path):
+        labels = pd.read_csv(labels_path)
+        return {"image_filename": labels["image_filename"].to_numpy(),
+                "steering_angle": pd.to_numeric(labels["steering_angle"], errors="coerce").to_numpy()}
+    return None
+
+def check_run_labels(run_name, labels, image_filenames):
+    """Returns the label-level problems of one run as (run, filename, problem) tuples."""
+    if labels is None:
+        return [(run_name, "labels.csv", "no labels.csv or telemetry/")]
+    problems = []
+    seen = set()
+    for filename, steering_angle in zip(labels["image_filename"], labels["steering_angle"]):
+        filename = str(filename)
+        if filename in seen:
+            problems.append((run_name, filename, "duplicate label row"))
+        seen.add(filename)
+        if not np.isfinite(steering_angle):
+            problems.append((run_name, filename, f"non-finite label {steering_angle}"))
+        if filename not in image_filenames:
+            problems.append((run_name, filename, "missing image"))
+    for filename in sorted(image_filenames - seen):
+        problems.append((run_name, filename, "orphaned image (no label row)"))
+    return problems
+
+#-------------------------------------------------------Verification
+
+def verify_data(base_data_dir=BASE_DATA_DIR, workers=None, write_quarantine=False):
+    """
+    Verifies all run_v* directories under base_data_dir with a process pool.
+    Writes the JSON report to base_data_dir and returns it. With write_quarantine the quarantine
+    list is rewritten from this report; otherwise an existing list is removed, as it describes
+    data from an earlier run and combine_data.py would keep skipping those images.
+    """
+    cache_path = os.path.join(base_data_dir, CACHE_FILENAME)
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path) as f:
+            cache = json.load(f)
+
+    run_names = sorted(d for d in os.listdir(base_data_dir)
+                       if os.path.isdir(os.path.join(base_data_dir, d)) and d.startswith("run_v"))
+
+    problems = []
+    run_images = {} # run -> set of image filenames
+    to_check = [] # (path, cached entry or None) for new or changed images
+    new_cache = {}
+    for run_name in run_names:
+        run_dir = os.path.join(base_data_dir, run_name)
+        images_dir = os.path.join(run_dir, "images")
+        image_filenames = set()
+        if os.path.isdir(images_dir):
+            image_filenames = {f for f in os.listdir(images_dir) if is_frame_file(f)}
+        run_images[run_name] = image_filenames
+        problems += check_run_labels(run_name, load_run_labels(run_dir), image_filenames)
+
+        for filename in image_filenames:
+            path = os.path.join(images_dir, filename)
+            cached = cache.get(path)
+            stat = os.stat(path)
+            if cached is not None and cached["size"] == stat.st_size and cached["mtime_ns"] == stat.st_mtime_ns:
+                new_cache[path] = cached # Unchanged since the last scan
+            else:
+                to_check.append((path, cached))
+
+    print(f"{len(run_names)} runs, {sum(map(len, run_images.values()))} images "
+          f"({len(to_check)} new or changed, the rest cached)")
+    if to_check:
+        tasks = [to_check[i:i + IMAGES_PER_TASK] for i in range(0, len(to_check), IMAGES_PER_TASK)]
+        with Pool(workers) as pool:
+            checked = 0
+            for results in pool.imap_unordered(_check_images, tasks):
+                new_cache.update(results)
+                checked += len(results)
+                print(f"Checked {checked}/{len(to_check)} images.")
+
+    for path, entry in new_cache.items():
+        if entry["error"] is not None:
+            run_name = os.path.basename(os.path.dirname(os.path.dirname(path)))
+            problems.append((run_name, os.path.basename(path), entry["error"]))
+    problems.sort()
+
+    # Only images that still exist are kept in the cache
+    temp_path = cache_path + ".tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(new_cache, f)
+    os.replace(temp_path, cache_path)
+
+    report = {
+        "base_data_dir": base_data_dir,
+        "num_runs": len(run_names),
+        "num_images": sum(map(len, run_images.values())),
+        "num_problems": len(problems),
+        "runs": {run_name: {"num_images": len(run_images[run_name]),
+                            "num_problems": sum(1 for p in problems if p[0] == run_name)}
+                 for run_name in run_names},
+        "problems": [{"run": run, "filename": filename, "problem": problem} for run, filename, problem in problems],
+    }
+    with open(os.path.join(base_data_dir, REPORT_FILENAME), 'w') as f:
+        json.dump(report, f, indent=2)
+
+    quarantine_path = os.path.join(base_data_dir, QUARANTINE_FILENAME)
+    if write_quarantine:
+        # Every file with a problem, except those only in REPORT_ONLY_PROBLEMS (combine_data.py skips these)
+        quarantined = sorted({f"{run}/{filename}" for run, filename, problem in problems
+                              if filename != "labels.csv" and problem not in REPORT_ONLY_PROBLEMS})
+        with open(quarantine_path, 'w') as f:
+            f.writelines(f"{entry}\n" for entry in quarantined)
+        print(f"Quarantined {len(quarantined)} images in {quarantine_path}")
+    elif os.path.exists(quarantine_path):
+        os.remove(quarantine_path)
+        print(f"Removed the stale {quarantine_path} (run with --quarantine to rebuild it)")
+    return report
+
+def read_quarantine(base_data_dir=BASE_DATA_DIR):
+    """Returns the set of quarantined "<run>/<image filename>" entries (empty if there is no list)."""
+    quarantine_path = os.path.join(base_data_dir, QUARANTINE_FILENAME)
+    if not os.path.exists(quarantine_path):
+        return set()
+    with open(quarantine_path) as f:
+        return {line.strip() for line in f if line.strip()}
+
+#-------------------------------------------------------Main Execution Block:
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the images and labels of every run_v* directory.")
+    parser.add_argument("--data-dir", default=BASE_DATA_DIR, help="Directory holding the run_v* runs")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--quarantine", action="store_true",
+                        help=f"Write {QUARANTINE_FILENAME}, listing the images combine_data.py should skip "
+                             "(without it, an existing list is removed)")
+    args = parser.parse_args()
+
+    report = verify_data(args.data_dir, args.workers, args.quarantine)
+    for problem in report["problems"]:
+        print(f"{problem['run']}/{problem['filename']}: {problem['problem']}")
+    print(f"{report['num_problems']} problems in {report['num_images']} images. "
+          f"Report: {os.path.join(args.data_dir, REPORT_FILENAME)}")